@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+benchmark for augmentation time per sample
+
+python tools/augmentation_benchmark.py geometric --image_size 1024,2048 --n 100
+python tools/augmentation_benchmark.py photometric --aug_library imgaug --batch_sizes 8,16,32,64
+"""
+
+import time
+import random
+import numpy as np
+import fire
+import torch
+from easydict import EasyDict as edict
+from torchseg.utils.augmentor import ImageTransformer, ImageAugmenter, get_default_augmentor_config
+from torchseg.utils.augmentation.batch_transform import BatchAugmenter
+
+def geometric(image_size=(1024,2048),input_shape=(224,224),n=100):
+    """
+    compare the geometric augmentation of imgaug (crop+rotate+flip) and warp (one warpAffine)
+    """
+    h,w=image_size
+    image=np.random.randint(0,256,size=(h,w,3),dtype=np.uint8)
+    mask=np.random.randint(0,20,size=(h,w),dtype=np.uint8)
+    results={}
+    for aug_library in ['imgaug','warp']:
+        config=get_default_augmentor_config(edict({'input_shape':input_shape,'ignore_index':255}))
+        config.aug_library=aug_library
+        config.pad_for_crop=False
+        tran=ImageTransformer(config)
+        random.seed(25)
+        np.random.seed(25)
+        start=time.time()
+        for i in range(n):
+            tran.transform_image_and_mask(image,mask)
+        results[aug_library]=(time.time()-start)*1000/n
+
+    for name,t in results.items():
+        print('{}: {:.2f} ms per sample'.format(name,t))
+    print('speed up {:.2f}x'.format(results['imgaug']/results['warp']))
+
+def photometric(aug_library='imgaug',input_shape=(224,224),batch_sizes=(8,16,32,64),n=20):
+    """
+    compare the image augmentation throughput (images per second) for
+    per_sample: ImageAugmenter.augument_image for each image (current dataset path)
+    imgaug_batch: imgaug augment_images for the batch (imgaug only)
+    torch_batch: BatchAugmenter on the batch tensor (cpu and cuda if available)
+    """
+    config=get_default_augmentor_config(edict({'input_shape':input_shape}))
+    config.aug_library=aug_library
+    augmenter=ImageAugmenter(config)
+    batch_augmenter=BatchAugmenter(config)
+    devices=['cpu']+(['cuda'] if torch.cuda.is_available() else [])
+    h,w=input_shape
+    for batch_size in batch_sizes:
+        images=np.random.randint(0,256,size=(batch_size,h,w,3),dtype=np.uint8)
+        results={}
+
+        start=time.time()
+        for i in range(n):
+            [augmenter.augument_image(img) for img in images]
+        results['per_sample']=time.time()-start
+
+        if aug_library=='imgaug':
+            start=time.time()
+            for i in range(n):
+                augmenter.iaa_seq.augment_images(images)
+            results['imgaug_batch']=time.time()-start
+
+        for device in devices:
+            tensor=torch.from_numpy(images.transpose((0,3,1,2))).to(device)
+            start=time.time()
+            for i in range(n):
+                batch_augmenter.forward(tensor)
+            if device=='cuda':
+                torch.cuda.synchronize()
+            results['torch_batch_'+device]=time.time()-start
+
+        for name,t in results.items():
+            print('batch_size={} {}: {:.1f} images/s'.format(batch_size,name,n*batch_size/t))
+
+if __name__ == '__main__':
+    fire.Fire()
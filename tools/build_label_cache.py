@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""
+rasterize the json polygon annotation offline, then dataset_generalize
+read the label from config.label_cache_dir
+
+python tools/build_label_cache.py --dataset_name HuaWei --split train --label_cache_dir ~/.cache/torchseg/label_cache --num_workers 8
+the label cache is disabled by default, train with the same --label_cache_dir
+"""
+
+import fire
+from torchseg.dataset.dataset_generalize import dataset_generalize
+from torchseg.dataset.label_cache import build_label_cache
+from torchseg.utils.configs.semanticseg_config import get_default_config
+
+def main(dataset_name='HuaWei',split='train',label_cache_dir=None,num_workers=8):
+    config=get_default_config()
+    config.dataset_name=dataset_name
+    if label_cache_dir is not None:
+        config.label_cache_dir=label_cache_dir
+
+    assert config.label_cache_dir,'label_cache_dir is empty'
+    dataset=dataset_generalize(config,split=split)
+    build_label_cache(dataset.annotation_files,config.label_cache_dir,num_workers=num_workers)
+
+if __name__ == '__main__':
+    fire.Fire(main)
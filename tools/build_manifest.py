@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+build the dataset manifest offline: file lists, original image shapes and
+label class histograms, see torchseg/dataset/dataset_manifest.py
+
+python tools/build_manifest.py semantic --dataset_name Cityscapes --split train --num_workers 8
+python tools/build_manifest.py motion --dataset FBMS --split train
+"""
+
+import fire
+from multiprocessing import Pool
+from tqdm import tqdm
+from torchseg.dataset.dataset_generalize import dataset_generalize
+from torchseg.dataset.dataset_manifest import dataset_manifest, get_dataset_manifest
+from torchseg.dataset.packed_dataset import disc_store
+from torchseg.utils.configs.semanticseg_config import get_default_config as get_semantic_config
+from torchseg.models.motionseg.motion_utils import get_dataset,get_default_config,fine_tune_config
+
+# the file store for each worker process
+worker_store=None
+
+def init_worker(label_cache_dir):
+    global worker_store
+    worker_store=disc_store(label_cache_dir)
+
+def sample_worker(args):
+    img_path,lbl_path=args
+    shape=worker_store.shape(img_path)
+    hist=None if lbl_path is None else dataset_manifest.compute_histogram(worker_store.read_label(lbl_path))
+    return img_path,lbl_path,shape,hist
+
+def semantic(dataset_name='Cityscapes',split='train',manifest_dir=None,num_workers=8):
+    config=get_semantic_config()
+    config.dataset_name=dataset_name
+    if manifest_dir is not None:
+        config.manifest_dir=manifest_dir
+    assert config.manifest_dir,'manifest_dir is empty'
+
+    # build the file lists
+    dataset=dataset_generalize(config,split=split)
+    manifest=get_dataset_manifest(dataset.config,dataset.store,split)
+    if split=='test':
+        tasks=[(f,None) for f in dataset.image_files]
+    else:
+        tasks=list(zip(dataset.image_files,dataset.annotation_files))
+
+    with Pool(num_workers,initializer=init_worker,initargs=(dataset.config.label_cache_dir,)) as p:
+        for img_path,lbl_path,shape,hist in tqdm(p.imap_unordered(sample_worker,tasks,chunksize=16),total=len(tasks)):
+            manifest.update(img_path,shape=shape)
+            if lbl_path is not None:
+                manifest.update(lbl_path,hist=hist)
+    manifest.save()
+    print('save manifest for {} samples to {}'.format(len(tasks),manifest.cache_file))
+
+def motion(dataset='FBMS',split='train',manifest_dir=None):
+    config=get_default_config()
+    config.dataset=dataset
+    if manifest_dir is not None:
+        config.manifest_dir=manifest_dir
+    assert config.manifest_dir,'manifest_dir is empty'
+
+    config=fine_tune_config(config)
+    # the file lists are saved when construct the dataset
+    xxx_dataset=get_dataset(config,split)
+    print('{} {}: {} samples'.format(dataset,split,len(xxx_dataset)))
+
+if __name__ == '__main__':
+    fire.Fire()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+build the tile files for images and labels, see torchseg/dataset/tile_store.py
+
+python tools/build_tiles.py build --dataset_name Cityscapes --split train --tile_root ~/cvdataset/tiles
+python tools/build_tiles.py benchmark --dataset_name Cityscapes --tile_root ~/cvdataset/tiles
+
+then train with --tile_root ~/cvdataset/tiles
+"""
+
+import os
+import time
+import random
+import cv2
+import fire
+from multiprocessing import Pool
+from tqdm import tqdm
+from torchseg.dataset.dataset_generalize import dataset_generalize
+from torchseg.dataset.packed_dataset import disc_store
+from torchseg.dataset.tile_store import tile_store, write_tiles, get_tile_path
+from torchseg.utils.configs.semanticseg_config import get_default_config as get_semantic_config
+from torchseg.utils.augmentation.custom import get_crop_size
+from torchseg.utils.augmentor import get_default_augmentor_config
+
+# (store,tile_root,root_path,tile_size,levels) for each worker process
+worker_args=None
+
+def init_worker(label_cache_dir,tile_root,root_path,tile_size,levels):
+    global worker_args
+    worker_args=(disc_store(label_cache_dir),tile_root,root_path,tile_size,levels)
+
+def tile_worker(args):
+    img_path,lbl_path=args
+    store,tile_root,root_path,tile_size,levels=worker_args
+    img=store.imread(img_path,cv2.IMREAD_COLOR)
+    write_tiles(img,get_tile_path(img_path,tile_root,root_path),tile_size,levels,cv2.INTER_AREA)
+    if lbl_path is not None:
+        lbl=store.read_label(lbl_path)
+        write_tiles(lbl,get_tile_path(lbl_path,tile_root,root_path),tile_size,levels,cv2.INTER_NEAREST)
+    return img_path
+
+def get_dataset(dataset_name,split):
+    config=get_semantic_config()
+    config.dataset_name=dataset_name
+    return dataset_generalize(config,split=split)
+
+def build(dataset_name='Cityscapes',split='train',tile_root='~/cvdataset/tiles',tile_size=256,levels=(1,),num_workers=8):
+    tile_root=os.path.expanduser(tile_root)
+    dataset=get_dataset(dataset_name,split)
+    if split=='test':
+        tasks=[(f,None) for f in dataset.image_files]
+    else:
+        tasks=list(zip(dataset.image_files,dataset.annotation_files))
+
+    initargs=(dataset.config.label_cache_dir,tile_root,dataset.root_path,tile_size,tuple(levels))
+    with Pool(num_workers,initializer=init_worker,initargs=initargs) as p:
+        for _ in tqdm(p.imap_unordered(tile_worker,tasks,chunksize=4),total=len(tasks)):
+            pass
+    print('save tiles for {} samples to {}'.format(len(tasks),tile_root))
+
+def benchmark(dataset_name='Cityscapes',split='train',tile_root='~/cvdataset/tiles',n=200,
+              keep_crop_ratio=True,input_shape=(224,224)):
+    """
+    random crop from full decode vs random crop from tiles, image and label
+    """
+    dataset=get_dataset(dataset_name,split)
+    config=dataset.config
+    config.input_shape=list(input_shape)
+    config.keep_crop_ratio=keep_crop_ratio
+    config=get_default_augmentor_config(config)
+    tiles=tile_store(os.path.expanduser(tile_root),dataset.root_path)
+
+    random.seed(25)
+    indexes=random.sample(range(len(dataset)),min(n,len(dataset)))
+    samples=[(dataset.image_files[i],dataset.annotation_files[i]) for i in indexes]
+    samples=[(img_path,lbl_path) for img_path,lbl_path in samples if tiles.exists(img_path)]
+    assert len(samples)>0,'no tile files in {}'.format(tile_root)
+
+    rects=[]
+    for img_path,lbl_path in samples:
+        h,w=tiles.shape(img_path)[0:2]
+        th,tw=get_crop_size(config,(h,w))
+        rects.append((random.randint(0,w-tw),random.randint(0,h-th),th,tw))
+
+    def read_crop(name,img_path,lbl_path,rect):
+        x1,y1,th,tw=rect
+        if name=='full':
+            img=dataset.store.imread(img_path,cv2.IMREAD_COLOR)[y1:y1+th,x1:x1+tw]
+            lbl=dataset.store.read_label(lbl_path)[y1:y1+th,x1:x1+tw]
+        else:
+            img=tiles.read_region(img_path,rect)
+            lbl=tiles.read_region(lbl_path,rect)
+        return img,lbl
+
+    # the tile region should be the same as the crop of full decode
+    full_crops=read_crop('full',samples[0][0],samples[0][1],rects[0])
+    tile_crops=read_crop('tile',samples[0][0],samples[0][1],rects[0])
+    for full,tile in zip(full_crops,tile_crops):
+        assert full.shape==tile.shape and (full==tile).all(),'tile region differ from full decode'
+
+    results={}
+    for name in ['full','tile']:
+        start=time.time()
+        for (img_path,lbl_path),rect in zip(tqdm(samples,desc=name),rects):
+            read_crop(name,img_path,lbl_path,rect)
+        results[name]=(time.time()-start)*1000/len(samples)
+
+    for name,t in results.items():
+        print('{} decode + crop: {:.2f} ms per sample'.format(name,t))
+    print('speed up {:.2f}x'.format(results['full']/results['tile']))
+    return results
+
+if __name__ == '__main__':
+    fire.Fire()
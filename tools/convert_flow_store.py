@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""
+convert the .flo optical flow files into float16 flow store, then train with
+--flow_store_root ~/cvdataset/flow_store
+
+python tools/convert_flow_store.py --store_root ~/cvdataset/flow_store --input_shapes [[224,224]]
+"""
+
+import os
+import fire
+from torchseg.dataset.flow_store import convert_flo_files
+
+def main(store_root,input_shapes=[],flow_root_dir='~/cvdataset/optical_flow'):
+    """
+    input_shapes: pre-resized input_shape list, eg: [[224,224],[448,448]]
+    """
+    convert_flo_files(os.path.expanduser(store_root),
+                      input_shapes=input_shapes,
+                      flow_root_dir=os.path.expanduser(flow_root_dir))
+
+if __name__ == '__main__':
+    fire.Fire(main)
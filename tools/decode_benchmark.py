@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+benchmark for decode + resize time per sample, full resolution decode vs reduced decode
+
+python tools/decode_benchmark.py semantic --dataset_name Cityscapes --input_shape 224,224
+python tools/decode_benchmark.py motion --dataset FBMS --input_shape 224,224
+
+build the pre-downscaled pyramid for png dataset (reduced decode for png is not faster)
+python tools/decode_benchmark.py build_pyramid --dataset_name Cityscapes --split train --pyramid_root ~/cvdataset/pyramid
+"""
+
+import os
+import time
+import random
+import cv2
+import fire
+from tqdm import tqdm
+from torchseg.dataset.dataset_generalize import dataset_generalize
+from torchseg.dataset.packed_dataset import disc_store
+from torchseg.dataset.reduced_decode import imread_reduced, get_pyramid_path
+from torchseg.utils.configs.semanticseg_config import get_default_config as get_semantic_config
+from torchseg.models.motionseg.motion_utils import get_dataset,get_default_config,fine_tune_config
+
+def benchmark(files,input_shape,pyramid_root=None,root_path=None):
+    store=disc_store()
+    dsize=(input_shape[1],input_shape[0])
+    results={}
+    for name in ['full','reduced']:
+        start=time.time()
+        for f in tqdm(files,desc=name):
+            if name=='full':
+                img=cv2.imread(f,cv2.IMREAD_COLOR)
+            else:
+                img,_=imread_reduced(store,f,input_shape,cv2.IMREAD_COLOR,pyramid_root=pyramid_root,root_path=root_path)
+            img=cv2.resize(img,dsize,interpolation=cv2.INTER_LINEAR)
+        results[name]=(time.time()-start)*1000/len(files)
+
+    for name,t in results.items():
+        print('{} decode + resize: {:.2f} ms per sample'.format(name,t))
+    print('speed up {:.2f}x'.format(results['full']/results['reduced']))
+    return results
+
+def sample_files(files,n):
+    files=list(files)
+    if n>0 and len(files)>n:
+        random.seed(25)
+        files=random.sample(files,n)
+    return files
+
+def semantic(dataset_name='Cityscapes',split='val',input_shape=(224,224),n=200,pyramid_root=None):
+    config=get_semantic_config()
+    config.dataset_name=dataset_name
+    dataset=dataset_generalize(config,split=split)
+    files=sample_files(dataset.image_files,n)
+    return benchmark(files,input_shape,pyramid_root,dataset.root_path)
+
+def motion(dataset='FBMS',split='val',input_shape=(224,224),n=200,pyramid_root=None):
+    config=get_default_config()
+    config.dataset=dataset
+    config=fine_tune_config(config)
+    d=get_dataset(config,split)
+    files=sample_files(set([d.__get_path__(idx)[0] for idx in range(len(d))]),n)
+    return benchmark(files,input_shape,pyramid_root,d.root_path)
+
+def build_pyramid(dataset_name='Cityscapes',split='train',pyramid_root=None,factors=(2,4,8)):
+    """
+    save image downscaled by factors to pyramid_root/x{factor}/{relative path to root_path}
+    use INTER_AREA to downscale, png is lossless
+    """
+    assert pyramid_root is not None
+    pyramid_root=os.path.expanduser(pyramid_root)
+    config=get_semantic_config()
+    config.dataset_name=dataset_name
+    dataset=dataset_generalize(config,split=split)
+    for f in tqdm(dataset.image_files):
+        img=cv2.imread(f,cv2.IMREAD_COLOR)
+        h,w=img.shape[0:2]
+        for factor in factors:
+            path=get_pyramid_path(f,factor,pyramid_root,dataset.root_path)
+            if os.path.exists(path):
+                continue
+            os.makedirs(os.path.dirname(path),exist_ok=True)
+            # the same size as opencv IMREAD_REDUCED_COLOR_x
+            dsize=((w+factor-1)//factor,(h+factor-1)//factor)
+            cv2.imwrite(path,cv2.resize(img,dsize,interpolation=cv2.INTER_AREA))
+
+if __name__ == '__main__':
+    fire.Fire()
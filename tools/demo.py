@@ -3,10 +3,14 @@
 usage:
     python demo.py --config_txt xxx/config.txt
     use config.txt to find weight/checkpoint file
+
+    # motion segmentation on video files or camera (0)
+    python demo.py --app motion --config_txt xxx/config.txt --images test.mp4 0 --output_dir output
 """
 
 import argparse 
 import sys
+import os
 import glob
 import torch
 import cv2
@@ -32,13 +36,30 @@ if __name__ == '__main__':
                         default=[],
                         required=True,
                         nargs='*')
+    parser.add_argument('--output_dir',
+                        help='the output directory for mask videos of motion app',
+                        default=None)
+    parser.add_argument('--batch_size',
+                        help='batch size for motion app',
+                        type=int,
+                        default=1)
     
     args=parser.parse_args()
     
     if args.app=='motion':
-        from torchseg.utils.configs.motionseg_config import (
-            load_config)
-        assert False,'waiting for implement'
+        # the images are video files or camera ids
+        from torchseg.models.motionseg.motion_benchmark import (
+            load_model,
+            stream_inference)
+        model,config=load_model(args.config_txt)
+        for source in args.images:
+            if args.output_dir is None:
+                output_path=None
+            else:
+                name=os.path.splitext(os.path.basename(source))[0]
+                output_path=os.path.join(args.output_dir,name+'_mask.mp4')
+            stream_inference(model,config,source,output_path,batch_size=args.batch_size)
+        sys.exit(0)
     elif args.app=='semantic':
         from torchseg.utils.configs.semanticseg_config import (
             get_net,
@@ -6,13 +6,17 @@ dataset loader: update to support two labels.
 from torchseg.models.motionseg.motion_stn import stn_loss
 from torchseg.utils.metric.motionseg_metric import MotionSegMetric
 from torchseg.utils.configs.motionseg_config import update_default_config
-from torchseg.dataset.motionseg_dataset_factory import prepare_input_output
+from torchseg.dataset.motionseg_dataset_factory import prepare_input_output, normalize_frames
+from torchseg.dataset.clip_sampler import get_clip_batch_sampler
+from torchseg.dataset.resumable_sampler import (resumable_sampler, eval_sampler, get_loader_sampler, get_start_step,
+                                                set_loader_epoch, step_loader)
+from torchseg.utils.metric.dist_metric import reduce_metric
 from torchseg.models.motionseg.motion_utils import (get_parser,
                                            get_dataset,
                                            get_model,
                                            poly_lr_scheduler,
                                            get_load_convert_model)
-from torchseg.utils.torch_tools import init_writer
+from torchseg.utils.torch_tools import init_writer, save_resume_state, load_resume_state
 from torchseg.utils.losses import jaccard_loss,dice_loss
 
 from torchseg.utils.torchsummary import summary
@@ -78,17 +82,28 @@ def get_dist_module(config):
     for split in ['train','val']:
         xxx_dataset=get_dataset(config,split)
 
+        # resumable sampler, see resumable_sampler.py
         if config.use_sync_bn and split=='train':
-            xxx_sampler=torch.utils.data.DistributedSampler(xxx_dataset)
+            seed=0 if config.seed is None else config.seed
+            xxx_sampler=resumable_sampler(len(xxx_dataset),num_replicas=dist.get_world_size(),rank=dist.get_rank(),seed=seed)
+        elif split=='train':
+            xxx_sampler=resumable_sampler(len(xxx_dataset),seed=config.seed)
+        elif config.use_sync_bn:
+            # each rank evaluate one shard, the metrics are summed by reduce_metric()
+            xxx_sampler=eval_sampler(len(xxx_dataset),num_replicas=dist.get_world_size(),rank=dist.get_rank())
         else:
             xxx_sampler=None
 
         batch_size=config.batch_size if split=='train' else 1
 
-        if split=='train':
-            xxx_loader=td.DataLoader(dataset=xxx_dataset,batch_size=batch_size,shuffle=(xxx_sampler is None),drop_last=True,num_workers=2,sampler=xxx_sampler,pin_memory=True)
+        # clip mode, decode each frame once for the clip, see clip_sampler.py
+        clip_sampler=get_clip_batch_sampler(config,xxx_dataset,distributed=config.use_sync_bn) if split=='train' else None
+        if clip_sampler is not None:
+            xxx_loader=td.DataLoader(dataset=xxx_dataset,batch_sampler=clip_sampler,num_workers=2,pin_memory=True)
+        elif split=='train':
+            xxx_loader=td.DataLoader(dataset=xxx_dataset,batch_size=batch_size,shuffle=False,drop_last=True,num_workers=2,sampler=xxx_sampler,pin_memory=True)
         else:
-            xxx_loader=td.DataLoader(dataset=xxx_dataset,batch_size=batch_size,shuffle=False,num_workers=2,pin_memory=True)
+            xxx_loader=td.DataLoader(dataset=xxx_dataset,batch_size=batch_size,shuffle=False,num_workers=2,sampler=xxx_sampler,pin_memory=True)
         dataset_loaders[split]=xxx_loader
 
     return model,seg_loss_fn,optimizer,dataset_loaders
@@ -97,10 +112,21 @@ def is_main_process(config):
     return not config.use_sync_bn or (config.use_sync_bn and config.rank % config.ngpus_per_node == 0)
 
 def train(config,model,seg_loss_fn,optimizer,dataset_loaders):
+    # resume at the next batch of the resume state, the same state for all ranks
+    start_epoch=0
+    log_dir=None
+    train_sampler=get_loader_sampler(dataset_loaders['train'])
+    if config.resume_path is not None:
+        print('resume training from',config.resume_path)
+        state=load_resume_state(config.resume_path,model,optimizer,None,train_sampler)
+        start_epoch,log_dir=state['epoch'],state['log_dir']
+
     if is_main_process(config):
-        time_str = time.strftime("%Y-%m-%d___%H-%M-%S", time.localtime())
-        log_dir = os.path.join(config['log_dir'], config['net_name'],
-                               config['dataset'], config['note'], time_str)
+        if log_dir is None:
+            time_str = time.strftime("%Y-%m-%d___%H-%M-%S", time.localtime())
+            log_dir = os.path.join(config['log_dir'], config['net_name'],
+                                   config['dataset'], config['note'], time_str)
+        resume_path=os.path.join(log_dir,'resume.pkl')
         checkpoint_path = os.path.join(log_dir, 'model-last-%d.pkl' % config['epoch'])
 
         total_param=sum(p.numel() for p in model.parameters())
@@ -112,13 +138,14 @@ def train(config,model,seg_loss_fn,optimizer,dataset_loaders):
     motionseg_metric=MotionSegMetric(config.exception_value)
 
     if is_main_process(config):
-        tqdm_epoch = trange(config['epoch'], desc='{} epochs'.format(config.note), leave=True)
+        tqdm_epoch = trange(start_epoch, config['epoch'], desc='{} epochs'.format(config.note), leave=True)
     else:
-        tqdm_epoch=range(config.epoch)
+        tqdm_epoch=range(start_epoch, config.epoch)
 
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     step_acc=0
     for epoch in tqdm_epoch:
+        set_loader_epoch(dataset_loaders['train'],epoch)
         for split in ['train','val']:
             if split=='train':
                 model.train()
@@ -127,97 +154,112 @@ def train(config,model,seg_loss_fn,optimizer,dataset_loaders):
 
             motionseg_metric.reset()
 
+            # the resumed epoch start from the next batch of the checkpoint
+            start_step=get_start_step(dataset_loaders[split]) if split=='train' else 0
             if is_main_process(config):
-                tqdm_step = tqdm(dataset_loaders[split], desc='steps', leave=False)
+                tqdm_step = tqdm(dataset_loaders[split], desc='steps', leave=False, initial=start_step)
             else:
                 tqdm_step = dataset_loaders[split]
 
             total_time=0
             counter=0
             N=len(dataset_loaders[split])
-            for step,data in enumerate(tqdm_step):
-                images,origin_labels,resize_labels=prepare_input_output(data=data,config=config,device=device)
-
-                if split=='train':
-                    poly_lr_scheduler(config,optimizer,
-                              iter=epoch*N+step,
-                              max_iter=config.epoch*N)
-
-                if config.net_name.startswith('motion'):
-                    start_time=time.time()
-                    outputs=model.forward(images)
-                    total_time+=(time.time()-start_time)
-                    counter+=images[0].shape[0]
-                else:
-                    #assert config.input_format=='n'
-                    start_time=time.time()
-                    outputs=model.forward(torch.cat(images,dim=1))
-                    total_time+=(time.time()-start_time)
-                    counter+=images[0].shape[0]
-
-                if config.net_name=='motion_anet':
-                    mask_gt=torch.squeeze(resize_labels[0],dim=1)
-                    mask_loss_value=0
-                    for mask in outputs['masks']:
-                        mask_loss_value+=seg_loss_fn(mask,mask_gt)
-                elif config.net_name=='motion_diff' or not config.net_name.startswith('motion'):
-                    gt_plus=(resize_labels[0]-resize_labels[1]).clamp_(min=0).float()
-                    gt_minus=(resize_labels[1]-resize_labels[0]).clamp_(min=0).float()
-                    mask_gt=torch.cat([gt_plus,gt_minus,resize_labels[0].float()],dim=1)
-                    ignore_index=255
-
-                    if config.net_name=='motion_diff':
-                        predict=outputs['masks'][0]
+            # no gradient and no DDP buffer broadcast for val, the shards of eval_sampler
+            # may have different number of batches
+            with torch.set_grad_enabled(split=='train'):
+                for step,data in enumerate(tqdm_step,start_step):
+                    images,origin_labels,resize_labels=prepare_input_output(data=data,config=config,device=device)
+
+                    if split=='train':
+                        poly_lr_scheduler(config,optimizer,
+                                  iter=epoch*N+step,
+                                  max_iter=config.epoch*N)
+
+                    if config.net_name.startswith('motion'):
+                        start_time=time.time()
+                        outputs=model.forward(images)
+                        total_time+=(time.time()-start_time)
+                        counter+=images[0].shape[0]
                     else:
-                        predict=outputs
-                    predict[mask_gt==ignore_index]=0
-                    mask_gt[mask_gt==ignore_index]=0
-                    mask_loss_value=seg_loss_fn(predict.float(),mask_gt.float())
-                else:
-                    mask_loss_value=seg_loss_fn(outputs['masks'][0],torch.squeeze(resize_labels[0],dim=1))
-
-                if config['net_name'].find('_stn')>=0:
-                    if config['stn_object']=='features':
-                        stn_loss_value=stn_loss(outputs['features'],resize_labels[0].float(),outputs['pose'],config['pose_mask_reg'])
-                    elif config['stn_object']=='images':
-                        stn_loss_value=stn_loss(outputs['stn_images'],resize_labels[0].float(),outputs['pose'],config['pose_mask_reg'])
+                        #assert config.input_format=='n'
+                        start_time=time.time()
+                        outputs=model.forward(torch.cat(images,dim=1))
+                        total_time+=(time.time()-start_time)
+                        counter+=images[0].shape[0]
+
+                    if config.net_name=='motion_anet':
+                        mask_gt=torch.squeeze(resize_labels[0],dim=1)
+                        mask_loss_value=0
+                        for mask in outputs['masks']:
+                            mask_loss_value+=seg_loss_fn(mask,mask_gt)
+                    elif config.net_name=='motion_diff' or not config.net_name.startswith('motion'):
+                        gt_plus=(resize_labels[0]-resize_labels[1]).clamp_(min=0).float()
+                        gt_minus=(resize_labels[1]-resize_labels[0]).clamp_(min=0).float()
+                        mask_gt=torch.cat([gt_plus,gt_minus,resize_labels[0].float()],dim=1)
+                        ignore_index=255
+
+                        if config.net_name=='motion_diff':
+                            predict=outputs['masks'][0]
+                        else:
+                            predict=outputs
+                        predict[mask_gt==ignore_index]=0
+                        mask_gt[mask_gt==ignore_index]=0
+                        mask_loss_value=seg_loss_fn(predict.float(),mask_gt.float())
                     else:
-                        assert False,'unknown stn object %s'%config['stn_object']
-
-                    total_loss_value=mask_loss_value*config['motion_loss_weight']+stn_loss_value*config['stn_loss_weight']
-                else:
-                    stn_loss_value=torch.tensor(0.0)
-                    total_loss_value=mask_loss_value
+                        mask_loss_value=seg_loss_fn(outputs['masks'][0],torch.squeeze(resize_labels[0],dim=1))
 
-                #assert not torch.isnan(total_loss_value),'find nan loss'
-                if torch.isnan(total_loss_value) or torch.isinf(total_loss_value):
-                    raise RuntimeError("find nan or inf loss")
+                    if config['net_name'].find('_stn')>=0:
+                        if config['stn_object']=='features':
+                            stn_loss_value=stn_loss(outputs['features'],resize_labels[0].float(),outputs['pose'],config['pose_mask_reg'])
+                        elif config['stn_object']=='images':
+                            stn_loss_value=stn_loss(outputs['stn_images'],resize_labels[0].float(),outputs['pose'],config['pose_mask_reg'])
+                        else:
+                            assert False,'unknown stn object %s'%config['stn_object']
 
-                if config.net_name=='motion_diff' or not config.net_name.startswith('motion'):
-                    if config.net_name=='motion_diff':
-                        predict=outputs['masks'][0]
+                        total_loss_value=mask_loss_value*config['motion_loss_weight']+stn_loss_value*config['stn_loss_weight']
                     else:
-                        predict=outputs
-
-                    #predict[:,2:3,:,:]=predict[:,2:3,:,:]+predict[:,0:1,:,:]-predict[:,1:2,:,:]
-                    origin_mask=F.interpolate(predict[:,2:3,:,:], size=origin_labels[0].shape[2:4],mode='bilinear')
-                    origin_mask=torch.cat([1-origin_mask,origin_mask],dim=1)
-                else:
-                    origin_mask=F.interpolate(outputs['masks'][0], size=origin_labels[0].shape[2:4],mode='bilinear')
-
-                motionseg_metric.update({"fmeasure":(origin_mask,origin_labels[0]),
-                                         "stn_loss":stn_loss_value.item(),
-                                         "mask_loss":mask_loss_value.item(),
-                                         "total_loss":total_loss_value.item()})
-
-                if split=='train':
-                    total_loss_value.backward()
-                    if (step_acc+1)>=config.accumulate:
-                        optimizer.step()
-                        optimizer.zero_grad()
-                        step_acc=0
+                        stn_loss_value=torch.tensor(0.0)
+                        total_loss_value=mask_loss_value
+
+                    #assert not torch.isnan(total_loss_value),'find nan loss'
+                    if torch.isnan(total_loss_value) or torch.isinf(total_loss_value):
+                        raise RuntimeError("find nan or inf loss")
+
+                    if config.net_name=='motion_diff' or not config.net_name.startswith('motion'):
+                        if config.net_name=='motion_diff':
+                            predict=outputs['masks'][0]
+                        else:
+                            predict=outputs
+
+                        #predict[:,2:3,:,:]=predict[:,2:3,:,:]+predict[:,0:1,:,:]-predict[:,1:2,:,:]
+                        origin_mask=F.interpolate(predict[:,2:3,:,:], size=origin_labels[0].shape[2:4],mode='bilinear')
+                        origin_mask=torch.cat([1-origin_mask,origin_mask],dim=1)
                     else:
-                        step_acc+=1
+                        origin_mask=F.interpolate(outputs['masks'][0], size=origin_labels[0].shape[2:4],mode='bilinear')
+
+                    motionseg_metric.update({"fmeasure":(origin_mask,origin_labels[0]),
+                                             "stn_loss":stn_loss_value.item(),
+                                             "mask_loss":mask_loss_value.item(),
+                                             "total_loss":total_loss_value.item()})
+
+                    if split=='train':
+                        total_loss_value.backward()
+                        if (step_acc+1)>=config.accumulate:
+                            optimizer.step()
+                            optimizer.zero_grad()
+                            step_acc=0
+                        else:
+                            step_acc+=1
+
+                        step_loader(dataset_loaders[split],images[0].shape[0])
+                        # the state after the last step is saved at the end of epoch
+                        if is_main_process(config) and step_acc==0 and config.resume_save_steps>0 and \
+                            (step+1)%config.resume_save_steps==0 and step+1<N:
+                            save_resume_state(resume_path,model,optimizer,None,train_sampler,epoch,log_dir=log_dir)
+
+            # sum the partial metrics of all ranks
+            if config.use_sync_bn:
+                reduce_metric(motionseg_metric)
 
             if is_main_process(config):
                 fps=counter/total_time
@@ -235,6 +277,12 @@ def train(config,model,seg_loss_fn,optimizer,dataset_loaders):
                     print(split,'fmeasure=%0.4f'%fmeasure,
                           'total_loss=',mean_total_loss)
 
+        # the next epoch start from the first batch
+        if train_sampler is not None:
+            train_sampler.set_epoch(epoch+1)
+        if is_main_process(config):
+            save_resume_state(resume_path,model,optimizer,None,train_sampler,epoch+1,log_dir=log_dir)
+
     if is_main_process(config) and config['save_model']:
         torch.save(model.state_dict(),checkpoint_path)
 
@@ -256,7 +304,7 @@ def compute_fps(config,idx):
 
     for step,data in enumerate(tqdm_step):
         frames=data['images']
-        images = [img.to(device).float() for img in frames]
+        images = normalize_frames(config,[img.to(device) for img in frames])
         start_time=time.time()
         outputs=model.forward(images)
         total_time+=(time.time()-start_time)
@@ -304,7 +352,7 @@ def test(config):
 
                 save_path=xxx_dataset.get_result_path(save_dir,main_path)
                 assert save_path!=main_path
-                images = [img.to(device).float() for img in frames]
+                images = normalize_frames(config,[img.to(device) for img in frames])
                 outputs=model.forward(images)
                 result_mask=F.interpolate(outputs['masks'][0], size=(height,width),mode='nearest')
                 # print(result_mask.shape) # (batch_size,2,height,width)
@@ -395,13 +443,19 @@ if __name__ == '__main__':
 
             batch_size=config.batch_size if split=='train' else 1
 
-            if split=='train':
+            clip_sampler=get_clip_batch_sampler(config,xxx_dataset) if split=='train' else None
+            if clip_sampler is not None:
+                xxx_loader=td.DataLoader(dataset=xxx_dataset,batch_sampler=clip_sampler,num_workers=2,pin_memory=False)
+            elif split=='train':
                 xxx_loader=td.DataLoader(dataset=xxx_dataset,batch_size=batch_size,shuffle=(xxx_sampler is None),drop_last=False,num_workers=2,sampler=xxx_sampler,pin_memory=False)
             else:
                 xxx_loader=td.DataLoader(dataset=xxx_dataset,batch_size=batch_size,shuffle=False,num_workers=2,pin_memory=False)
             dataset_loaders[split]=xxx_loader
 
+            decodes=samples=0
             for idx,data in enumerate(xxx_loader):
+                decodes+=int(data['decodes'].sum())
+                samples+=len(data['decodes'])
                 for key,value in data.items():
                     print(idx,key,type(value))
                     if isinstance(value,(tuple,list)):
@@ -413,6 +467,7 @@ if __name__ == '__main__':
                     else:
                         print(type(value))
 
+            print('{} {}: {:.2f} frame decodes per sample'.format(config.dataset,split,decodes/max(samples,1)))
 
         sys.exit(0)
     elif args.app=='summary':
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+data loader throughput benchmark and per-stage profiler
+
+1. profile: load n samples in this process, the time of each stage in
+   __getitem__ (read, decode, remap, augmentation, resize, edge, normalization,
+   flow), see torchseg/dataset/loader_profiler.py
+2. sweep: samples/sec of DataLoader for each num_workers, batch_size,
+   pin_memory and prefetch_factor
+
+python tools/loader_benchmark.py semantic --dataset_name Cityscapes --num_workers 0,4,8,16 --batch_size 4,8
+python tools/loader_benchmark.py motion --dataset FBMS --input_format o --output ~/tmp/fbms_loader
+
+the report is saved to {output}.json (profile and sweep) and {output}.csv (sweep)
+choose the smallest num_workers near the best samples/sec for --num_workers
+"""
+
+import os
+import csv
+import json
+import time
+import random
+import fire
+import torch
+import torch.utils.data as td
+from torchseg.dataset.dataset_generalize import dataset_generalize, get_sample_normalizations
+from torchseg.dataset.loader_profiler import profile_dataset
+from torchseg.utils.configs.semanticseg_config import get_default_config as get_semantic_config
+from torchseg.utils.configs.motionseg_config import get_default_config as get_motion_config
+from torchseg.models.motionseg.motion_utils import get_dataset as get_motion_dataset
+from torchseg.utils.augmentor import Augmentations
+
+def get_throughput(dataset,num_workers,batch_size,pin_memory,prefetch_factor,n_batch):
+    """
+    return (startup seconds, samples per second after the first batch)
+    """
+    kwargs={}
+    if num_workers>0:
+        kwargs['prefetch_factor']=prefetch_factor
+    loader=td.DataLoader(dataset,batch_size=batch_size,shuffle=True,drop_last=True,
+                         num_workers=num_workers,pin_memory=pin_memory,**kwargs)
+    assert len(loader)>0,'no batch for {} samples with batch_size={} and drop_last=True'.format(len(dataset),batch_size)
+    start=time.perf_counter()
+    samples=0
+    for idx,data in enumerate(loader):
+        if idx==0:
+            # worker startup and the first batch
+            startup=time.perf_counter()-start
+            start=time.perf_counter()
+        else:
+            samples+=batch_size
+        if idx>=n_batch:
+            break
+    return startup,samples/max(time.perf_counter()-start,1e-6)
+
+def benchmark(dataset,note,n=50,num_workers=(0,2,4,8),batch_size=(4,8),
+              pin_memory=(False,),prefetch_factor=(2,),n_batch=20,output=None):
+    random.seed(25)
+    indexes=random.sample(range(len(dataset)),min(n,len(dataset)))
+    profile=profile_dataset(dataset,indexes)
+    print('{}: {} samples'.format(note,len(dataset)))
+    for name,t in profile.items():
+        print('{:>16}: {:.2f} ms per sample'.format(name,t))
+
+    sweep=[]
+    for workers in num_workers:
+        for bs in batch_size:
+            for pin in pin_memory:
+                # prefetch_factor only works with workers
+                for prefetch in (prefetch_factor if workers>0 else [None]):
+                    startup,speed=get_throughput(dataset,workers,bs,pin,prefetch,n_batch)
+                    row={'num_workers':workers,'batch_size':bs,'pin_memory':pin,
+                         'prefetch_factor':prefetch,'startup_s':startup,'samples_per_sec':speed}
+                    print(row)
+                    sweep.append(row)
+
+    best=max(sweep,key=lambda row:row['samples_per_sec'])
+    print('best: {}'.format(best))
+
+    report={'note':note,'cpu_count':os.cpu_count(),'torch':torch.__version__,
+            'profile':profile,'sweep':sweep,'best':best}
+    if output is not None:
+        output=os.path.expanduser(output)
+        os.makedirs(os.path.dirname(os.path.abspath(output)),exist_ok=True)
+        with open(output+'.json','w') as f:
+            json.dump(report,f,indent=2)
+        with open(output+'.csv','w',newline='') as f:
+            writer=csv.DictWriter(f,fieldnames=list(sweep[0].keys()))
+            writer.writeheader()
+            writer.writerows(sweep)
+        print('save report to {}.json and {}.csv'.format(output,output))
+    return report
+
+def semantic(dataset_name='Cityscapes',split='train',input_shape=(224,224),augmentation=True,
+             with_edge=False,norm_ways='pytorch',**kwargs):
+    """
+    dataset_generalize with the default semantic segmentation config
+    kwargs: the arguments of benchmark()
+    """
+    config=get_semantic_config()
+    config.dataset_name=dataset_name
+    config.input_shape=list(input_shape)
+    config.augmentation=augmentation
+    config.with_edge=with_edge
+    config.norm_ways=norm_ways
+    augmentations=Augmentations(config) if augmentation and split=='train' else None
+    dataset=dataset_generalize(config,split=split,augmentations=augmentations,
+                               normalizations=get_sample_normalizations(config))
+    return benchmark(dataset,'{} {}'.format(dataset_name,split),**kwargs)
+
+def motion(dataset='FBMS',split='train',input_shape=(224,224),input_format='n',**kwargs):
+    """
+    get_motionseg_dataset with the default motion segmentation config
+    input_format: o for optical flow
+    """
+    config=get_motion_config()
+    config.dataset=dataset
+    config.input_shape=list(input_shape)
+    config.input_format=input_format
+    return benchmark(get_motion_dataset(config,split),'{} {}'.format(dataset,split),**kwargs)
+
+if __name__ == '__main__':
+    fire.Fire()
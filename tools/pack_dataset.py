@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+pack a dataset split into a few large shard files + one offset index,
+then train with --dataset_backend packed --packed_root xxx
+
+semantic segmentation (dataset_generalize):
+    python tools/pack_dataset.py semantic --dataset_name Cityscapes --split train
+motion segmentation (get_motionseg_dataset):
+    python tools/pack_dataset.py motion --dataset FBMS --split train
+
+the motion dataset choose aux frame randomly, so pack all the files in the
+directories used by the split, and the optical flow files for these frames.
+"""
+
+import os
+import fire
+from tqdm import trange
+from torchseg.dataset.dataset_generalize import dataset_generalize
+from torchseg.dataset.packed_dataset import pack_files, get_packed_path
+from torchseg.dataset.segtrackv2_dataset import main2flow
+from torchseg.utils.configs.semanticseg_config import get_default_config as get_semantic_config
+from torchseg.models.motionseg.motion_utils import get_dataset,get_default_config,fine_tune_config
+
+def flatten_paths(paths):
+    if isinstance(paths,str):
+        return [paths]
+
+    files=[]
+    for p in paths:
+        files+=flatten_paths(p)
+    return files
+
+def semantic(dataset_name='Cityscapes',split='train',packed_root=None,shard_size=1024):
+    config=get_semantic_config()
+    config.dataset_name=dataset_name
+    if packed_root is not None:
+        config.packed_root=packed_root
+
+    # read the original files from disc
+    config.dataset_backend='disc'
+    dataset=dataset_generalize(config,split=split)
+    files=list(dataset.image_files)
+    if split!='test':
+        files+=list(dataset.annotation_files)
+
+    pack_files(files,get_packed_path(config,split),shard_size=shard_size)
+
+def motion(dataset='FBMS',split='train',packed_root=None,shard_size=1024,with_flow=True):
+    config=get_default_config()
+    config.dataset=dataset
+    config=fine_tune_config(config)
+    if packed_root is not None:
+        config.packed_root=packed_root
+
+    # pack all the frames, use_part_number only used for train
+    config.use_part_number=0
+    config.dataset_backend='disc'
+    d=get_dataset(config,split)
+
+    dirs=set()
+    for idx in trange(len(d)):
+        for f in flatten_paths(d.__get_path__(idx)):
+            dirs.add(os.path.dirname(f))
+
+    files=[]
+    for dirname in dirs:
+        for f in os.listdir(dirname):
+            path=os.path.join(dirname,f)
+            if os.path.isfile(path):
+                files.append(path)
+
+    if with_flow:
+        flow_files=[]
+        for f in files:
+            try:
+                flow_path=main2flow(f)
+            except AssertionError:
+                continue
+
+            if os.path.exists(flow_path):
+                flow_files.append(flow_path)
+        print('find %d optical flow files'%len(flow_files))
+        files+=flow_files
+
+    pack_files(files,get_packed_path(config,split),shard_size=shard_size)
+
+if __name__ == '__main__':
+    fire.Fire()
@@ -9,7 +9,7 @@ if '.' not in sys.path:
     sys.path.append('.')
 
 from torchseg.dataset.dataset_generalize import dataset_generalize, \
-    get_dataset_generalize_config, image_normalizations
+    get_dataset_generalize_config, get_sample_normalizations
 from torchseg.utils.augmentor import Augmentations
 from torchseg.utils.torch_tools import keras_fit,get_loaders
 from torchseg.utils import torchsummary
@@ -29,7 +29,7 @@ if __name__ == '__main__':
     # must change batch size here!!!
     batch_size = args.batch_size
     
-    train_loader,val_loader=get_loaders(config)
+    train_loader,val_loader=get_loaders(config,resumable=True)
 
     note = config.note
     test = args.test
@@ -79,7 +79,7 @@ if __name__ == '__main__':
                 config, dataset_name)
             #config.dataset_name = dataset_name.lower()
 
-            coarse_train_loader,coarse_val_loader = get_loaders(config)
+            coarse_train_loader,coarse_val_loader = get_loaders(config,resumable=True)
             keras_fit(net,coarse_train_loader, coarse_val_loader)
     elif test == 'summary':
         net = get_net(config)
@@ -94,10 +94,7 @@ if __name__ == '__main__':
         # train on cityscapes, validation on huawei
         net = get_net(config)
         
-        if config.norm_ways is None:
-            normalizations = None
-        else:
-            normalizations = image_normalizations(config.norm_ways)
+        normalizations = get_sample_normalizations(config)
         
         if config.augmentation:
             augmentations = Augmentations(config)
@@ -1,60 +1,41 @@
 # -*- coding: utf-8 -*-
 
 """
-training without information loss
-    - not resize the mask with cv2.INTER_NEAREST
+rgb mean/std, class pixel counts, class image counts and image sizes
+for dataset in one pass with a process pool, see torchseg/utils/dataset_statistics.py
+
+python tools/research/dataset_mean_std.py --dataset_name Cityscapes --split train --output cityscapes_train.json
+
+use the output json file for training:
+    --norm_ways cityscapes_train.json --class_count_file cityscapes_train.json
 """
 
-from tqdm import trange
+import fire
 import sys
 from pprint import pprint
 
 if '.' not in sys.path:
     sys.path.append('.')
 from torchseg.dataset.dataset_generalize import dataset_generalize,get_dataset_generalize_config
-from torchseg.utils.survey import dataset_mean, dataset_std, dataset_class_count
- 
-def static_dataset(dataset_name,split='train'):
-    config=get_dataset_generalize_config(None,dataset_name)
-    dataset=dataset_generalize(config,split=split,bchw=False)
-    
-    N=len(dataset)
-    MEAN=dataset_mean()
-    for idx in trange(N):
-        img,ann=dataset.__getitem__(idx)
-        MEAN.update(img)
-        
-    mean=MEAN.summary()
-    
-    STD=dataset_std(mean)
-    for idx in trange(N):
-        img,ann=dataset.__getitem__(idx)
-        STD.update(img)
-    
-    std=STD.summary()
-    
-    return mean,std
-
-def class_weight_count(dataset_name,split='train'):
+from torchseg.utils.dataset_statistics import get_dataset_statistics, save_statistics
+
+def static_dataset(dataset_name='HuaWei',split='train',num_workers=8,output=None):
     config=get_dataset_generalize_config(None,dataset_name)
     dataset=dataset_generalize(config,split=split,bchw=False)
-    
-    N=len(dataset)
-    class_number=len(config.foreground_class_ids)
-    COUNT=dataset_class_count(class_number)
-    for idx in trange(N):
-        img,ann=dataset.__getitem__(idx)
-        COUNT.update(ann)
-        
-    count=COUNT.summary()
-    return count
+    if config.ignore_index==0:
+        class_number=len(config.foreground_class_ids)+1
+    else:
+        class_number=len(config.foreground_class_ids)
+
+    stats=get_dataset_statistics(dataset,class_number,num_workers=num_workers)
+    summary=stats.summary()
+    print(f'{dataset_name} {split} RGB mean={summary["mean_rgb"]} RGB std={summary["std_rgb"]}')
+    print(f'{dataset_name} {split} class count')
+    pprint(summary['class_counts'])
+    if output is not None:
+        save_statistics(summary,output)
+        print(f'save statistics to {output}')
+    return summary
 
 if __name__ == '__main__':
-    for dataset_name in ['HuaWei']:
-        for split in ['train','val']:
-            #mean,std=static_dataset(dataset_name,split)
-            #print(f'{dataset_name} {split} RGB mean={mean} RGB std={std}')
-            
-            count=class_weight_count(dataset_name,split)
-            print(f'{dataset_name} {split} class count \n')
-            pprint(count)
\ No newline at end of file
+    fire.Fire(static_dataset)
@@ -4,7 +4,8 @@ experiment on downsample and miou
 """
 
 from torchseg.dataset.dataset_generalize import dataset_generalize, \
-    get_dataset_generalize_config
+    get_dataset_generalize_config, read_ann_file
+from torchseg.dataset.label_remap import label_remap
 
 from torchseg.utils.metrics import runningScore
 import cv2
@@ -20,6 +21,10 @@ if __name__ == '__main__':
                                      normalizations=None)
     
     N=len(val_dataset)
+    # only the annotation is needed, skip image decode in val_dataset.__getitem__
+    remap=label_remap(config)
+    def get_ann(idx):
+        return remap(read_ann_file(val_dataset.annotation_files[idx]))
     
     if config.ignore_index == 0:
         config.class_number = len(config.foreground_class_ids)+1
@@ -32,7 +37,7 @@ if __name__ == '__main__':
     for scale in range(2,9):
         metric.reset()
         for i in range(N):
-            img,ann=val_dataset.__getitem__(i)
+            ann=get_ann(i)
             
             
             h,w=ann.shape
@@ -54,7 +59,7 @@ if __name__ == '__main__':
     for scale in [0.9,0.8, 0.7, 0.6, 0.5]:
         metric.reset()
         for i in range(N):
-            img,ann=val_dataset.__getitem__(i)
+            ann=get_ann(i)
             
             
             h,w=ann.shape
@@ -77,7 +82,7 @@ if __name__ == '__main__':
     for size in [(224,224),(256,256),(256,512),(512,1024)]:
         metric.reset()
         for i in range(N):
-            img,ann=val_dataset.__getitem__(i)
+            ann=get_ann(i)
             
             ann[ann==config.ignore_index]=0
             h,w=ann.shape
@@ -6,6 +6,7 @@ import numpy as np
 import random
 import cv2
 from .segtrackv2_dataset import motionseg_dataset
+from .path_table import path_table
 
 class bmcnet_dataset(motionseg_dataset):
     """
@@ -46,7 +47,7 @@ class bmcnet_dataset(motionseg_dataset):
     def __init__(self,config,split='train',normalizations=None,augmentations=None):
         super().__init__(config,split,normalizations,augmentations)
 
-        self.main_files=self.get_main_files()
+        self.main_files=self.manifest.get_list('main_files',self.get_main_files)
         print('dataset size = {}',len(self.main_files))
         n=len(self.main_files)
         if n > self.config.use_part_number > 0:
@@ -54,9 +55,20 @@ class bmcnet_dataset(motionseg_dataset):
             self.main_files=self.main_files[::gap]
             print('total dataset image %d, use %d'%(n,len(self.main_files)))
 
+        # list the input and truth frames once, see frame_index.py
+        input_dirs=set([os.path.dirname(f) for f in self.main_files])
+        gt_dirs=set([os.path.dirname(self.get_gt_file(f)) for f in self.main_files])
+        self.frame_index.build(list(input_dirs)+list(gt_dirs))
+        # compact path list for forked dataloader workers, see path_table.py
+        self.main_files=path_table(self.main_files)
+        self.manifest.close()
+
     def __len__(self):
         return len(self.main_files)
 
+    def get_main_path(self,index):
+        return self.main_files[index]
+
     def get_main_files(self):
         if self.split=='train':
             rootpath=os.path.join(self.root_path,'train')
@@ -73,14 +85,12 @@ class bmcnet_dataset(motionseg_dataset):
 
     def get_aux_file(self,main_file):
         dirname=os.path.dirname(main_file)
-        pattern=os.path.join(dirname,'*.png')
-        aux_files=glob.glob(pattern)
-        aux_files.sort()
-        assert len(aux_files)>0,'main_file={},pattern={}'.format(main_file,pattern)
-
-        main_index=aux_files.index(main_file)
-        aux_files.remove(main_file)
-        n=len(aux_files)
+        aux_files=self.frame_index.files(dirname,'.png')
+        assert len(aux_files)>0,'main_file={},dirname={}'.format(main_file,dirname)
+
+        main_index=self.frame_index.position(main_file,'.png')
+        # the number of frames except main_file
+        n=len(aux_files)-1
         if self.frame_gap==0:
             frame_gap=random.randint(1,10)
         else:
@@ -93,6 +103,10 @@ class bmcnet_dataset(motionseg_dataset):
         else:
             aux_index=main_index-frame_gap
             aux_index=aux_index if aux_index>=0 else 0
+
+        # skip main_file in aux_files
+        if aux_index>=main_index:
+            aux_index+=1
         return aux_files[aux_index]
 
     def get_gt_file(self,main_file):
@@ -114,16 +128,16 @@ class bmcnet_dataset(motionseg_dataset):
         main_file=self.main_files[index]
         aux_file=self.get_aux_file(main_file)
         
-        frame_images=[cv2.imread(f,cv2.IMREAD_COLOR) for f in [main_file,aux_file]]
-        gt_image=cv2.imread(gt_files[0],cv2.IMREAD_GRAYSCALE)
+        frame_images=[self.imread_frame(f) for f in [main_file,aux_file]]
+        gt_image=self.store.imread(gt_files[0],cv2.IMREAD_GRAYSCALE)
         
         labels=[]
         label=np.zeros_like(gt_image)
         label[gt_image>0]=1
         
         labels.append(label)
-        if os.path.exists(gt_files[1]):
-            aux_gt_image=cv2.imread(gt_files[1],cv2.IMREAD_GRAYSCALE)
+        if self.frame_index.exists(gt_files[1]):
+            aux_gt_image=self.store.imread(gt_files[1],cv2.IMREAD_GRAYSCALE)
             aux_label=np.zeros_like(aux_gt_image)
             aux_label[aux_gt_image>0]=1
             labels.append(aux_label)
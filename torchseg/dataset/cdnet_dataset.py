@@ -5,6 +5,7 @@ import random
 import numpy as np
 import cv2
 from .segtrackv2_dataset import motionseg_dataset
+from .path_table import path_table
 
 class cdnet_dataset(motionseg_dataset):
     def __init__(self,config,split='train',normalizations=None, augmentations=None):
@@ -12,7 +13,7 @@ class cdnet_dataset(motionseg_dataset):
 
         self.train_set=set()
         self.val_set=set()
-        self.main_files=self.get_main_files(self.config.root_path)
+        self.main_files=self.manifest.get_list('main_files',lambda: self.get_main_files(self.config.root_path))
 
 
         if self.split in ['train','val','val_path']:
@@ -25,6 +26,14 @@ class cdnet_dataset(motionseg_dataset):
             assert False
         else:
             assert False
+
+        # list the input and groundtruth frames once, see frame_index.py
+        input_dirs=set([os.path.dirname(f) for f in self.main_files])
+        gt_dirs=[os.path.join(os.path.dirname(d),'groundtruth') for d in input_dirs]
+        self.frame_index.build(list(input_dirs)+gt_dirs)
+        # compact path list for forked dataloader workers, see path_table.py
+        self.main_files=path_table(self.main_files)
+        self.manifest.close()
         # random part
 #            if self.config['use_part_number'] > 0:
 #                n=len(self.img_path_pairs)
@@ -37,6 +46,9 @@ class cdnet_dataset(motionseg_dataset):
     def __len__(self):
         return len(self.main_files)
 
+    def get_main_path(self,index):
+        return self.main_files[index]
+
     def get_image_path(self, root_path, category, sub_category, data_type, frame_num):
         """
         root_path: root_path for dataset
@@ -73,21 +85,21 @@ class cdnet_dataset(motionseg_dataset):
         if x>0.5:
             aux_img_path=self.get_image_path(root_path,category,sub_category,'in',frame_number+frame_gap)
             aux_gt_path=self.get_image_path(root_path,category,sub_category,'gt',frame_number+frame_gap)
-            if not os.path.exists(aux_img_path):
+            if not self.frame_index.exists(aux_img_path):
                 aux_img_path=self.get_image_path(root_path,category,sub_category,'in',frame_number-frame_gap)
                 aux_gt_path=self.get_image_path(root_path,category,sub_category,'gt',frame_number-frame_gap)
         else:
             aux_img_path=self.get_image_path(root_path,category,sub_category,'in',frame_number-frame_gap)
             aux_gt_path=self.get_image_path(root_path,category,sub_category,'gt',frame_number-frame_gap)
-            if not os.path.exists(aux_img_path):
+            if not self.frame_index.exists(aux_img_path):
                 aux_img_path=self.get_image_path(root_path,category,sub_category,'in',frame_number+frame_gap)
                 aux_gt_path=self.get_image_path(root_path,category,sub_category,'gt',frame_number+frame_gap)
 
 
-        assert os.path.exists(main_img_path),'main path not exists %s'%main_img_path
-        assert os.path.exists(aux_img_path),'aux path not exists %s'%aux_img_path
-        assert os.path.exists(gt_img_path),'gt path not exists %s'%gt_img_path
-        assert os.path.exists(aux_gt_path),'aux gt path not exists %s'%aux_gt_path
+        assert self.frame_index.exists(main_img_path),'main path not exists %s'%main_img_path
+        assert self.frame_index.exists(aux_img_path),'aux path not exists %s'%aux_img_path
+        assert self.frame_index.exists(gt_img_path),'gt path not exists %s'%gt_img_path
+        assert self.frame_index.exists(aux_gt_path),'aux gt path not exists %s'%aux_gt_path
 
         return (main_img_path,aux_img_path,gt_img_path,aux_gt_path)
 
@@ -172,8 +184,8 @@ class cdnet_dataset(motionseg_dataset):
     def __get_image__(self,index):
         main_img_path,aux_img_path,gt_img_path,aux_gt_path=self.__get_path__(index)
 
-        frame_images=[cv2.imread(f,cv2.IMREAD_COLOR) for f in [main_img_path,aux_img_path]]
-        gt_images=[cv2.imread(p,cv2.IMREAD_GRAYSCALE) for p in [gt_img_path,aux_gt_path]]
+        frame_images=[self.imread_frame(f) for f in [main_img_path,aux_img_path]]
+        gt_images=[self.store.imread(p,cv2.IMREAD_GRAYSCALE) for p in [gt_img_path,aux_gt_path]]
 
         def convert_label(img):
             labels=np.zeros_like(img)
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+per-image class histogram index for dataset_generalize
+
+the raw label histogram of each annotation file is computed once with a
+process pool and cached in the dataset manifest (see dataset_manifest.py),
+then remapped to train ids with the remap table of each dataset, so it
+follows dataset_use_part and merged datasets.
+
+- class counts: sum of the histograms, replace the hardcoded config.counts
+  for class weight when config.auto_class_counts is True
+- rare class sampler: config.sampler='rare_class', repeat factor sampling
+    r(c)=max(1,sqrt(threshold/f(c))), f(c) is the fraction of images contain class c
+    r(i)=max(r(c) for c in image i)
+  image i is sampled with probability r(i)/sum(r), with replacement
+
+reference: LVIS: A Dataset for Large Vocabulary Instance Segmentation
+"""
+import math
+import numpy as np
+import torch
+import torch.utils.data as td
+import torch.distributed as dist
+from multiprocessing import Pool
+from tqdm import tqdm
+
+from .dataset_manifest import dataset_manifest
+from .resumable_sampler import resumable_state, resumable_sampler, get_random_seed
+
+# the file store for each worker process
+worker_store=None
+
+def init_worker(store):
+    global worker_store
+    worker_store=store
+
+def histogram_worker(path):
+    return path,dataset_manifest.compute_histogram(worker_store.read_label(path))
+
+def remap_histogram(raw_hist,table,class_number):
+    """
+    raw_hist: {raw label id: pixel number}
+    table: remap table from raw label id to train id, see label_remap.py
+    return the pixel number for each train id in [0,class_number)
+    """
+    hist=np.zeros(class_number,dtype=np.int64)
+    for c,n in raw_hist.items():
+        t=int(table[c])
+        if t<class_number:
+            hist[t]+=n
+    return hist
+
+def get_raw_histograms(dataset,num_workers=8):
+    """
+    return {annotation file: raw label histogram}, compute the missing histograms with a process pool
+    """
+    manifest=dataset_manifest(dataset.store,dataset.manifest_file)
+    hists={}
+    for path in dataset.annotation_files:
+        if path not in hists.keys():
+            hists[path]=manifest.cached_histogram(path)
+
+    todo=[path for path,hist in hists.items() if hist is None]
+    if len(todo)>0:
+        with Pool(num_workers,initializer=init_worker,initargs=(dataset.store,)) as p:
+            for path,hist in tqdm(p.imap_unordered(histogram_worker,todo,chunksize=16),
+                                  total=len(todo),desc='class histogram'):
+                hists[path]=hist
+                if manifest.cache_file is not None:
+                    manifest.update(path,hist=hist)
+        manifest.save()
+    return hists
+
+def get_class_histograms(dataset,class_number,num_workers=8):
+    """
+    dataset: dataset_generalize or ConcatDataset of dataset_generalize
+    return the train id histogram with shape [len(dataset),class_number]
+    """
+    if isinstance(dataset,td.ConcatDataset):
+        return np.concatenate([get_class_histograms(d,class_number,num_workers) for d in dataset.datasets],axis=0)
+
+    hists=get_raw_histograms(dataset,num_workers)
+    table=dataset.remap.table
+    result=np.zeros((len(dataset),class_number),dtype=np.int64)
+    for idx,path in enumerate(dataset.annotation_files):
+        result[idx]=remap_histogram(hists[path],table,class_number)
+    return result
+
+def get_repeat_factors(histograms,threshold=0.1):
+    """
+    return the repeat factor for each image, see the module doc
+    """
+    n=histograms.shape[0]
+    contain=histograms>0
+    freq=np.maximum(contain.sum(axis=0)/max(n,1),1e-12)
+    class_factors=np.maximum(1.0,np.sqrt(threshold/freq))
+    factors=np.where(contain,class_factors[None,:],1.0).max(axis=1)
+    return factors
+
+class class_balanced_sampler(resumable_state,td.Sampler):
+    """
+    sample len(weights) indices with replacement, index i with probability weights[i]/sum(weights)
+    the indices only depend on seed+epoch, call set_epoch() for each epoch.
+    for distributed training, all ranks use the same seed and each rank use indices[rank::num_replicas]
+    seed=None: random seed, not for distributed training
+    """
+    def __init__(self,weights,num_samples=None,num_replicas=1,rank=0,seed=0):
+        self.weights=torch.as_tensor(weights,dtype=torch.double)
+        self.num_samples=len(weights) if num_samples is None else num_samples
+        self.num_replicas=num_replicas
+        self.rank=rank
+        assert seed is not None or num_replicas==1,'distributed sampler need the same seed for all ranks'
+        self.init_state(get_random_seed() if seed is None else seed)
+        self.num_local=int(math.ceil(self.num_samples/self.num_replicas))
+
+    def __iter__(self):
+        g=torch.Generator()
+        g.manual_seed(self.seed+self.epoch)
+        indices=torch.multinomial(self.weights,self.num_local*self.num_replicas,replacement=True,generator=g)
+        return iter(indices[self.rank::self.num_replicas].tolist()[self.start:])
+
+    def __len__(self):
+        return self.num_local
+
+def get_train_sampler(config,dataset,distributed=False,resumable=True):
+    """
+    return the resumable sampler for train dataset from config.sampler
+    resumable=False: for the trainers which never call set_loader_epoch(),
+    the rare class sampler draw new random indices for each iteration
+    """
+    sampler=config.sampler if hasattr(config,'sampler') else 'uniform'
+    seed=config.seed if hasattr(config,'seed') and config.seed is not None else None
+    if distributed:
+        # the same seed for all ranks
+        seed=0 if seed is None else seed
+        num_replicas,rank=dist.get_world_size(),dist.get_rank()
+    else:
+        num_replicas,rank=1,0
+
+    if sampler in [None,'uniform']:
+        return resumable_sampler(len(dataset),num_replicas=num_replicas,rank=rank,seed=seed)
+    elif sampler=='rare_class':
+        threshold=config.sampler_threshold if hasattr(config,'sampler_threshold') else 0.1
+        histograms=get_class_histograms(dataset,config.class_number)
+        weights=get_repeat_factors(histograms,threshold)
+        print('rare class sampler: repeat factor in [{:.2f},{:.2f}], mean {:.2f}'.format(
+            np.min(weights),np.max(weights),np.mean(weights)))
+        if not resumable:
+            assert not distributed,'distributed rare class sampler should be resumable'
+            return td.WeightedRandomSampler(weights,len(weights),replacement=True)
+        return class_balanced_sampler(weights,num_replicas=num_replicas,rank=rank,seed=seed)
+    else:
+        assert False,'unknown sampler {}'.format(sampler)
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+video clip batch sampler and frame cache for motion segmentation datasets
+
+with shuffled sampling, each sample decode its main frame and one aux frame
+frame_gap away, the neighbor frames of the same video are decoded again and
+again for different samples. in clip mode:
+
+- clip_batch_sampler split each video into clips of clip_length neighbor
+  samples, and each batch is made of whole clips. a batch is loaded by one
+  dataloader worker, so the frames of a clip window are decoded once and
+  shared by all (main,aux,gt) pairs of the clip.
+- the clips are drawn randomly from a shuffle buffer of clip_shuffle_buffer
+  clips to keep the batches diverse, and the samples in a batch are shuffled.
+- frame_cache is the LRU cache of decoded frames in each worker.
+- random frame_gap (config.frame_gap=0) is kept, the aux frame may fall out
+  of the clip window, then it is decoded once more.
+
+each sample return data['decodes'], the number of frame decodes for it,
+sum(data['decodes'])/number of samples is the decodes-per-sample ratio,
+2.0 for the default loader.
+
+usage:
+    config.clip_length=4
+    batch_sampler=get_clip_batch_sampler(config,dataset)
+    loader=td.DataLoader(dataset,batch_sampler=batch_sampler,num_workers=2)
+"""
+import os
+import random
+from collections import OrderedDict
+import torch.utils.data as td
+import torch.distributed as dist
+from .resumable_sampler import resumable_state, get_random_seed
+
+class frame_cache():
+    """
+    LRU cache for decoded frames, {path: image}
+    """
+    def __init__(self,capacity=32):
+        self.capacity=capacity
+        self.frames=OrderedDict()
+
+    def get(self,path,read_fn):
+        """
+        return the cached frame for path, or read_fn(path) and cache it
+        """
+        if path in self.frames:
+            self.frames.move_to_end(path)
+            return self.frames[path]
+
+        img=read_fn(path)
+        self.frames[path]=img
+        if len(self.frames)>self.capacity:
+            self.frames.popitem(last=False)
+        return img
+
+def get_video_keys(dataset):
+    """
+    return the video key of each sample in dataset, support ConcatDataset
+    """
+    if isinstance(dataset,td.ConcatDataset):
+        keys=[]
+        for idx,d in enumerate(dataset.datasets):
+            keys+=[(idx,key) for key in get_video_keys(d)]
+        return keys
+    return [os.path.dirname(dataset.get_main_path(i)) for i in range(len(dataset))]
+
+def get_clips(video_keys,clip_length):
+    """
+    split the neighbor samples of the same video into clips with max length clip_length
+    the samples of a video are neighbor in the dataset, they are sorted by path
+    """
+    clips=[]
+    clip=[]
+    for idx,key in enumerate(video_keys):
+        if len(clip)>0 and (len(clip)>=clip_length or video_keys[clip[0]]!=key):
+            clips.append(clip)
+            clip=[]
+        clip.append(idx)
+    if len(clip)>0:
+        clips.append(clip)
+    return clips
+
+class clip_batch_sampler(resumable_state,td.Sampler):
+    """
+    batch sampler, each batch is made of whole clips drawn from a shuffle buffer
+    the batches only depend on seed+epoch, call set_epoch() for each epoch, start is the consumed batches
+    for distributed training, each rank use batches[rank::num_replicas]
+    """
+    def __init__(self,video_keys,batch_size,clip_length=4,shuffle_buffer=8,
+                 drop_last=True,num_replicas=1,rank=0,seed=None):
+        # one clip should not cross batches
+        self.clips=get_clips(video_keys,min(clip_length,batch_size))
+        self.num_samples=len(video_keys)
+        self.batch_size=batch_size
+        self.shuffle_buffer=max(1,shuffle_buffer)
+        self.drop_last=drop_last
+        self.num_replicas=num_replicas
+        self.rank=rank
+        assert seed is not None or num_replicas==1,'distributed sampler need the same seed for all ranks'
+        self.init_state(get_random_seed() if seed is None else seed)
+
+    def get_batches(self,rng):
+        clips=list(self.clips)
+        rng.shuffle(clips)
+
+        batches=[]
+        batch=[]
+        buffer=[]
+        while len(clips)>0 or len(buffer)>0:
+            while len(clips)>0 and len(buffer)<self.shuffle_buffer:
+                buffer.append(clips.pop())
+
+            clip=buffer.pop(rng.randrange(len(buffer)))
+            if len(batch)+len(clip)>self.batch_size:
+                # fill the batch with part of the clip, keep the rest in buffer
+                n=self.batch_size-len(batch)
+                batch+=clip[0:n]
+                buffer.append(clip[n:])
+            else:
+                batch+=clip
+
+            if len(batch)==self.batch_size:
+                rng.shuffle(batch)
+                batches.append(batch)
+                batch=[]
+
+        if len(batch)>0 and not self.drop_last:
+            batches.append(batch)
+        return batches
+
+    def __iter__(self):
+        rng=random.Random(self.seed+self.epoch)
+        batches=self.get_batches(rng)
+        if self.num_replicas>1:
+            # the same batch number for all ranks
+            n=len(batches)//self.num_replicas
+            batches=batches[self.rank:n*self.num_replicas:self.num_replicas]
+        return iter(batches[self.start:])
+
+    def __len__(self):
+        if self.drop_last:
+            n=self.num_samples//self.batch_size
+        else:
+            n=(self.num_samples+self.batch_size-1)//self.batch_size
+        if self.num_replicas>1:
+            n=n//self.num_replicas
+        return n
+
+def get_clip_batch_sampler(config,dataset,batch_size=None,distributed=False):
+    """
+    return clip_batch_sampler for config.clip_length>0, otherwise None
+    """
+    clip_length=config.clip_length if hasattr(config,'clip_length') else 0
+    if clip_length<=0:
+        return None
+
+    if batch_size is None:
+        batch_size=config.batch_size
+    shuffle_buffer=config.clip_shuffle_buffer if hasattr(config,'clip_shuffle_buffer') else 8
+    video_keys=get_video_keys(dataset)
+    seed=config.seed if hasattr(config,'seed') and config.seed is not None else None
+    if distributed:
+        seed=0 if seed is None else seed
+        return clip_batch_sampler(video_keys,batch_size,clip_length,shuffle_buffer,
+                                  num_replicas=dist.get_world_size(),rank=dist.get_rank(),seed=seed)
+    else:
+        return clip_batch_sampler(video_keys,batch_size,clip_length,shuffle_buffer,seed=seed)
@@ -28,16 +28,26 @@ ade20k
     num_classes=151
     ignore_index=0
 """
+import torch
 import torch.utils.data as TD
 import os
+import json
 import cv2
 import numpy as np
 from easydict import EasyDict as edict
 from PIL import Image
 import warnings
 
-from .json2labelImg import createLabelImage
-from .labels_cityscapes import id2catId
+from .label_cache import read_json_label
+from .label_remap import get_remap_table, label_remap
+from .path_table import path_table
+from .dataset_manifest import dataset_manifest, get_manifest_file
+from .packed_dataset import get_file_store
+from .reduced_decode import imread_reduced
+from .tile_store import get_tile_store
+from .edge_label import get_edge_label, read_edge_label
+from .resumable_sampler import seed_sample
+from .loader_profiler import disabled_profiler
 
 support_datasets = ['ADEChallengeData2016', 'VOC2012', 'Kitti2015',
                         'Cityscapes', 'Cityscapes_Fine', 'Cityscapes_Coarse', 
@@ -139,13 +149,18 @@ def get_dataset_generalize_config(config, dataset_name):
     else:
         assert False, 'Not Implement for dataset %s' % dataset_name
 
+    # remap raw label id to train id with one lookup table
+    config.remap_table = get_remap_table(config)
     return config
 
-def read_ann_file(lbl_path):
+def read_ann_file(lbl_path, label_cache_dir=None):
+    """
+    label_cache_dir: cache directory for rasterized json annotation, see label_cache.py
+    """
     if not lbl_path.endswith(('.json')):
         lbl_pil = Image.open(lbl_path)
     else:
-        lbl_pil = createLabelImage(lbl_path)
+        return read_json_label(lbl_path, label_cache_dir)
         
     lbl = np.array(lbl_pil, dtype=np.uint8)
     return lbl
@@ -181,6 +196,18 @@ class dataset_generalize(TD.Dataset):
         self.split = split
         self.normalizations = normalizations
         self.step = 0
+        # disc_store or packed_store, see packed_dataset.py
+        self.store = get_file_store(self.config, self.split)
+        self.reduced_decode = self.use_reduced_decode()
+        # read the random crop region only, see tile_store.py
+        self.tile_store = get_tile_store(self.config)
+        # time the stages of __getitem__, see loader_profiler.py
+        self.profiler = disabled_profiler
+        # keep a copy, self.config may be shared by merged datasets
+        self.root_path = self.config.root_path
+        # cached file lists and image shapes, see dataset_manifest.py
+        self.manifest_file = get_manifest_file(self.config, self.split)
+        self.manifest = dataset_manifest(self.store, self.manifest_file)
 
         splits = ['train', 'val', 'test', 'train_extra']
         assert self.split in splits, 'unexcepted split %s for dataset, must be one of %s' % (
@@ -195,14 +222,12 @@ class dataset_generalize(TD.Dataset):
         if self.split == 'test':
             if hasattr(self.config, 'txt_path'):
                 txt_file = os.path.join(config.txt_path, self.imageset_filename)
-                self.image_files, self.annotations_files = self.get_files_from_txt(
-                        txt_file, self.config.root_path)
+                self.image_files, self.annotations_files = self.read_files_from_txt(txt_file)
             else:
                 image_txt_file = os.path.join(
                     config.image_txt_path, self.imageset_filename)
 
-                self.image_files = self.get_files_from_txt(
-                        image_txt_file, self.config.root_path)
+                self.image_files = self.read_files_from_txt(image_txt_file)
 
             assert len(self.image_files) > 0, 'No files found in %s with %s' % (
                     self.config.root_path, image_txt_file)
@@ -212,8 +237,7 @@ class dataset_generalize(TD.Dataset):
         else:
             if hasattr(self.config, 'txt_path'):
                 txt_file = os.path.join(config.txt_path, self.imageset_filename)
-                self.image_files, self.annotation_files = self.get_files_from_txt(
-                    txt_file, self.config.root_path)
+                self.image_files, self.annotation_files = self.read_files_from_txt(txt_file)
                 assert len(self.image_files) > 0, 'No files found in %s with %s' % (
                     self.config.root_path, txt_file)
                 assert len(self.annotation_files) > 0, 'No files found in %s with %s' % (
@@ -227,10 +251,8 @@ class dataset_generalize(TD.Dataset):
                     config.image_txt_path, self.imageset_filename)
                 annotation_txt_file = os.path.join(
                     config.annotation_txt_path, self.imageset_filename)
-                self.image_files = self.get_files_from_txt(
-                    image_txt_file, self.config.root_path)
-                self.annotation_files = self.get_files_from_txt(
-                    annotation_txt_file, self.config.root_path)
+                self.image_files = self.read_files_from_txt(image_txt_file)
+                self.annotation_files = self.read_files_from_txt(annotation_txt_file)
                 assert len(self.image_files) > 0, 'No files found in %s with %s' % (
                     self.config.root_path, image_txt_file)
                 assert len(self.annotation_files) > 0, 'No files found in %s with %s' % (
@@ -242,6 +264,8 @@ class dataset_generalize(TD.Dataset):
                 self.ignore_index = self.config.ignore_index
             else:
                 self.ignore_index = 0
+            # 256-entry lookup table from foreground_class_ids and ignore_index, see label_remap.py
+            self.remap = label_remap(self.config)
 
             print("%s %s: Found %d image files, %d annotation files" %
                   (config.dataset_name, split, 
@@ -259,6 +283,77 @@ class dataset_generalize(TD.Dataset):
                            len(self.image_files),
                            len(self.annotation_files)))
 
+        # compact path list for forked dataloader workers, see path_table.py
+        self.image_files = path_table(self.image_files)
+        if hasattr(self, 'annotation_files'):
+            self.annotation_files = path_table(self.annotation_files)
+        self.manifest.close()
+
+    def use_reduced_decode(self):
+        """
+        decode image with reduced factor 2/4/8 when config.reduced_decode
+        disable for random crop, which need the full resolution image
+        """
+        if not (hasattr(self.config, 'reduced_decode') and self.config.reduced_decode):
+            return False
+
+        if not hasattr(self.config, 'input_shape') or self.config.input_shape is None:
+            return False
+
+        if self.augmentations is not None and self.split == 'train':
+            if not hasattr(self.config, 'augmentation') or self.config.augmentation:
+                if not hasattr(self.config, 'use_crop') or self.config.use_crop:
+                    warnings.warn('disable reduced decode for train with crop augmentation')
+                    return False
+
+        return True
+
+    def get_decode_shape(self):
+        """
+        the reduced image should not smaller than input_shape and output_shape
+        """
+        shape = list(self.config.input_shape)
+        if hasattr(self.config,'upsample_type') and self.config.upsample_type =='lossless':
+            if hasattr(self.config,'output_shape') and self.config.output_shape is not None:
+                shape = [max(a,b) for a,b in zip(shape, self.config.output_shape)]
+        return shape
+
+    def get_crop_rect(self, index):
+        """
+        sample the random crop before decode when the image and label have tile files
+        return (x1,y1,th,tw) or None
+        """
+        if self.tile_store is None or self.split != 'train' or self.augmentations is None:
+            return None
+        if hasattr(self.config, 'augmentation') and not self.config.augmentation:
+            return None
+
+        img_shape = self.tile_store.shape(self.image_files[index])
+        if img_shape is None or not self.tile_store.exists(self.annotation_files[index]):
+            return None
+        return self.augmentations.get_crop_rect(img_shape)
+
+    def read_image(self, img_path):
+        """
+        return the rgb image, reduced image when self.reduced_decode
+        """
+        if self.reduced_decode:
+            pyramid_root = self.config.pyramid_root if hasattr(self.config, 'pyramid_root') else None
+            img, _ = imread_reduced(self.store, img_path, self.get_decode_shape(), cv2.IMREAD_COLOR,
+                                    pyramid_root=pyramid_root, root_path=self.root_path)
+        else:
+            img = self.store.imread(img_path, cv2.IMREAD_COLOR)
+        assert img is not None, 'empty image for path %s' % img_path
+        return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+    def read_files_from_txt(self, txt_file):
+        """
+        get_files_from_txt with manifest cache, rebuild when txt_file changed
+        """
+        return self.manifest.get_list(txt_file,
+                                      lambda: self.get_files_from_txt(txt_file, self.root_path),
+                                      [txt_file])
+
     @staticmethod
     def get_files_from_txt(txt_file, root_path):
         with open(txt_file, 'r') as f:
@@ -287,7 +382,7 @@ class dataset_generalize(TD.Dataset):
         """
         return image and annotation
         
-        1. opencv read image, convert color from BGR to RGB for image
+        1. opencv read image (reduced decode if config.reduced_decode), convert color from BGR to RGB for image
         2. PIL image read annotation image or load json annotation
         3. remap annotation according to foreground_class_ids
         4. augmentation on image only
@@ -306,12 +401,27 @@ class dataset_generalize(TD.Dataset):
         -------
         None.
 
+        """
+        # the random augmentation only depend on (seed, epoch, index), see resumable_sampler.py
+        with seed_sample(self, index):
+            return self.load_sample(index)
+
+    def load_sample(self, index):
+        """
+        __getitem__ with the random generators seeded for the index
         """
         self.step = self.step+1
         # eg root_path/leftImg8bit_trainvaltest/leftImg8bit/test/berlin/berlin_000000_000019_leftImg8bit.png
         img_path = self.image_files[index]
-        img = cv2.imread(img_path, cv2.IMREAD_COLOR)
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        # the label is random augmented or not, for edge label cache
+        augmented = False
+        ann = None
+        crop_rect = self.get_crop_rect(index)
+        if crop_rect is None:
+            img = self.read_image(img_path)
+        else:
+            with self.profiler.stage('decode'):
+                img = cv2.cvtColor(self.tile_store.read_region(img_path, crop_rect), cv2.COLOR_BGR2RGB)
         
         if self.split != 'test':
             # eg root_path/gtFine_trainvaltest/gtFine/test/berlin/berlin_000000_000019_gtFine_labelIds.png
@@ -322,80 +432,39 @@ class dataset_generalize(TD.Dataset):
                     print('image path:', img_path)
                     print('label path:', lbl_path)
     #        lbl = cv2.imread(lbl_path,cv2.IMREAD_GRAYSCALE)
-            if not lbl_path.endswith(('.json')):
-                lbl_pil = Image.open(lbl_path)
+            if crop_rect is None:
+                lbl = self.store.read_label(lbl_path)
             else:
-                lbl_pil = createLabelImage(lbl_path)
-                
-            lbl = np.array(lbl_pil, dtype=np.uint8)
-            assert img is not None, 'empty image for path %s' % img_path
-
-            ann = np.zeros_like(lbl)+self.ignore_index
-
-    #        lbl_ids = np.unique(lbl)
-    #        print('label image ids',lbl_ids)
-            if self.ignore_index == 0:
-                for idx, class_id in enumerate(self.foreground_class_ids):
-                    ann[lbl == class_id] = idx+1
-            else:
-                assert self.ignore_index not in self.foreground_class_ids, 'ignore_index cannot in foreground_class_ids if not 0'
-                
-                if self.config.dataset_name.lower()=='cityscapes_category':
-                    for class_id in self.config._foreground_class_ids:
-                        catId=id2catId[class_id]
-                        if catId >0:
-                            ann[lbl == class_id] = catId-1
-                else:
-                    for idx, class_id in enumerate(self.foreground_class_ids):
-                        ann[lbl == class_id] = idx
-            
-            if self.augmentations is not None and self.split == 'train':
-                if hasattr(self.config, 'augmentations_blur'):
-                    if self.config.augmentations_blur:
-                        img = self.augmentations.transform(img)
-                    else:
-                        warnings.warn('the argument augmentations is not None but config.augmentations_blur=False')
-                else:
-                    img = self.augmentations.transform(img)
-                    
-
-                if hasattr(self.config,'augmentation'):
-                    if self.config.augmentation:
-                        img, ann = self.augmentations.transform(img, ann)
-                    else:
-                        warnings.warn('the argument augmentations is not None but config.augmentation=False')
-                else:
-                    img, ann = self.augmentations.transform(img, ann)
-                
-                assert hasattr(
-                            self.config, 'input_shape'), 'augmentations may change image to random size by random crop'
+                with self.profiler.stage('decode'):
+                    lbl = self.tile_store.read_region(lbl_path, crop_rect)
 
-        if hasattr(self.config, 'input_shape'):
-            assert len(self.config.input_shape) == 2, 'input_shape should with len of 2 but %d' % len(
-                self.config.input_shape)
+            with self.profiler.stage('remap'):
+                ann = self.remap(lbl)
+                if self.reduced_decode and ann.shape[0:2] != img.shape[0:2]:
+                    # nearest reduction for label, match the reduced image
+                    ann = cv2.resize(src=ann, dsize=(img.shape[1], img.shape[0]), interpolation=cv2.INTER_NEAREST)
 
-            # for opencv, resize input is (w,h)
-            dsize=(self.config.input_shape[1],self.config.input_shape[0])
-            img = cv2.resize(src=img, dsize=dsize, interpolation=cv2.INTER_LINEAR)
+            if self.augmentations is not None and self.split == 'train':
+                with self.profiler.stage('augmentation'):
+                    img, ann, augmented = self.augment(img, ann, crop_rect)
 
-            if self.split !='test':
-                if hasattr(self.config,'upsample_type') and self.config.upsample_type =='lossless':
-                    lossless_dsize=(self.config.output_shape[1],self.config.output_shape[0])
-                    if hasattr(self.config,'output_shape') and self.config.output_shape is not None:
-                        ann = cv2.resize(src=ann, dsize=lossless_dsize, interpolation=cv2.INTER_NEAREST)
-                else:
-                    ann = cv2.resize(src=ann, dsize=dsize, interpolation=cv2.INTER_NEAREST)
+        if hasattr(self.config, 'input_shape'):
+            with self.profiler.stage('resize'):
+                img, ann = self.resize(img, ann)
 
         if hasattr(self.config,'with_edge') and self.config.with_edge and self.split !='test':
             edge_img=None
             if hasattr(self.config,'edge_with_gray'):
                 if self.config.edge_with_gray:
                     edge_img=img
-            edge = self.get_edge(
-                ann_img=ann, edge_width=self.config.edge_width, img=edge_img)
+            with self.profiler.stage('edge'):
+                edge = self.get_edge(
+                    ann_img=ann, edge_width=self.config.edge_width, img=edge_img,
+                    lbl_path=None if augmented else lbl_path)
 
         if self.normalizations is not None:
-            img = self.normalizations.forward(img)
+            with self.profiler.stage('normalization'):
+                img = self.normalizations.forward(img)
 
         if self.bchw:
             # convert image from (height,width,channel) to (channel,height,width)
@@ -412,45 +481,93 @@ class dataset_generalize(TD.Dataset):
 
             return img, ann
 
-    def get_edge(self, ann_img, edge_width=5, img=None):
+    def augment(self, img, ann, crop_rect=None):
+        """
+        augmentation on image only, then on image and annotation
+        crop_rect: the image and annotation are cropped from tiles
+        return img, ann, augmented (the annotation is random augmented or not)
+        """
+        augmented = False
+        if hasattr(self.config, 'augmentations_blur'):
+            if self.config.augmentations_blur:
+                img = self.augmentations.transform(img)
+            else:
+                warnings.warn('the argument augmentations is not None but config.augmentations_blur=False')
+        else:
+            img = self.augmentations.transform(img)
+
+        precropped = crop_rect is not None
+        if hasattr(self.config,'augmentation'):
+            if self.config.augmentation:
+                img, ann = self.augmentations.transform(img, ann, precropped=precropped)
+                augmented = True
+            else:
+                warnings.warn('the argument augmentations is not None but config.augmentation=False')
+        else:
+            img, ann = self.augmentations.transform(img, ann, precropped=precropped)
+            augmented = True
+
+        assert hasattr(
+                    self.config, 'input_shape'), 'augmentations may change image to random size by random crop'
+        return img, ann, augmented
+
+    def resize(self, img, ann=None):
+        """
+        resize image to input_shape, annotation to input_shape or output_shape (lossless upsample)
+        """
+        assert len(self.config.input_shape) == 2, 'input_shape should with len of 2 but %d' % len(
+            self.config.input_shape)
+
+        # for opencv, resize input is (w,h)
+        dsize=(self.config.input_shape[1],self.config.input_shape[0])
+        img = cv2.resize(src=img, dsize=dsize, interpolation=cv2.INTER_LINEAR)
+
+        if self.split !='test':
+            if hasattr(self.config,'upsample_type') and self.config.upsample_type =='lossless':
+                lossless_dsize=(self.config.output_shape[1],self.config.output_shape[0])
+                if hasattr(self.config,'output_shape') and self.config.output_shape is not None:
+                    ann = cv2.resize(src=ann, dsize=lossless_dsize, interpolation=cv2.INTER_NEAREST)
+            else:
+                ann = cv2.resize(src=ann, dsize=dsize, interpolation=cv2.INTER_NEAREST)
+        return img, ann
+
+    def get_edge(self, ann_img, edge_width=5, img=None, lbl_path=None):
+        """
+        edge label for ann_img, see edge_label.py
+        lbl_path: the label path when ann_img is not random augmented, read the edge
+            label from config.edge_cache_dir if offered
+        """
         if hasattr(self.config, 'edge_class_num'):
             edge_class_num = self.config.edge_class_num
         else:
             edge_class_num = 2
 
-        assert edge_class_num>=2,'edge class number %d must > 2'%edge_class_num
-        kernel = np.ones((edge_width, edge_width), np.uint8)
-        if img is None:
-            ann_edge = cv2.Canny(ann_img, 0, 1)
-        else:
-            ann_edge = cv2.Canny(ann_img, 0, 1)
-#            print(type(img),img.shape)
-            gray=cv2.cvtColor(img,cv2.COLOR_BGR2GRAY)
-            edge=cv2.Canny(gray,100,200)
-            ann_edge=edge+ann_edge
-        # remove ignore area in ann_img
-        ann_edge[ann_img==self.ignore_index]=0
-
-        ann_dilation = cv2.dilate(ann_edge, kernel, iterations=1)
-        if edge_class_num == 2:
-            # fg=0, bg=1
-            edge_label = (ann_dilation == 0).astype(np.uint8)
-        else:
-            # fg=0, bg=1,2,...edge_class_num-1
-            edge_label = np.zeros_like(ann_img)+edge_class_num-1
-            for class_num in range(edge_class_num-1):
-                edge_label[np.logical_and(ann_dilation>0,edge_label==(edge_class_num-1))]=class_num
-                ann_dilation = cv2.dilate(ann_dilation, kernel, iterations=1)
+        cache_dir = self.config.edge_cache_dir if hasattr(self.config, 'edge_cache_dir') else None
+        if cache_dir and lbl_path is not None and img is None and os.path.exists(lbl_path):
+            return read_edge_label(lbl_path, os.path.expanduser(cache_dir), ann_img, self.remap.table,
+                                   edge_width, edge_class_num, self.ignore_index)
 
-        # remove ignore area in ann_img
-        edge_label[ann_img==self.ignore_index]=self.ignore_index
-        return edge_label
+        return get_edge_label(ann_img, edge_width, edge_class_num, self.ignore_index, img)
 
 
 class image_normalizations():
     def __init__(self, ways='caffe'):
-        ways=ways.lower()
-        if ways == 'caffe(255-mean)' or ways == 'caffe' or ways.lower() in ['voc', 'voc2012']:
+        """
+        ways: predefined normalization name, or json file with mean_rgb and std_rgb
+            in [0,255] from tools/research/dataset_mean_std.py
+        """
+        if ways.endswith('.json'):
+            with open(os.path.expanduser(ways), 'r') as f:
+                stats = json.load(f)
+            ways = 'json'
+        else:
+            ways = ways.lower()
+
+        if ways == 'json':
+            scale = 1.0
+            mean_rgb = stats['mean_rgb']
+            std_rgb = stats['std_rgb']
+        elif ways == 'caffe(255-mean)' or ways == 'caffe' or ways.lower() in ['voc', 'voc2012']:
             scale = 1.0
             mean_rgb = [123.68, 116.779, 103.939]
             std_rgb = [1.0, 1.0, 1.0]
@@ -481,12 +598,33 @@ class image_normalizations():
         self.std_rgb = std_rgb
         self.scale = scale
 
+        # (x/scale-mean)/std = x*weight+bias, for forward_batch
+        self.weight = [1.0/(scale*std) for std in std_rgb]
+        self.bias = [-mean/std for mean, std in zip(mean_rgb, std_rgb)]
+        # (device,dtype): (weight,bias) tensors with shape [1,3,1,1]
+        self.tensors = {}
+
     def forward(self, img_rgb):
         x = img_rgb/self.scale
-        for i in range(3):
-            x[:, :, i] = (x[:, :, i]-self.mean_rgb[i])/self.std_rgb[i]
+        mean = np.array(self.mean_rgb, dtype=x.dtype)
+        std = np.array(self.std_rgb, dtype=x.dtype)
+        return (x-mean)/std
 
-        return x
+    def forward_batch(self, images):
+        """
+        normalize uint8 image tensor with shape [b,3,h,w] on the consumer side,
+        the dataset return uint8 image when config.norm_on_batch is True.
+        return float tensor with the same device as images
+        """
+        images = images.float()
+        key = (images.device, images.dtype)
+        if key not in self.tensors.keys():
+            weight = torch.tensor(self.weight, dtype=images.dtype).view(1, 3, 1, 1)
+            bias = torch.tensor(self.bias, dtype=images.dtype).view(1, 3, 1, 1)
+            self.tensors[key] = (weight.to(images.device), bias.to(images.device))
+
+        weight, bias = self.tensors[key]
+        return torch.addcmul(bias, images, weight)
 
     def backward(self, x_rgb):
         x = np.zeros_like(x_rgb)
@@ -507,6 +645,25 @@ class image_normalizations():
         else:
             assert False, 'unexpected input dim %d' % x.ndim
 
+def use_norm_on_batch(config):
+    return hasattr(config, 'norm_on_batch') and config.norm_on_batch and config.norm_ways is not None
+
+def get_sample_normalizations(config):
+    """
+    normalizations for dataset, None if the dataset return uint8 image
+    """
+    if config.norm_ways is None or use_norm_on_batch(config):
+        return None
+    return image_normalizations(config.norm_ways)
+
+def get_batch_normalizations(config):
+    """
+    normalizations for the consumer (forward_batch), None if the dataset normalize the image
+    """
+    if use_norm_on_batch(config):
+        return image_normalizations(config.norm_ways)
+    return None
+
 
 if __name__ == '__main__':
     config = edict()
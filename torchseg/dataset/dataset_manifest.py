@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+persistent dataset manifest, one json cache file for each dataset+split
+
+- file lists: the result of txt parsing, listdir and glob at dataset construction,
+  rebuilt when the mtime of a watched path changed. the default watch paths are
+  the directories of the files, pass the dataset roots in watch_paths to detect
+  new sub directories. the directory of the cache file is never watched.
+- samples: original image shape, file size, mtime and label class histogram,
+  recomputed when the file size or mtime changed
+
+the cache file is config.manifest_dir/dataset_split_hash(root_path).json,
+no cache file for packed dataset or empty manifest_dir.
+
+usage:
+    manifest=get_dataset_manifest(config,store,split)
+    files=manifest.get_list('main_files',build_fn)  # watch the directories of files
+    files=manifest.get_list(txt_file,build_fn,[txt_file])
+    manifest.shape(image_path)                     # (height,width) without decode
+    manifest.histogram(label_path,read_label)      # {class id: pixel number}
+    manifest.save()   # or manifest.close() to save and release the memory
+
+build the manifest for a semantic dataset, with shape and histogram:
+python tools/build_manifest.py --dataset_name Cityscapes --split train
+"""
+import os
+import json
+import hashlib
+import numpy as np
+
+class dataset_manifest():
+    def __init__(self,store,cache_file=None):
+        """
+        store: disc_store or packed_store, see packed_dataset.py
+        cache_file: json cache file, None for no cache
+        """
+        self.store=store
+        self.cache_file=cache_file
+        self.data={'lists':{},'samples':{}}
+        if cache_file is not None and os.path.exists(cache_file):
+            with open(cache_file,'r') as f:
+                self.data=json.load(f)
+        self.dirty=False
+
+    @staticmethod
+    def get_mtimes(paths):
+        mtimes={}
+        for p in paths:
+            try:
+                mtimes[p]=os.stat(p).st_mtime_ns
+            except OSError:
+                mtimes[p]=None
+        return mtimes
+
+    @staticmethod
+    def get_watch_dirs(value):
+        """
+        the directories of the files in value
+        """
+        files=[]
+        todo=[value]
+        while len(todo)>0:
+            v=todo.pop()
+            if isinstance(v,str):
+                files.append(v)
+            else:
+                todo+=list(v)
+
+        return sorted(set([os.path.dirname(f) for f in files]))
+
+    def get_list(self,name,build_fn,watch_paths=None):
+        """
+        return the cached build_fn() for name, call build_fn() again when any watch path changed
+        build_fn: return json serializable file list
+        watch_paths: None for the directories of the files, list of paths,
+            or function to get the watch paths from build_fn()
+        """
+        if self.cache_file is None:
+            return build_fn()
+
+        entry=self.data['lists'].get(name,None)
+        if entry is not None and self.get_mtimes(entry['watch'].keys())==entry['watch']:
+            return entry['value']
+
+        value=build_fn()
+        if watch_paths is None:
+            watch_paths=self.get_watch_dirs(value)
+        elif callable(watch_paths):
+            watch_paths=watch_paths(value)
+        # save() change the mtime of the cache directory
+        cache_dir=os.path.dirname(os.path.abspath(self.cache_file))
+        watch_paths=[p for p in watch_paths if os.path.abspath(p)!=cache_dir]
+        # json convert tuple to list, keep the same type for cache or not
+        value=json.loads(json.dumps(value))
+        self.data['lists'][name]={'watch':self.get_mtimes(watch_paths),'value':value}
+        self.dirty=True
+        return value
+
+    def get_sample(self,path):
+        st=os.stat(path)
+        key=[st.st_size,st.st_mtime_ns]
+        sample=self.data['samples'].get(path,None)
+        if sample is None or sample['stat']!=key:
+            sample={'stat':key}
+            self.data['samples'][path]=sample
+            self.dirty=True
+        return sample
+
+    def shape(self,path):
+        """
+        return the original (height,width) of image, None for unknown
+        """
+        if self.cache_file is None:
+            return self.store.shape(path)
+
+        try:
+            sample=self.get_sample(path)
+        except OSError:
+            return None
+        if 'shape' not in sample.keys():
+            shape=self.store.shape(path)
+            sample['shape']=None if shape is None else list(shape)
+            self.dirty=True
+        return None if sample['shape'] is None else tuple(sample['shape'])
+
+    @staticmethod
+    def compute_histogram(label):
+        hist=np.bincount(label.ravel(),minlength=256)
+        return {int(c):int(hist[c]) for c in np.nonzero(hist)[0]}
+
+    def cached_histogram(self,path):
+        """
+        return the cached histogram for path, None if not cached
+        """
+        if self.cache_file is None:
+            return None
+
+        try:
+            sample=self.get_sample(path)
+        except OSError:
+            return None
+        if 'hist' not in sample.keys():
+            return None
+        return {c:n for c,n in sample['hist']}
+
+    def histogram(self,path,read_label):
+        """
+        return the pixel number for each class id in label as {class id: pixel number}
+        read_label: function to read the label from path
+        """
+        if self.cache_file is None:
+            return self.compute_histogram(read_label(path))
+
+        sample=self.get_sample(path)
+        if 'hist' not in sample.keys():
+            sample['hist']=[[c,n] for c,n in self.compute_histogram(read_label(path)).items()]
+            self.dirty=True
+        return {c:n for c,n in sample['hist']}
+
+    def update(self,path,shape=None,hist=None):
+        """
+        set shape and histogram computed outside, eg: in a process pool
+        """
+        sample=self.get_sample(path)
+        if shape is not None:
+            sample['shape']=list(shape)
+        if hist is not None:
+            sample['hist']=[[c,n] for c,n in hist.items()]
+        self.dirty=True
+
+    def save(self):
+        if self.cache_file is None or not self.dirty:
+            return
+
+        os.makedirs(os.path.dirname(self.cache_file),exist_ok=True)
+        tmp_file='{}.{}.tmp'.format(self.cache_file,os.getpid())
+        with open(tmp_file,'w') as f:
+            json.dump(self.data,f)
+        os.replace(tmp_file,self.cache_file)
+        self.dirty=False
+
+    def close(self):
+        """
+        save the cache and release the memory, call it at the end of dataset construction,
+        so the dataloader workers do not hold the manifest. no cache after close.
+        """
+        self.save()
+        self.cache_file=None
+        self.data={'lists':{},'samples':{}}
+
+def get_manifest_file(config,split):
+    """
+    return config.manifest_dir/dataset_split_hash(root_path).json, None for no cache
+    dataset_generalize use config.dataset_name, motionseg dataset use config.dataset
+    """
+    backend=config.dataset_backend if hasattr(config,'dataset_backend') else 'disc'
+    if backend not in [None,'disc'] or not hasattr(config,'manifest_dir') or not config.manifest_dir:
+        return None
+
+    if hasattr(config,'dataset_name') and isinstance(config.dataset_name,str):
+        dataset_name=config.dataset_name
+    else:
+        dataset_name=config.dataset
+    sha1=hashlib.sha1(os.path.abspath(config.root_path).encode('utf-8')).hexdigest()
+    return os.path.join(config.manifest_dir,
+                        '{}_{}_{}.json'.format(dataset_name.lower(),split,sha1[0:8]))
+
+def get_dataset_manifest(config,store,split):
+    return dataset_manifest(store,get_manifest_file(config,split))
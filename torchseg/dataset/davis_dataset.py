@@ -7,6 +7,7 @@ import glob
 from easydict import EasyDict as edict
 import cv2
 from .segtrackv2_dataset import motionseg_dataset
+from .path_table import path_table
 
 class davis_dataset(motionseg_dataset):
     split_set=['train','val','test-dev','test-challenge']
@@ -48,7 +49,10 @@ class davis_dataset(motionseg_dataset):
         self.root_path=config.root_path
 
         if category is None:
-            self.main_input_path_list=self.get_main_input_path_list(split)
+            txt_file=os.path.join(self.root_path,self.imageset_folder,str(self.year),split+self.imageset_suffix)
+            self.main_input_path_list=self.manifest.get_list('main_input_path_list',
+                                                             lambda: self.get_main_input_path_list(split),
+                                                             lambda files: self.manifest.get_watch_dirs(files)+[txt_file])
             print('%s dataset size %d'%(split,len(self.main_input_path_list)))
             self.main_input_path_list.sort()
             if self.split in ['train','val']:
@@ -75,9 +79,26 @@ class davis_dataset(motionseg_dataset):
                                                              '*'+self.image_suffix))
             print('%s dataset size %d'%(split,len(self.main_input_path_list)))
 
+        # list the video frames and annotations once, see frame_index.py
+        video_dirs=set([os.path.dirname(p) for p in self.main_input_path_list])
+        if self.split in self.split_with_gt_set:
+            annotation_dirs=[os.path.join(self.root_path,
+                                          self.annotation_folder,
+                                          self.resolution,
+                                          os.path.basename(d)) for d in video_dirs]
+        else:
+            annotation_dirs=[]
+        self.frame_index.build(list(video_dirs)+annotation_dirs)
+        # compact path list for forked dataloader workers, see path_table.py
+        self.main_input_path_list=path_table(self.main_input_path_list)
+        self.manifest.close()
+
     def __len__(self):
         return len(self.main_input_path_list)
 
+    def get_main_path(self,index):
+        return self.main_input_path_list[index]
+
     def inVideo(self,path,category):
         path_info = self.path_parse(main_input_path)
         if path_info.category==category:
@@ -94,8 +115,7 @@ class davis_dataset(motionseg_dataset):
 
         # suffix='.jpg'
         suffix = path_info.suffix
-        files = glob.glob(os.path.join(neighbor_root_path, '*'+suffix))
-        files.sort()
+        files = self.frame_index.files(neighbor_root_path, suffix)
 
         if neighbor_type is None:
             neighbor_type=self.neighbor_type
@@ -108,7 +128,7 @@ class davis_dataset(motionseg_dataset):
             assert gap > 0
             filename = files[(path_info.number+gap) % n]
         elif neighbor_type == 'random':
-            files.remove(main_input_path)
+            files = [f for f in files if f != main_input_path]
             filename = random.choice(files)
         elif neighbor_type == 'first':
             # need filter for when main input path is first.
@@ -132,8 +152,7 @@ class davis_dataset(motionseg_dataset):
 
         # suffix='.png'
         suffix = self.annotation_suffix
-        files = glob.glob(os.path.join(annotation_root_path, '*'+suffix))
-        files.sort()
+        files = self.frame_index.files(annotation_root_path, suffix)
 
         n = len(files)
         assert n > 0
@@ -228,18 +247,20 @@ class davis_dataset(motionseg_dataset):
 
     def __get_image__(self,index):
         main_file,aux_file,gt_file=self.__get_path__(index)
-        frame_images=[cv2.imread(f,cv2.IMREAD_COLOR) for f in [main_file,aux_file]]
+        frame_images=[self.imread_frame(f) for f in [main_file,aux_file]]
         if self.split in self.split_with_gt_set:
-            gt_image=cv2.imread(gt_file,cv2.IMREAD_GRAYSCALE)
+            gt_image=self.store.imread(gt_file,cv2.IMREAD_GRAYSCALE)
 
             # find aux_gt_file
             aux_gt_file=self.get_annotation_path(aux_file)
-            if os.path.exists(aux_gt_file):
-                aux_gt_image=cv2.imread(aux_gt_file,cv2.IMREAD_GRAYSCALE)
+            if self.frame_index.exists(aux_gt_file):
+                aux_gt_image=self.store.imread(aux_gt_file,cv2.IMREAD_GRAYSCALE)
             else:
                 aux_gt_image=np.zeros_like(gt_image)
         else:
             height,width,_=frame_images[0].shape
+            if self.reduced_decode and self.store.shape(main_file) is not None:
+                height,width=self.store.shape(main_file)
             aux_gt_image=gt_image=np.zeros((height,width),dtype=np.uint8)
 
         labels=[]
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+edge label for psp_edge, psp_hed, merge_seg and cross_merge (config.with_edge)
+
+the edge of the label is dilated by edge_width again and again for multi-class
+edge: class 0 for the first dilation, class 1 for the second, ..., and
+edge_class_num-1 for the rest. n dilations with a square kernel cover the
+pixels whose chebyshev distance to the edge <= n*(edge_width-1)/2, so for odd
+edge_width all the classes come from one distance transform:
+    class=clip(ceil(distance/radius)-1,0,edge_class_num-1)
+for even edge_width (such as the default 10) the kernel anchor is not centered,
+each dilation cover the offsets -edge_width/2...edge_width/2-1 and the band is
+not symmetric, so the dilation loop is used to keep the same edge label.
+
+the edge of the label without random augmentation (val, or augmentation=False)
+never change, it can be cached in config.edge_cache_dir:
+    edge_cache_dir/ab/abcdef...png, the key is sha1(label path, mtime, size,
+    label shape, remap table, edge_width, edge_class_num)
+"""
+import os
+import hashlib
+import cv2
+import numpy as np
+
+def get_dilation_bands(ann_edge,edge_width,edge_class_num):
+    """
+    class n for the pixels first covered by the (n+1)th dilation of ann_edge
+    """
+    kernel=np.ones((edge_width,edge_width),np.uint8)
+    edge_label=np.zeros_like(ann_edge)+edge_class_num-1
+    ann_dilation=ann_edge
+    for class_num in range(edge_class_num-1):
+        ann_dilation=cv2.dilate(ann_dilation,kernel,iterations=1)
+        edge_label[np.logical_and(ann_dilation>0,edge_label==(edge_class_num-1))]=class_num
+    return edge_label
+
+def get_edge_label(ann_img,edge_width=5,edge_class_num=2,ignore_index=255,img=None):
+    """
+    ann_img: uint8 train id label
+    img: rgb image, add the canny edge of the gray image when not None
+    return uint8 edge label, fg(edge)=0, bg=1,2,...,edge_class_num-1, ignore_index for ignore area
+    """
+    assert edge_class_num>=2,'edge class number %d must > 2'%edge_class_num
+    ann_edge=cv2.Canny(ann_img,0,1)
+    if img is not None:
+        gray=cv2.cvtColor(img,cv2.COLOR_BGR2GRAY)
+        ann_edge=cv2.Canny(gray,100,200)+ann_edge
+    # remove ignore area in ann_img
+    ignore=(ann_img==ignore_index)
+    ann_edge[ignore]=0
+
+    if edge_width%2==0:
+        edge_label=get_dilation_bands(ann_edge,edge_width,edge_class_num)
+    else:
+        # chebyshev distance to the nearest edge pixel
+        distance=cv2.distanceTransform((ann_edge==0).astype(np.uint8),cv2.DIST_C,3)
+        radius=(edge_width-1)/2
+        if radius>0:
+            bands=np.ceil(distance/radius)-1
+        else:
+            # 1x1 kernel, only the edge pixels
+            bands=np.where(distance>0,edge_class_num-1,0)
+        edge_label=np.clip(bands,0,edge_class_num-1).astype(np.uint8)
+
+    edge_label[ignore]=ignore_index
+    return edge_label
+
+def get_edge_cache_path(lbl_path,cache_dir,shape,table,edge_width,edge_class_num):
+    stat=os.stat(lbl_path)
+    key='{}:{}:{}:{}:{}:{}:{}'.format(os.path.abspath(lbl_path),stat.st_mtime_ns,stat.st_size,
+                                      tuple(shape),hashlib.sha1(np.asarray(table,dtype=np.uint8).tobytes()).hexdigest(),
+                                      edge_width,edge_class_num)
+    sha1=hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir,sha1[0:2],sha1+'.png')
+
+def read_edge_label(lbl_path,cache_dir,ann_img,table,edge_width=5,edge_class_num=2,ignore_index=255):
+    """
+    return get_edge_label(ann_img,...) from cache, compute and save it if not cached
+    ann_img: the label of lbl_path without random augmentation
+    """
+    cache_path=get_edge_cache_path(lbl_path,cache_dir,ann_img.shape,table,edge_width,edge_class_num)
+    edge_label=cv2.imread(cache_path,cv2.IMREAD_GRAYSCALE) if os.path.exists(cache_path) else None
+    if edge_label is None:
+        edge_label=get_edge_label(ann_img,edge_width,edge_class_num,ignore_index)
+        os.makedirs(os.path.dirname(cache_path),exist_ok=True)
+        # write to a temp file and rename, the cache is safe for parallel workers
+        tmp_path='{}.{}.tmp.png'.format(cache_path,os.getpid())
+        cv2.imwrite(tmp_path,edge_label)
+        os.replace(tmp_path,cache_path)
+    return edge_label
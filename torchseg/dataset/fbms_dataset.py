@@ -5,8 +5,8 @@ import glob
 import random
 import numpy as np
 import cv2
-import netpbmfile as pbm
 from .segtrackv2_dataset import motionseg_dataset
+from .path_table import path_table
 import warnings
 
 class fbms_dataset(motionseg_dataset):
@@ -26,42 +26,19 @@ class fbms_dataset(motionseg_dataset):
         else:
             split_dir='Testset'
 
+        # the file lists are cached in manifest, see dataset_manifest.py
+        split_path=os.path.join(self.config['root_path'],split_dir)
         if self.gt_format=='ppm':
-            self.gt_files=[]
-
-            clips_dir=os.listdir(os.path.join(self.config['root_path'],split_dir))
-            for d in clips_dir:
-
-                ppm_files=glob.glob(os.path.join(self.config['root_path'],
-                                                 split_dir,
-                                                 d,
-                                                 'GroundTruth',
-                                                 '*.'+self.gt_format),recursive=True)
-                pgm_files=glob.glob(os.path.join(self.config['root_path'],
-                                                 split_dir,
-                                                 d,
-                                                 'GroundTruth',
-                                                 '*.pgm'),recursive=True)
-                if len(ppm_files)==0:
-                    files=pgm_files
-                else:
-                    files=[f for f in ppm_files if f.find('PROB_gt.ppm')==-1]
-
-                files.sort()
-                if self.remove_first_empty_gt:
-                    gt=self.imread(files[0])
-                    if np.sum(gt)==0:
-                        warnings.warn('remove invalid label',files[0])
-                        files=files[1:]
-
-                self.gt_files+=files
+            self.gt_files=self.manifest.get_list('gt_files',
+                                                 lambda: self.get_ppm_gt_files(split_path),
+                                                 lambda files: self.manifest.get_watch_dirs(files)+[split_path])
         else:
-            self.gt_files=glob.glob(os.path.join(self.config['root_path'],
-                                             split_dir,
-                                             '*',
-                                             'GroundTruth',
-                                             '*.'+self.gt_format),recursive=True)
-
+            self.gt_files=self.manifest.get_list('gt_files',
+                                                 lambda: glob.glob(os.path.join(split_path,
+                                                                                '*',
+                                                                                'GroundTruth',
+                                                                                '*.'+self.gt_format),recursive=True),
+                                                 lambda files: self.manifest.get_watch_dirs(files)+[split_path])
 
         print('%s dataset size %d'%(split,len(self.gt_files)))
         self.gt_files.sort()
@@ -76,19 +53,55 @@ class fbms_dataset(motionseg_dataset):
         else:
             assert False
 
-        # image file
-        self.img_files=[self.get_frames(gt_file)[0] for gt_file in self.gt_files]
+        # list the video frames once, see frame_index.py
+        self.frame_index.build(set([os.path.dirname(os.path.dirname(f)) for f in self.gt_files]))
+
+        # image file, path_table.index() is hash lookup, see path_table.py
+        self.img_files=path_table([self.get_frames(gt_file)[0] for gt_file in self.gt_files])
+        self.gt_files=path_table(self.gt_files)
+        self.manifest.close()
+
+    def get_ppm_gt_files(self,split_path):
+        gt_files=[]
+
+        clips_dir=os.listdir(split_path)
+        for d in clips_dir:
+
+            ppm_files=glob.glob(os.path.join(split_path,
+                                             d,
+                                             'GroundTruth',
+                                             '*.'+self.gt_format),recursive=True)
+            pgm_files=glob.glob(os.path.join(split_path,
+                                             d,
+                                             'GroundTruth',
+                                             '*.pgm'),recursive=True)
+            if len(ppm_files)==0:
+                files=pgm_files
+            else:
+                files=[f for f in ppm_files if f.find('PROB_gt.ppm')==-1]
+
+            files.sort()
+            if self.remove_first_empty_gt:
+                gt=self.imread(files[0])
+                if np.sum(gt)==0:
+                    warnings.warn('remove invalid label',files[0])
+                    files=files[1:]
+
+            gt_files+=files
+        return gt_files
 
     def __len__(self):
         return len(self.gt_files)
 
+    def get_main_path(self,index):
+        return self.img_files[index]
+
     def get_frames(self,gt_file):
         def get_frame_index_bound(base_path,video_name):
             """
             in images, not in groundtruth
             """
-            frames=glob.glob(os.path.join(base_path,'*.jpg'))
-            frames.sort()
+            frames=self.frame_index.files(base_path,'.jpg')
             target_frames=[frames[0],frames[-1]]
             if video_name!='tennis':
                 bound=[int(f.split(os.path.sep)[-1].split('_')[1].split('.')[0]) for f in target_frames]
@@ -109,14 +122,14 @@ class fbms_dataset(motionseg_dataset):
 
             if video_name!='tennis':
                 path=os.path.join(base_path,video_name+'_'+'%02d'%frame_index)+'.jpg'
-                if not os.path.exists(path):
+                if not self.frame_index.exists(path):
                     path=os.path.join(base_path,video_name+'_'+'%03d'%frame_index)+'.jpg'
-                if not os.path.exists(path):
+                if not self.frame_index.exists(path):
                     path=os.path.join(base_path,video_name+'_'+'%04d'%frame_index)+'.jpg'
             else:
                 path=os.path.join(base_path,video_name+'%03d'%frame_index)+'.jpg'
 
-            assert os.path.exists(path),'path={},base_path={},frame_index={}'.format(path,base_path,frame_index)
+            assert self.frame_index.exists(path),'path={},base_path={},frame_index={}'.format(path,base_path,frame_index)
             return path
 
         # gt_file=dataset/FBMS/Trainingset/bear01/GroundTruth/001_gt.png
@@ -137,7 +150,7 @@ class fbms_dataset(motionseg_dataset):
 
         base_path=os.path.sep.join(path_strings[0:-2])
         main_frame=get_frame_path(base_path,video_name,frame_index)
-        assert os.path.exists(main_frame),'main_frame:{},gt_file:{}'.format(main_frame,gt_file)
+        assert self.frame_index.exists(main_frame),'main_frame:{},gt_file:{}'.format(main_frame,gt_file)
 
         if self.frame_gap==0:
             frame_gap=random.randint(1,10)
@@ -149,7 +162,7 @@ class fbms_dataset(motionseg_dataset):
         else:
             aux_frame=get_frame_path(base_path,video_name,frame_index-frame_gap)
 
-        assert os.path.exists(aux_frame),'aux_frame:{},gt_file:{}'.format(aux_frame,gt_file)
+        assert self.frame_index.exists(aux_frame),'aux_frame:{},gt_file:{}'.format(aux_frame,gt_file)
         return [main_frame,aux_frame]
 
     def __get_path__(self,index):
@@ -158,9 +171,9 @@ class fbms_dataset(motionseg_dataset):
 
     def imread(self,file):
         if self.gt_format=='png':
-            gt_image=cv2.imread(file,cv2.IMREAD_GRAYSCALE)
+            gt_image=self.store.imread(file,cv2.IMREAD_GRAYSCALE)
         else:
-            img_rgb=pbm.imread(file)
+            img_rgb=self.store.read_netpbm(file)
             if len(img_rgb.shape)==3:
                 gt_image=cv2.cvtColor(img_rgb,cv2.COLOR_RGB2GRAY)
                 gt_image[gt_image==255]=0
@@ -171,7 +184,7 @@ class fbms_dataset(motionseg_dataset):
 
     def __get_image__(self,index):
         main_file,aux_file,gt_file=self.__get_path__(index)
-        frame_images=[cv2.imread(f,cv2.IMREAD_COLOR) for f in [main_file,aux_file]]
+        frame_images=[self.imread_frame(f) for f in [main_file,aux_file]]
         gt_image=self.imread(self.gt_files[index])
 
         # find aux_gt_file
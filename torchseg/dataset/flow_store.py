@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+binary optical flow store, one memory-mapped float16 array per video
+
+the .flo files (from liteflownet, see generate_opticalflow.py) are float32
+and full resolution, the dataset need clip, normalize and resize them for
+every sample. the flow store save them once as:
+
+store_root/{video}/frames.json      frame names (without suffix) for each row
+store_root/{video}/flow_full.npy    [n,h,w,2] float16, full resolution
+store_root/{video}/flow_224x224.npy [n,224,224,2] float16, pre-resized to input_shape
+
+{video} is the relative path of the frame directory to dataset_root_dir, eg: FBMS/Trainingset/bear01
+the value is clip(flow,-flow_clip,flow_clip)/flow_clip in [-1,1] for all arrays.
+
+python tools/convert_flow_store.py --store_root ~/cvdataset/flow_store --input_shapes [[224,224]]
+or generate the flow into the store directly, see generate_opticalflow.py
+"""
+import os
+import json
+import numpy as np
+import cv2
+from tqdm import tqdm
+
+from .packed_dataset import disc_store
+
+# the flow value is clipped to [-flow_clip,flow_clip] then normalized to [-1,1]
+flow_clip=50.0
+
+def normalize_flow(flow):
+    return np.clip(flow,a_min=-flow_clip,a_max=flow_clip)/flow_clip
+
+def get_array_name(input_shape=None):
+    if input_shape is None:
+        return 'flow_full.npy'
+    else:
+        return 'flow_{}x{}.npy'.format(input_shape[0],input_shape[1])
+
+def get_frame_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+def get_video_name(main_path,dataset_root_dir=os.path.expanduser('~/cvdataset')):
+    return os.path.relpath(os.path.dirname(main_path),dataset_root_dir)
+
+class flow_store():
+    """
+    read normalized optical flow from the store
+    the memmap is opened lazily in each dataloader worker
+    """
+    def __init__(self,store_root,dataset_root_dir=os.path.expanduser('~/cvdataset')):
+        self.store_root=store_root
+        self.dataset_root_dir=dataset_root_dir
+        # video: {'frames': {frame name: row}, 'arrays': {array name: memmap or None}}
+        self.videos={}
+
+    def __getstate__(self):
+        # do not pickle the memmap
+        state=self.__dict__.copy()
+        state['videos']={}
+        return state
+
+    def get_video(self,main_path):
+        video=get_video_name(main_path,self.dataset_root_dir)
+        if video not in self.videos.keys():
+            video_dir=os.path.join(self.store_root,video)
+            frame_file=os.path.join(video_dir,'frames.json')
+            if os.path.exists(frame_file):
+                with open(frame_file,'r') as f:
+                    frames=json.load(f)
+                self.videos[video]={'dir':video_dir,
+                                    'frames':{name:row for row,name in enumerate(frames)},
+                                    'arrays':{}}
+            else:
+                self.videos[video]=None
+        return self.videos[video]
+
+    def get_array(self,video,array_name):
+        if array_name not in video['arrays'].keys():
+            path=os.path.join(video['dir'],array_name)
+            if os.path.exists(path):
+                video['arrays'][array_name]=np.load(path,mmap_mode='r')
+            else:
+                video['arrays'][array_name]=None
+        return video['arrays'][array_name]
+
+    def read(self,main_path,input_shape):
+        """
+        return normalized flow with shape [2,height,width] for input_shape, None for missing
+        """
+        video=self.get_video(main_path)
+        if video is None:
+            return None
+
+        row=video['frames'].get(get_frame_name(main_path),None)
+        if row is None:
+            return None
+
+        array=self.get_array(video,get_array_name(input_shape))
+        if array is not None:
+            return array[row].astype(np.float32).transpose((2,0,1))
+
+        array=self.get_array(video,get_array_name(None))
+        if array is not None:
+            flow=array[row].astype(np.float32)
+            resize_shape=(input_shape[1],input_shape[0])
+            return cv2.resize(flow,resize_shape,interpolation=cv2.INTER_LINEAR).transpose((2,0,1))
+
+        return None
+
+class video_flow_writer():
+    """
+    write the flow of one video into the store, the array file is written
+    to a temp file and renamed in close(), so the store is always valid.
+
+    writer=video_flow_writer(store_root,video,frame_names,(h,w),input_shapes=[(224,224)])
+    writer.write(row,flow)
+    writer.close()
+    """
+    def __init__(self,store_root,video,frame_names,flow_shape,input_shapes=[]):
+        self.video_dir=os.path.join(store_root,video)
+        os.makedirs(self.video_dir,exist_ok=True)
+        self.frame_names=list(frame_names)
+        self.flow_shape=tuple(flow_shape[0:2])
+        self.shapes=[None]+[tuple(s) for s in input_shapes]
+        n=len(self.frame_names)
+        self.arrays={}
+        for shape in self.shapes:
+            h,w=self.flow_shape if shape is None else shape
+            tmp_path=os.path.join(self.video_dir,get_array_name(shape)+'.tmp')
+            self.arrays[shape]=np.lib.format.open_memmap(tmp_path,mode='w+',dtype=np.float16,shape=(n,h,w,2))
+
+    def write(self,row,flow):
+        """
+        flow: raw flow with shape [h,w,2], not normalized
+        """
+        assert flow.shape[0:2]==self.flow_shape,'flow shape {} != {} for {}'.format(flow.shape,self.flow_shape,self.video_dir)
+        flow=normalize_flow(flow.astype(np.float32))
+        for shape,array in self.arrays.items():
+            if shape is None:
+                array[row]=flow
+            else:
+                array[row]=cv2.resize(flow,(shape[1],shape[0]),interpolation=cv2.INTER_LINEAR)
+
+    def close(self):
+        for shape,array in self.arrays.items():
+            array.flush()
+            path=os.path.join(self.video_dir,get_array_name(shape))
+            os.replace(path+'.tmp',path)
+        self.arrays={}
+
+        with open(os.path.join(self.video_dir,'frames.json'),'w') as f:
+            json.dump(self.frame_names,f)
+
+def convert_flo_files(store_root,
+                      input_shapes=[],
+                      flow_root_dir=os.path.expanduser('~/cvdataset/optical_flow')):
+    """
+    convert all the .flo files in flow_root_dir into the flow store
+    """
+    store=disc_store()
+    for dirpath,dirnames,filenames in os.walk(flow_root_dir):
+        flo_files=sorted([f for f in filenames if f.endswith('.flo')])
+        if len(flo_files)==0:
+            continue
+
+        video=os.path.relpath(dirpath,flow_root_dir)
+        first_flow=store.read_flow(os.path.join(dirpath,flo_files[0]))
+        writer=video_flow_writer(store_root,video,[get_frame_name(f) for f in flo_files],
+                                 first_flow.shape,input_shapes)
+        for row,f in enumerate(tqdm(flo_files,desc=video)):
+            writer.write(row,store.read_flow(os.path.join(dirpath,f)))
+        writer.close()
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+per-video frame index for motion segmentation datasets
+
+list each video directory once at dataset construction, then the aux frame
+selection, ground truth lookup and exists check in __getitem__ are dict
+lookup instead of glob/sort/list.index/os.path.exists.
+
+the listing is saved to config.frame_index_dir with the mtime of each
+directory, the directory is listed again only if its mtime changed.
+
+usage:
+    index=get_frame_index(config,store,split)
+    index.build(video_dirs)
+    frames=index.files(video_dir,'.jpg')  # sorted full paths
+    idx=index.position(frames[3])         # 3
+    index.exists(path)
+    index.find(gt_root,'00001.png')       # all 00001.png in gt_root recursively
+"""
+import os
+import json
+import hashlib
+
+class frame_index():
+    def __init__(self,store,cache_file=None):
+        """
+        store: disc_store or packed_store, see packed_dataset.py
+        cache_file: json file to save the directory listing, None for no cache
+        """
+        self.store=store
+        self.cache_file=cache_file
+        # dirname: [mtime, file names, sub directory names]
+        self.dirs={}
+        if cache_file is not None and os.path.exists(cache_file):
+            with open(cache_file,'r') as f:
+                self.cache=json.load(f)
+        else:
+            self.cache={}
+
+        # (dirname,suffix): sorted full paths
+        self._files={}
+        # full path: position in self._files[(dirname,suffix)]
+        self._positions={}
+        # full path for all files
+        self._paths=set()
+        # root: {filename: full paths}
+        self._trees={}
+
+    def get_mtime(self,dirname):
+        if self.cache_file is None:
+            return 0
+        return os.stat(dirname).st_mtime_ns
+
+    def list_dir(self,dirname):
+        if dirname in self.dirs.keys():
+            return self.dirs[dirname]
+
+        mtime=self.get_mtime(dirname)
+        if dirname in self.cache.keys() and self.cache[dirname][0]==mtime:
+            self.dirs[dirname]=self.cache[dirname]
+        else:
+            files,subdirs=self.store.listdir(dirname)
+            self.dirs[dirname]=[mtime,sorted(files),sorted(subdirs)]
+
+        for f in self.dirs[dirname][1]:
+            self._paths.add(os.path.join(dirname,f))
+        return self.dirs[dirname]
+
+    def build(self,dirs,recursive=False):
+        """
+        list all the dirs once and save the listing to cache file
+        """
+        todo=sorted(set(dirs))
+        while len(todo)>0:
+            dirname=todo.pop()
+            subdirs=self.list_dir(dirname)[2]
+            if recursive:
+                todo+=[os.path.join(dirname,d) for d in subdirs]
+        self.save()
+
+    def save(self):
+        if self.cache_file is None:
+            return
+
+        cache=self.cache.copy()
+        cache.update(self.dirs)
+        if cache==self.cache:
+            return
+
+        os.makedirs(os.path.dirname(self.cache_file),exist_ok=True)
+        tmp_file='{}.{}.tmp'.format(self.cache_file,os.getpid())
+        with open(tmp_file,'w') as f:
+            json.dump(cache,f)
+        os.replace(tmp_file,self.cache_file)
+        self.cache=cache
+
+    def files(self,dirname,suffix=None):
+        """
+        return the sorted full paths in dirname with suffix, like sorted(glob(dirname/*suffix))
+        note: do not modify the returned list
+        """
+        key=(dirname,suffix)
+        if key not in self._files.keys():
+            names=self.list_dir(dirname)[1]
+            if suffix is not None:
+                names=[f for f in names if f.endswith(suffix)]
+            paths=[os.path.join(dirname,f) for f in names]
+            self._files[key]=paths
+            for idx,p in enumerate(paths):
+                self._positions[(p,suffix)]=idx
+
+        return self._files[key]
+
+    def position(self,path,suffix=None):
+        """
+        return the index of path in self.files(dirname(path),suffix)
+        """
+        key=(path,suffix)
+        if key not in self._positions.keys():
+            self.files(os.path.dirname(path),suffix)
+        return self._positions[key]
+
+    def exists(self,path):
+        if os.path.dirname(path) not in self.dirs.keys():
+            return self.store.exists(path)
+        return path in self._paths
+
+    def find(self,root,filename):
+        """
+        return the sorted full paths for filename in root recursively,
+        like sorted(glob(root/**/filename,recursive=True))
+        """
+        if root not in self._trees.keys():
+            tree={}
+            todo=[root]
+            while len(todo)>0:
+                dirname=todo.pop()
+                _,names,subdirs=self.list_dir(dirname)
+                for f in names:
+                    if f in tree.keys():
+                        tree[f].append(os.path.join(dirname,f))
+                    else:
+                        tree[f]=[os.path.join(dirname,f)]
+                todo+=[os.path.join(dirname,d) for d in subdirs]
+
+            for f in tree.keys():
+                tree[f].sort()
+            self._trees[root]=tree
+
+        return self._trees[root].get(filename,[])
+
+def get_frame_index(config,store,split):
+    """
+    the cache file is config.frame_index_dir/dataset_split_hash(root_path).json
+    no cache file for packed dataset or empty frame_index_dir
+    """
+    cache_file=None
+    backend=config.dataset_backend if hasattr(config,'dataset_backend') else 'disc'
+    if backend in [None,'disc'] and hasattr(config,'frame_index_dir') and config.frame_index_dir:
+        sha1=hashlib.sha1(os.path.abspath(config.root_path).encode('utf-8')).hexdigest()
+        cache_file=os.path.join(config.frame_index_dir,
+                                '{}_{}_{}.json'.format(config.dataset.lower(),split,sha1[0:8]))
+    return frame_index(store,cache_file)
@@ -1,78 +1,210 @@
 # -*- coding: utf-8 -*-
 """
-use flownet to generate optical flow for main frame
-suppose the frame gap is 5
-use dataset cdnet2014, fbms, segtrack and bmcnet
+generate optical flow for main frame, flow from aux frame to main frame
+use dataset cdnet2014, fbms, segtrack, bmcnet and davis
 
-## flownet
+the flow estimator is loaded once in each worker process, each task is
+one video, the flow of the video is written into the flow store directly
+(see flow_store.py) and recorded in store_root/manifest.txt, the video in
+manifest is skipped when run again.
+
+## flow estimator
+- dis, farneback: opencv cpu estimator, no extra dependency
+- liteflownet: https://github.com/sniklaus/pytorch-liteflownet
+    - clone it to --liteflownet_dir, the network is loaded once for each worker
 - https://github.com/NVIDIA/flownet2-pytorch
     - run in docker, need add demo code
-- https://github.com/sniklaus/pytorch-liteflownet
-    - python run.py --model default --first ./images/first.png --second ./images/second.png --out ./out.flo
+
+python -m torchseg.dataset.generate_opticalflow --dataset FBMS --estimator dis --num_workers 8
 """
 
-from easydict import EasyDict as edict
 from ..models.motionseg.motion_utils import get_dataset
-from .segtrackv2_dataset import main2flow
-from tqdm import trange
+from ..utils.configs.motionseg_config import get_default_config
+from .flow_store import video_flow_writer, get_video_name, get_frame_name
+from multiprocessing import Pool
+from tqdm import tqdm
+import numpy as np
 import argparse
+import random
+import sys
 import os
 import cv2
 
+class opencv_flow_estimator():
+    def __init__(self,name='dis'):
+        self.name=name
+        if name=='dis':
+            self.dis=cv2.DISOpticalFlow_create(cv2.DISOPTICAL_FLOW_PRESET_MEDIUM)
+        else:
+            assert name=='farneback','unknown opencv flow estimator {}'.format(name)
+
+    def estimate(self,first,second):
+        """
+        first,second: bgr image
+        return flow from first to second with shape [h,w,2]
+        """
+        first=cv2.cvtColor(first,cv2.COLOR_BGR2GRAY)
+        second=cv2.cvtColor(second,cv2.COLOR_BGR2GRAY)
+        if self.name=='dis':
+            return self.dis.calc(first,second,None)
+        else:
+            return cv2.calcOpticalFlowFarneback(first,second,None,
+                                                pyr_scale=0.5,levels=3,winsize=15,
+                                                iterations=3,poly_n=5,poly_sigma=1.2,flags=0)
+
+class liteflownet_estimator():
+    def __init__(self,liteflownet_dir):
+        assert os.path.exists(os.path.join(liteflownet_dir,'run.py')),'run.py not in {}'.format(liteflownet_dir)
+        import torch
+        self.torch=torch
+        # run.py parse sys.argv and load the weight relative to its directory
+        argv=sys.argv
+        sys.argv=argv[0:1]
+        sys.path.insert(0,liteflownet_dir)
+        os.chdir(liteflownet_dir)
+        import run
+        sys.argv=argv
+        self.run=run
+
+    def estimate(self,first,second):
+        tensors=[self.torch.FloatTensor(np.ascontiguousarray(img.transpose(2,0,1).astype(np.float32)*(1.0/255.0)))
+                 for img in [first,second]]
+        flow=self.run.estimate(tensors[0],tensors[1])
+        return flow.numpy().transpose(1,2,0)
+
+def get_flow_estimator(name,liteflownet_dir=None):
+    if name in ['dis','farneback']:
+        return opencv_flow_estimator(name)
+    elif name=='liteflownet':
+        return liteflownet_estimator(liteflownet_dir)
+    else:
+        assert False,'unknown flow estimator {}'.format(name)
+
+# the flow estimator for each worker process
+worker_estimator=None
+
+def init_worker(name,liteflownet_dir):
+    global worker_estimator
+    worker_estimator=get_flow_estimator(name,liteflownet_dir)
+
+def video_worker(args):
+    """
+    compute the flow for all (main,aux) pairs in one video and write to the flow store
+    """
+    video,pairs,store_root,input_shapes=args
+    writer=None
+    for row,(main_path,aux_path) in enumerate(pairs):
+        main_img=cv2.imread(main_path,cv2.IMREAD_COLOR)
+        aux_img=cv2.imread(aux_path,cv2.IMREAD_COLOR)
+        assert main_img is not None and aux_img is not None,'empty image for {} or {}'.format(main_path,aux_path)
+        if aux_img.shape!=main_img.shape:
+            aux_img=cv2.resize(aux_img,(main_img.shape[1],main_img.shape[0]),interpolation=cv2.INTER_LINEAR)
+
+        flow=worker_estimator.estimate(aux_img,main_img)
+        if writer is None:
+            writer=video_flow_writer(store_root,video,[get_frame_name(p) for p,_ in pairs],
+                                     flow.shape,input_shapes)
+        writer.write(row,flow)
+    writer.close()
+    return video,len(pairs)
+
+def get_video_pairs(config,splits=['train','val']):
+    """
+    return {video: sorted [(main_path,aux_path)]}
+    """
+    videos={}
+    for split in splits:
+        dataset=get_dataset(config,split)
+        for idx in range(len(dataset)):
+            main_path,aux_path=dataset.__get_path__(idx)[0:2]
+            video=get_video_name(main_path)
+            if video not in videos.keys():
+                videos[video]={}
+            videos[video][main_path]=aux_path
+
+    return {video:sorted(pairs.items()) for video,pairs in videos.items()}
+
+def read_manifest(manifest_file):
+    if not os.path.exists(manifest_file):
+        return set()
+
+    with open(manifest_file,'r') as f:
+        return set([line.split('\t')[0] for line in f.readlines() if line.strip()!=''])
+
+def generate_flow(config,store_root,estimator='dis',liteflownet_dir=None,num_workers=8,input_shapes=[]):
+    videos=get_video_pairs(config)
+    manifest_file=os.path.join(store_root,'manifest.txt')
+    done=read_manifest(manifest_file)
+    tasks=[(video,pairs,store_root,input_shapes) for video,pairs in sorted(videos.items()) if video not in done]
+    print('{}: {} videos, {} done, {} todo'.format(config.dataset,len(videos),len(videos)-len(tasks),len(tasks)))
+    if len(tasks)==0:
+        return
+
+    os.makedirs(store_root,exist_ok=True)
+    with Pool(num_workers,initializer=init_worker,initargs=(estimator,liteflownet_dir)) as p:
+        for video,n in tqdm(p.imap_unordered(video_worker,tasks),total=len(tasks)):
+            with open(manifest_file,'a') as f:
+                f.write('{}\t{}\t{}\n'.format(video,n,estimator))
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
 
-    dataset_set=['cdnet2014','FBMS','segtrackv2','BMCnet','DAVIS2016','all']
+    dataset_set=['cdnet2014','FBMS','FBMS-3D','segtrackv2','BMCnet','DAVIS2016','DAVIS2017']
     parser.add_argument('--dataset',
                         help='dataset name',
-                        choices=dataset_set,
+                        choices=dataset_set+['all'],
                         default='FBMS')
 
-    parser.add_argument('--use_part_name',
-                        help='use how many part of dataset',
+    parser.add_argument('--use_part_number',
+                        help='use how many part of dataset (0 for all)',
+                        type=int,
+                        default=0)
+
+    parser.add_argument('--frame_gap',
+                        help='the frame gap between main and aux frame',
                         type=int,
-                        default=1000,
-                        )
+                        default=5)
 
-    args=parser.get_parser()
+    parser.add_argument('--estimator',
+                        help='flow estimator, use opencv cpu estimator dis/farneback when liteflownet is not available',
+                        choices=['dis','farneback','liteflownet'],
+                        default='dis')
 
-    config=edict()
-    config.dataset=args.dataset
-    config.frame_gap=5
-    config.input_shape=[224,224]
-    config.use_part_number=args.use_part_name
-    config.net_name='motion_panet2'
-    config.share_backbone=False
+    parser.add_argument('--liteflownet_dir',
+                        help='the directory for pytorch-liteflownet',
+                        default=os.path.expanduser('~/git/gnu/pytorch-liteflownet'))
 
-    flow_execute_dir=os.path.expanduser('~/git/gnu/pytorch-liteflownet')
-    os.chdir(flow_execute_dir)
+    parser.add_argument('--num_workers',
+                        help='the number of worker process, 1 for gpu estimator',
+                        type=int,
+                        default=8)
+
+    parser.add_argument('--flow_store_root',
+                        help='root directory for float16 optical flow store',
+                        default=os.path.expanduser('~/cvdataset/flow_store'))
+
+    parser.add_argument('--input_shape',
+                        help='pre-resized input shape for the flow store',
+                        type=int,
+                        nargs='*',
+                        default=[224,224])
+
+    args=parser.parse_args()
 
+    # reproducible random aux frame
+    random.seed(25)
+    config=get_default_config()
+    config.frame_gap=args.frame_gap
+    config.use_part_number=args.use_part_number
+    input_shapes=[args.input_shape] if len(args.input_shape)==2 else []
     for dataset in dataset_set:
-        if dataset == 'all':
-            pass
-        if dataset != args.dataset:
+        if args.dataset!='all' and dataset!=args.dataset:
             continue
-        for split in ['train','val']:
-            config.dataset=dataset
-            xxx_dataset=get_dataset(config,split)
-
-            n=len(xxx_dataset)
-            for idx in trange(n):
-                main_path,aux_path,gt_path=xxx_dataset.__get_path__(idx)
-                out_path=main2flow(main_path)
-                if os.path.exists(out_path):
-                    print(dataset,out_path)
-                    continue
-
-                dir_out_path=os.path.dirname(out_path)
-                os.makedirs(dir_out_path,exist_ok=True)
-                cmd='python run.py --model default --first {} --second {} --out {}'.format(aux_path,main_path,out_path)
-
-                if not os.path.exists(out_path):
-                    img1=cv2.imread(aux_path)
-                    img2=cv2.imread(main_path)
-                    if min(img1.shape)>0 and min(img2.shape)>0:
-                        os.system(cmd)
-                    else:
-                        print(dataset,aux_path,main_path)
-                    print(dataset,out_path)
\ No newline at end of file
+
+        config.dataset=dataset
+        generate_flow(config,
+                      args.flow_store_root,
+                      estimator=args.estimator,
+                      liteflownet_dir=args.liteflownet_dir,
+                      num_workers=args.num_workers,
+                      input_shapes=input_shapes)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+persistent cache for rasterized json polygon annotation (HuaWei dataset)
+
+createLabelImage parse the json file and draw the polygons for every sample,
+but the result never change, so save it as uint8 png once.
+
+cache_dir/ab/abcdef...png, the key is sha1(json path, mtime, size), so
+modified json file will be rasterized again.
+
+disabled by default (config.label_cache_dir=None), opt in with --label_cache_dir
+lazy fill: read_json_label(json_file,cache_dir)
+offline build: python tools/build_label_cache.py --dataset_name HuaWei --split train --label_cache_dir ~/.cache/torchseg/label_cache
+"""
+import os
+import hashlib
+import numpy as np
+from PIL import Image
+from multiprocessing import Pool
+from tqdm import tqdm
+
+from .json2labelImg import createLabelImage
+
+def get_cache_path(json_file,cache_dir):
+    stat=os.stat(json_file)
+    key='{}:{}:{}'.format(os.path.abspath(json_file),stat.st_mtime_ns,stat.st_size)
+    sha1=hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir,sha1[0:2],sha1+'.png')
+
+def write_label_cache(json_file,cache_path):
+    """
+    rasterize json_file and save as png to cache_path, return the label
+    write to a temp file and rename, the cache is safe for parallel workers
+    """
+    lbl=np.array(createLabelImage(json_file),dtype=np.uint8)
+    os.makedirs(os.path.dirname(cache_path),exist_ok=True)
+    tmp_path='{}.{}.tmp'.format(cache_path,os.getpid())
+    Image.fromarray(lbl).save(tmp_path,format='PNG')
+    os.replace(tmp_path,cache_path)
+    return lbl
+
+def read_json_label(json_file,cache_dir=None):
+    """
+    return uint8 label image for json annotation
+    the same as np.array(createLabelImage(json_file),dtype=np.uint8)
+    """
+    if not cache_dir:
+        return np.array(createLabelImage(json_file),dtype=np.uint8)
+
+    cache_path=get_cache_path(json_file,cache_dir)
+    if os.path.exists(cache_path):
+        return np.array(Image.open(cache_path),dtype=np.uint8)
+    else:
+        return write_label_cache(json_file,cache_path)
+
+def build_worker(args):
+    json_file,cache_dir=args
+    cache_path=get_cache_path(json_file,cache_dir)
+    if os.path.exists(cache_path):
+        return 0
+    write_label_cache(json_file,cache_path)
+    return 1
+
+def build_label_cache(json_files,cache_dir,num_workers=8):
+    """
+    rasterize all the json files into cache_dir with a process pool
+    return the number of new cache files
+    """
+    json_files=sorted(set([f for f in json_files if f.endswith('.json')]))
+    with Pool(num_workers) as p:
+        results=list(tqdm(p.imap_unordered(build_worker,[(f,cache_dir) for f in json_files],chunksize=16),
+                          total=len(json_files)))
+
+    print('build label cache for %d json files, %d new in %s'%(len(json_files),sum(results),cache_dir))
+    return sum(results)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+remap raw label ids to train ids with a 256-entry lookup table
+
+the label images are uint8, so every remap rule for dataset_generalize
+(ignore_index=0, ignore_index=255 and cityscapes_category) can be written
+as one table, then remap the label with a single indexed gather:
+    ann = table[lbl]
+instead of one full image boolean mask pass for each foreground class.
+"""
+import numpy as np
+
+from .labels_cityscapes import id2catId
+
+def get_remap_table(config):
+    """
+    return the remap table (list of 256 int) for config
+
+    config.foreground_class_ids: raw label ids for foreground class
+    config.ignore_index: value for pixels not in foreground_class_ids
+    config.dataset_name: cityscapes_category use config._foreground_class_ids
+        and id2catId to map raw label id to category id
+    """
+    if hasattr(config, 'ignore_index'):
+        ignore_index = config.ignore_index
+    else:
+        ignore_index = 0
+
+    table = np.zeros(256, dtype=np.int64)+ignore_index
+    if ignore_index == 0:
+        for idx, class_id in enumerate(config.foreground_class_ids):
+            table[class_id] = idx+1
+    else:
+        assert ignore_index not in config.foreground_class_ids, 'ignore_index cannot in foreground_class_ids if not 0'
+
+        if config.dataset_name.lower() == 'cityscapes_category':
+            for class_id in config._foreground_class_ids:
+                catId = id2catId[class_id]
+                if catId > 0:
+                    table[class_id] = catId-1
+        else:
+            for idx, class_id in enumerate(config.foreground_class_ids):
+                table[class_id] = idx
+
+    assert np.min(table) >= 0 and np.max(table) <= 255, 'remap value out of uint8 range'
+    # use list instead of np.ndarray to keep config json serializable
+    return [int(v) for v in table]
+
+class label_remap():
+    """
+    standalone transform for raw label image, eg:
+        remap=label_remap(config)
+        ann=remap(read_ann_file(lbl_path))
+    """
+    def __init__(self, config=None, table=None):
+        if table is None:
+            if hasattr(config, 'remap_table'):
+                table = config.remap_table
+            else:
+                table = get_remap_table(config)
+
+        assert len(table) == 256, 'remap table should with len of 256 but %d' % len(table)
+        self.table = np.array(table, dtype=np.uint8)
+
+    def forward(self, lbl):
+        assert lbl.dtype == np.uint8, 'require uint8 label image, but %s' % lbl.dtype
+        return self.table[lbl]
+
+    def __call__(self, lbl):
+        return self.forward(lbl)
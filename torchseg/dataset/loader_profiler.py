@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+per-stage time profiler for dataset.__getitem__, see tools/loader_benchmark.py
+
+dataset_generalize and motionseg_dataset time their stages with
+    with self.profiler.stage('resize'):
+        ...
+the default profiler is disabled_profiler, the stage is a null context.
+profile_dataset() replace dataset.profiler with a stage_profiler and wrap
+dataset.store with profiled_store, which split store.imread() into file read
+and decode.
+
+stages: read, decode, remap, augmentation, resize, edge, normalization, flow
+note: packed_store read the mmap lazily, so part of the read time is counted in decode
+"""
+import io
+import os
+import time
+import numpy as np
+import cv2
+import torch.utils.data as td
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from PIL import Image
+
+class stage_profiler():
+    def __init__(self,enabled=True):
+        self.enabled=enabled
+        self.null_stage=nullcontext()
+        self.reset()
+
+    def reset(self):
+        self.times=OrderedDict()
+        self.samples=0
+        self.total=0.0
+
+    def add(self,name,seconds):
+        self.times[name]=self.times.get(name,0.0)+seconds
+
+    @contextmanager
+    def timed_stage(self,name):
+        start=time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name,time.perf_counter()-start)
+
+    def stage(self,name):
+        if not self.enabled:
+            return self.null_stage
+        return self.timed_stage(name)
+
+    def summary(self):
+        """
+        return {stage: ms per sample}, other for the time out of the stages
+        """
+        n=max(self.samples,1)
+        result=OrderedDict((name,t*1000/n) for name,t in self.times.items())
+        result['other']=max(0.0,self.total-sum(self.times.values()))*1000/n
+        result['total']=self.total*1000/n
+        return result
+
+disabled_profiler=stage_profiler(enabled=False)
+
+class profiled_store():
+    """
+    file store proxy, time the file read and decode of the store
+    """
+    def __init__(self,store,profiler):
+        self.store=store
+        self.profiler=profiler
+
+    def __getattr__(self,name):
+        return getattr(self.store,name)
+
+    def read_buffer(self,path):
+        """
+        return uint8 array of the file bytes, None for missing file
+        """
+        if hasattr(self.store,'read_buffer'):
+            return self.store.read_buffer(path)
+        if not os.path.exists(path):
+            return None
+        return np.frombuffer(self.store.read_bytes(path),dtype=np.uint8)
+
+    def imread(self,path,flags=cv2.IMREAD_COLOR):
+        with self.profiler.stage('read'):
+            buf=self.read_buffer(path)
+        if buf is None:
+            return None
+        with self.profiler.stage('decode'):
+            return cv2.imdecode(buf,flags)
+
+    def read_label(self,path):
+        if path.endswith('.json'):
+            # rasterize the json annotation or read the label cache
+            with self.profiler.stage('decode'):
+                return self.store.read_label(path)
+
+        with self.profiler.stage('read'):
+            buf=self.read_buffer(path)
+        with self.profiler.stage('decode'):
+            return np.array(Image.open(io.BytesIO(buf.tobytes())),dtype=np.uint8)
+
+    def read_netpbm(self,path):
+        with self.profiler.stage('decode'):
+            return self.store.read_netpbm(path)
+
+def set_profiler(dataset,profiler):
+    if isinstance(dataset,td.ConcatDataset):
+        for d in dataset.datasets:
+            set_profiler(d,profiler)
+    else:
+        if isinstance(dataset.store,profiled_store):
+            dataset.store=dataset.store.store
+        dataset.profiler=profiler
+        if profiler.enabled:
+            dataset.store=profiled_store(dataset.store,profiler)
+
+def profile_dataset(dataset,indexes):
+    """
+    load dataset[i] for i in indexes in this process
+    return {stage: ms per sample}
+    """
+    profiler=stage_profiler()
+    set_profiler(dataset,profiler)
+    try:
+        for i in indexes:
+            start=time.perf_counter()
+            dataset[i]
+            profiler.total+=time.perf_counter()-start
+            profiler.samples+=1
+    finally:
+        set_profiler(dataset,disabled_profiler)
+    return profiler.summary()
@@ -17,6 +17,23 @@ from ..utils.augmentor import Augmentations
 from ..utils.configs.motionseg_config import get_default_config, dataset_root_dict
 from ..utils.disc_tools import show_images
 
+# normalizations for uint8 frames on the consumer side, see normalize_frames()
+batch_normer=image_normalizations(ways='-1,1')
+
+def use_norm_on_batch(config):
+    return hasattr(config,'norm_on_batch') and config.norm_on_batch
+
+def normalize_frames(config,frames):
+    """
+    frames: image tensors on device
+    the dataset return uint8 frames when config.norm_on_batch is True,
+    normalize them once for the batch here.
+    """
+    if use_norm_on_batch(config):
+        return [batch_normer.forward_batch(img) for img in frames]
+    else:
+        return [img.float() for img in frames]
+
 def get_motionseg_dataset(config,split):
     dataset_dict={"fbms":fbms_dataset,
                   "fbms-3d":fbms_dataset,
@@ -26,7 +43,10 @@ def get_motionseg_dataset(config,split):
                   "davis2016":davis_dataset,
                   'davis2017':davis_dataset}
 
-    normer=image_normalizations(ways='-1,1')
+    if use_norm_on_batch(config):
+        normer=None
+    else:
+        normer=image_normalizations(ways='-1,1')
     augmentations = Augmentations()
     key=config.dataset.lower()
     if key in dataset_dict.keys():
@@ -45,7 +65,7 @@ def get_motionseg_dataset(config,split):
 
 def prepare_input_output(config,data,device):
     frames=data['images']
-    images = [torch.autograd.Variable(img.to(device).float()) for img in frames]
+    images = [torch.autograd.Variable(img) for img in normalize_frames(config,[img.to(device) for img in frames])]
     origin_labels=[torch.autograd.Variable(gt.to(device).long()) for gt in data['labels']]
     resize_labels=[F.interpolate(gt.float(),size=config.input_shape,mode='nearest').long() for gt in origin_labels]
 
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+"""
+packed dataset format: a few large shard files + one offset index
+
+packed_path
+├── index.json
+├── shard-00000.bin
+├── shard-00001.bin
+└── ...
+
+index.json = {'version': 1,
+              'root': common root path for all packed files,
+              'shards': ['shard-00000.bin', ...],
+              'files': {relative path: [shard, offset, length, height, width]}}
+
+the shard keep the original file bytes (jpg/png/ppm/flo), the json
+annotation of HuaWei is rasterized and saved as png. so decode the bytes
+give the same result as read the file from disc.
+
+disc_store: read file from disc (default)
+packed_store: read file from shards with mmap, no per-sample open()/stat()
+
+usage:
+    config.dataset_backend='packed'
+    config.packed_root=os.path.expanduser('~/cvdataset/packed')
+    # shards for dataset_generalize/get_motionseg_dataset are in
+    # packed_root/dataset_name/split
+"""
+import os
+import io
+import mmap
+import json
+import glob
+import fnmatch
+import cv2
+import numpy as np
+from PIL import Image
+import netpbmfile as pbm
+
+from .json2labelImg import createLabelImage
+from .label_cache import read_json_label
+
+def read_flo_bytes(buf):
+    """
+    parse .flo file bytes, return flow with shape [h,w,2]
+    """
+    # a=np.frombuffer(buf,np.uint8,count=4) is the tag 'PIEH'
+    b=np.frombuffer(buf,np.int32,count=2,offset=4)
+    flow=np.frombuffer(buf,np.float32,offset=12).reshape((b[1],b[0],2))
+    return flow
+
+class disc_store():
+    """
+    read file from disc
+    """
+    def __init__(self,label_cache_dir=None):
+        # cache directory for rasterized json annotation, see label_cache.py
+        self.label_cache_dir=label_cache_dir
+
+    def exists(self,path):
+        return os.path.exists(path)
+
+    def glob(self,pattern,recursive=False):
+        return glob.glob(pattern,recursive=recursive)
+
+    def read_bytes(self,path):
+        with open(path,'rb') as f:
+            return f.read()
+
+    def imread(self,path,flags=cv2.IMREAD_COLOR):
+        return cv2.imread(path,flags)
+
+    def read_label(self,path):
+        """
+        same as dataset_generalize.read_ann_file
+        """
+        if not path.endswith(('.json')):
+            return np.array(Image.open(path), dtype=np.uint8)
+        else:
+            return read_json_label(path,self.label_cache_dir)
+
+    def read_netpbm(self,path):
+        return pbm.imread(path)
+
+    def read_flow(self,path):
+        if not os.path.exists(path):
+            return None
+        return read_flo_bytes(self.read_bytes(path))
+
+    def shape(self,path):
+        """
+        return the original (height,width), None for unknown
+        only read the image header, not decode the image
+        """
+        try:
+            with Image.open(path) as img:
+                width,height=img.size
+        except IOError:
+            return None
+        return (height,width)
+
+    def listdir(self,path):
+        """
+        return the names of (files,sub directories) in path
+        """
+        files=[]
+        dirs=[]
+        for entry in os.scandir(path):
+            if entry.is_dir():
+                dirs.append(entry.name)
+            else:
+                files.append(entry.name)
+        return files,dirs
+
+class packed_store(disc_store):
+    """
+    read file from shards with mmap
+    the shard is opened lazily in each dataloader worker
+    """
+    def __init__(self,packed_path):
+        self.packed_path=packed_path
+        index_file=os.path.join(packed_path,'index.json')
+        assert os.path.exists(index_file),'packed index %s not exist, run tools/pack_dataset.py first'%index_file
+        with open(index_file,'r') as f:
+            index=json.load(f)
+
+        self.root=index['root']
+        self.shards=index['shards']
+        self.files=index['files']
+        self.dirs={}
+        for key in self.files.keys():
+            dirname,basename=os.path.split(key)
+            if dirname in self.dirs.keys():
+                self.dirs[dirname].append(basename)
+            else:
+                self.dirs[dirname]=[basename]
+
+        self.subdirs={}
+        for dirname in self.dirs.keys():
+            while dirname!='':
+                parent,basename=os.path.split(dirname)
+                if parent in self.subdirs.keys():
+                    self.subdirs[parent].add(basename)
+                else:
+                    self.subdirs[parent]=set([basename])
+                dirname=parent
+
+        self._mmaps=None
+        self._pid=None
+
+    def __getstate__(self):
+        # mmap cannot be pickled, reopen it in the worker process
+        state=self.__dict__.copy()
+        state['_mmaps']=None
+        state['_pid']=None
+        return state
+
+    def get_key(self,path):
+        if path.startswith(self.root+os.sep):
+            return path[len(self.root)+1:]
+        else:
+            return os.path.relpath(path,self.root)
+
+    def get_mmap(self,shard):
+        if self._mmaps is None or self._pid!=os.getpid():
+            self._mmaps=[None]*len(self.shards)
+            self._pid=os.getpid()
+
+        if self._mmaps[shard] is None:
+            with open(os.path.join(self.packed_path,self.shards[shard]),'rb') as f:
+                self._mmaps[shard]=mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+        return self._mmaps[shard]
+
+    def exists(self,path):
+        return self.get_key(path) in self.files
+
+    def glob(self,pattern,recursive=False):
+        key_pattern=self.get_key(pattern)
+        patterns=[key_pattern]
+        if recursive and '**' in key_pattern:
+            # ** match zero or more directories
+            patterns.append(key_pattern.replace('**'+os.sep,''))
+
+        dirname=os.path.dirname(key_pattern)
+        if glob.has_magic(dirname):
+            candidates=self.files.keys()
+        else:
+            candidates=[os.path.join(dirname,f) for f in self.dirs.get(dirname,[])]
+
+        keys=set()
+        for p in patterns:
+            keys.update(fnmatch.filter(candidates,p))
+        return [os.path.join(self.root,k) for k in keys]
+
+    def listdir(self,path):
+        key=self.get_key(path)
+        if key=='.':
+            key=''
+        return list(self.dirs.get(key,[])),sorted(self.subdirs.get(key,[]))
+
+    def read_buffer(self,path):
+        """
+        return a zero-copy uint8 array for the file bytes, None if not packed
+        """
+        key=self.get_key(path)
+        if key not in self.files:
+            return None
+
+        shard,offset,length=self.files[key][0:3]
+        return np.frombuffer(self.get_mmap(shard),dtype=np.uint8,count=length,offset=offset)
+
+    def read_bytes(self,path):
+        buf=self.read_buffer(path)
+        assert buf is not None,'%s not in packed dataset %s'%(path,self.packed_path)
+        return buf.tobytes()
+
+    def imread(self,path,flags=cv2.IMREAD_COLOR):
+        buf=self.read_buffer(path)
+        if buf is None:
+            return None
+        return cv2.imdecode(buf,flags)
+
+    def read_label(self,path):
+        # the json annotation is rasterized as png when pack the dataset
+        lbl_pil=Image.open(io.BytesIO(self.read_bytes(path)))
+        return np.array(lbl_pil, dtype=np.uint8)
+
+    def read_netpbm(self,path):
+        return pbm.imread(io.BytesIO(self.read_bytes(path)))
+
+    def read_flow(self,path):
+        buf=self.read_buffer(path)
+        if buf is None:
+            return None
+        return read_flo_bytes(buf)
+
+    def shape(self,path):
+        key=self.get_key(path)
+        if key not in self.files:
+            return None
+
+        h,w=self.files[key][3:5]
+        if h>0 and w>0:
+            return (h,w)
+        else:
+            return None
+
+def get_packed_path(config,split):
+    """
+    return packed_root/dataset_name/split
+    dataset_generalize use config.dataset_name, motionseg dataset use config.dataset
+    """
+    if hasattr(config,'dataset_name') and isinstance(config.dataset_name,str):
+        dataset_name=config.dataset_name
+    else:
+        dataset_name=config.dataset
+
+    return os.path.join(config.packed_root,dataset_name.lower(),split)
+
+def get_file_store(config,split):
+    backend=config.dataset_backend if hasattr(config,'dataset_backend') else 'disc'
+    if backend is None or backend=='disc':
+        label_cache_dir=config.label_cache_dir if hasattr(config,'label_cache_dir') else None
+        return disc_store(label_cache_dir)
+    elif backend=='packed':
+        return packed_store(get_packed_path(config,split))
+    else:
+        assert False,'unknown dataset backend %s'%backend
+
+def pack_file_bytes(path):
+    """
+    return the bytes to pack and the original (height,width)
+    """
+    if path.endswith('.json'):
+        lbl_pil=createLabelImage(path)
+        f=io.BytesIO()
+        lbl_pil.save(f,format='PNG')
+        data=f.getvalue()
+        width,height=lbl_pil.size
+    else:
+        with open(path,'rb') as f:
+            data=f.read()
+
+        if path.endswith('.flo'):
+            w,h=np.frombuffer(data,np.int32,count=2,offset=4)
+            height,width=int(h),int(w)
+        else:
+            try:
+                width,height=Image.open(io.BytesIO(data)).size
+            except IOError:
+                height=width=0
+    return data,height,width
+
+def pack_files(files,packed_path,shard_size=1024,root=None):
+    """
+    pack files into shards of packed_path, shard_size in MB
+    """
+    files=sorted(set(files))
+    assert len(files)>0,'no file to pack'
+    if root is None:
+        root=os.path.commonpath([os.path.dirname(f) for f in files])
+
+    os.makedirs(packed_path,exist_ok=True)
+    shard_bytes=shard_size*1024*1024
+    shards=[]
+    index={}
+    shard_file=None
+    offset=0
+    for path in files:
+        if shard_file is None or offset>=shard_bytes:
+            if shard_file is not None:
+                shard_file.close()
+            shards.append('shard-%05d.bin'%len(shards))
+            shard_file=open(os.path.join(packed_path,shards[-1]),'wb')
+            offset=0
+
+        data,height,width=pack_file_bytes(path)
+        shard_file.write(data)
+        index[os.path.relpath(path,root)]=[len(shards)-1,offset,len(data),height,width]
+        offset+=len(data)
+    shard_file.close()
+
+    with open(os.path.join(packed_path,'index.json'),'w') as f:
+        json.dump({'version':1,'root':root,'shards':shards,'files':index},f)
+
+    print('pack %d files into %d shards in %s'%(len(files),len(shards),packed_path))
+    return packed_path
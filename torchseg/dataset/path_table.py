@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+compact read-only path list for forked dataloader workers
+
+a python list of str is one object per path, the forked worker update the
+reference count when it read a path, so the memory pages of the list are
+copied on write in every worker, and the worker memory grows with epoch.
+
+path_table store all the paths in two numpy arrays (utf-8 bytes and offsets),
+the worker only read the arrays, so the memory pages are shared with the
+main process.
+
+usage:
+    paths=path_table(['a.jpg','b.jpg'])
+    len(paths), paths[0], paths[-1], paths[::2], list(paths)
+    paths.index('b.jpg')    # 1, crc32 hash lookup
+    'b.jpg' in paths        # True
+"""
+import zlib
+import operator
+import numpy as np
+
+class path_table():
+    def __init__(self,paths=[]):
+        encoded=[p.encode('utf-8') for p in paths]
+        self.offsets=np.zeros(len(encoded)+1,dtype=np.int64)
+        self.offsets[1:]=np.cumsum([len(b) for b in encoded],dtype=np.int64)
+        self.buffer=np.frombuffer(b''.join(encoded),dtype=np.uint8).copy()
+
+        # sorted crc32 hash and the position for index()
+        hashes=np.array([zlib.crc32(b) for b in encoded],dtype=np.uint32)
+        self.order=np.argsort(hashes,kind='stable').astype(np.int64)
+        self.hashes=hashes[self.order]
+
+    def __len__(self):
+        return len(self.offsets)-1
+
+    def get(self,idx):
+        n=len(self)
+        if idx<0:
+            idx+=n
+        if idx<0 or idx>=n:
+            raise IndexError('path_table index {} out of range {}'.format(idx,n))
+        return self.buffer[self.offsets[idx]:self.offsets[idx+1]].tobytes().decode('utf-8')
+
+    def __getitem__(self,idx):
+        if isinstance(idx,slice):
+            return path_table([self.get(i) for i in range(*idx.indices(len(self)))])
+        return self.get(operator.index(idx))
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self.get(idx)
+
+    def index(self,path):
+        """
+        return the first position of path like list.index
+        """
+        h=zlib.crc32(path.encode('utf-8'))
+        start=np.searchsorted(self.hashes,h,side='left')
+        end=np.searchsorted(self.hashes,h,side='right')
+        for i in range(start,end):
+            idx=int(self.order[i])
+            if self.get(idx)==path:
+                return idx
+        raise ValueError('{} is not in path_table'.format(path))
+
+    def __contains__(self,path):
+        try:
+            self.index(path)
+            return True
+        except ValueError:
+            return False
+
+    def tolist(self):
+        return list(self)
+
+    def __repr__(self):
+        return 'path_table({} paths, {} bytes)'.format(len(self),self.buffer.nbytes)
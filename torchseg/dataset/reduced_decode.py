@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+decode image at (near) target resolution
+
+when the image is much larger than config.input_shape, decode the image
+with reduced factor 2/4/8, then resize to input_shape as before.
+1. jpeg: opencv IMREAD_REDUCED_COLOR_x use the scaled dct decode, fast
+2. png or other format: read the pre-downscaled pyramid level from
+   pyramid_root/x{factor}/{relative path} if exists, see tools/decode_benchmark.py
+   opencv decode the full image then resize it for IMREAD_REDUCED_xxx otherwise.
+
+the reduced image is still larger than or equal to target shape, so the
+following resize is still a downscale.
+"""
+import os
+import cv2
+
+reduced_color_flags={2:cv2.IMREAD_REDUCED_COLOR_2,
+                     4:cv2.IMREAD_REDUCED_COLOR_4,
+                     8:cv2.IMREAD_REDUCED_COLOR_8}
+reduced_gray_flags={2:cv2.IMREAD_REDUCED_GRAYSCALE_2,
+                    4:cv2.IMREAD_REDUCED_GRAYSCALE_4,
+                    8:cv2.IMREAD_REDUCED_GRAYSCALE_8}
+
+def get_reduce_factor(image_shape,target_shape):
+    """
+    image_shape: (height,width) of the original image, None for unknown
+    target_shape: (height,width) after resize
+    return the max factor in [1,2,4,8] which keep the reduced image >= target_shape
+    """
+    if image_shape is None:
+        return 1
+
+    h,w=image_shape[0:2]
+    th,tw=target_shape[0:2]
+    for factor in [8,4,2]:
+        if h//factor>=th and w//factor>=tw:
+            return factor
+    return 1
+
+def get_reduced_flags(flags,factor):
+    if factor==1:
+        return flags
+    elif flags==cv2.IMREAD_COLOR:
+        return reduced_color_flags[factor]
+    elif flags==cv2.IMREAD_GRAYSCALE:
+        return reduced_gray_flags[factor]
+    else:
+        assert False,'unsupported flags {} for reduced decode'.format(flags)
+
+def get_pyramid_path(path,factor,pyramid_root,root_path):
+    return os.path.join(pyramid_root,'x%d'%factor,os.path.relpath(path,root_path))
+
+def imread_reduced(store,path,target_shape,flags=cv2.IMREAD_COLOR,pyramid_root=None,root_path=None):
+    """
+    store: disc_store or packed_store, see packed_dataset.py
+    return reduced image and the original (height,width)
+    """
+    image_shape=store.shape(path)
+    factor=get_reduce_factor(image_shape,target_shape)
+    if factor==1:
+        img=store.imread(path,flags)
+        if image_shape is None and img is not None:
+            image_shape=img.shape[0:2]
+        return img,image_shape
+
+    if pyramid_root is not None and root_path is not None:
+        pyramid_path=get_pyramid_path(path,factor,pyramid_root,root_path)
+        if os.path.exists(pyramid_path):
+            return cv2.imread(pyramid_path,flags),image_shape
+
+    return store.imread(path,get_reduced_flags(flags,factor)),image_shape
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+deterministic and resumable sampling for long training runs
+
+1. resumable sampler: the order of an epoch only depends on (seed,epoch), and
+the sampler record the number of consumed items (start) in the epoch. the state
+{'seed','epoch','start'} is saved with the checkpoint, after load_state_dict()
+the sampler skip the consumed items and continue at the exact next batch.
+resumable_sampler, class_balanced_sampler and clip_batch_sampler support it.
+
+2. per-sample seed: the random aux frame and augmentation of a sample only
+depend on (seed,epoch,index), not on the worker that load it or the history
+of the worker. set_loader_epoch() set (seed,epoch) to the dataset before the
+workers are created, and dataset.__getitem__() load the sample in seed_sample()
+which seed random, numpy, torch and imgaug for the index and restore the
+global random state after the sample.
+
+    for epoch in range(start_epoch,n_epoch):
+        set_loader_epoch(train_loader,epoch)
+        for data in train_loader:
+            ...
+            step_loader(train_loader,batch_size)
+            # save get_loader_sampler(train_loader).state_dict() in checkpoint
+
+3. sharded evaluation: eval_sampler split the val dataset over the ranks
+without padding, the metrics are summed with utils/metric/dist_metric.py.
+"""
+import math
+import random
+import hashlib
+import numpy as np
+import torch
+import torch.utils.data as td
+import imgaug as ia
+import imgaug.random as iarandom
+from contextlib import contextmanager
+
+def get_random_seed():
+    return random.randrange(2**31)
+
+def get_sample_seed(seed,epoch,index):
+    """
+    return 32 bit seed for (seed,epoch,index)
+    """
+    key='{}:{}:{}'.format(seed,epoch,index).encode('utf-8')
+    return int.from_bytes(hashlib.sha1(key).digest()[0:4],'little')
+
+def set_sample_seed(dataset,seed,epoch):
+    """
+    set (seed,epoch) for dataset and the sub datasets of ConcatDataset
+    """
+    if isinstance(dataset,td.ConcatDataset):
+        for d in dataset.datasets:
+            set_sample_seed(d,seed,epoch)
+    elif isinstance(dataset,td.Subset):
+        set_sample_seed(dataset.dataset,seed,epoch)
+    else:
+        dataset.sample_seed=(seed,epoch)
+
+def get_global_seed_state():
+    """
+    the global random state which seed_sample() overwrite, without cuda
+    """
+    return (random.getstate(),np.random.get_state(),torch.get_rng_state(),iarandom.get_global_rng().state)
+
+def set_global_seed_state(state):
+    random.setstate(state[0])
+    np.random.set_state(state[1])
+    torch.set_rng_state(state[2])
+    iarandom.get_global_rng().state=state[3]
+
+@contextmanager
+def seed_sample(dataset,index):
+    """
+    seed the random generators for dataset[index], do nothing before set_sample_seed()
+    the global random state is restored after the sample, with num_workers=0
+    the dropout and batch augmentation of the main process are not reseeded.
+
+        with seed_sample(self,index):
+            return self.load_sample(index)
+    """
+    sample_seed=getattr(dataset,'sample_seed',None)
+    if sample_seed is None:
+        yield
+        return
+
+    state=get_global_seed_state()
+    seed=get_sample_seed(sample_seed[0],sample_seed[1],index)
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    ia.seed(seed)
+    try:
+        yield
+    finally:
+        set_global_seed_state(state)
+
+def get_rng_state():
+    """
+    the random state of main process, for batch augmentation and dropout
+    """
+    state={'random':random.getstate(),
+           'numpy':np.random.get_state(),
+           'torch':torch.get_rng_state()}
+    if torch.cuda.is_available():
+        state['cuda']=torch.cuda.get_rng_state_all()
+    return state
+
+def set_rng_state(state):
+    random.setstate(state['random'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+    if 'cuda' in state.keys() and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+class resumable_state():
+    """
+    seed, epoch and start (consumed items of the epoch) for sampler
+    the sampler should skip the first start items in __iter__()
+    """
+    def init_state(self,seed):
+        self.seed=seed
+        self.epoch=0
+        self.start=0
+
+    def set_epoch(self,epoch):
+        # keep the position for the same epoch, such as after load_state_dict()
+        if epoch!=self.epoch:
+            self.start=0
+        self.epoch=epoch
+
+    def step(self,batch_size):
+        """
+        record one consumed batch, batch_size items for index sampler
+        """
+        self.start+=batch_size
+
+    def state_dict(self):
+        return {'seed':self.seed,'epoch':self.epoch,'start':self.start}
+
+    def load_state_dict(self,state):
+        self.seed=state['seed']
+        self.epoch=state['epoch']
+        self.start=state['start']
+
+class resumable_sampler(resumable_state,td.Sampler):
+    """
+    shuffle sampler like DistributedSampler, the order only depend on seed+epoch
+    for distributed training, all ranks use the same seed and each rank use
+    indices[rank::num_replicas], the indices are padded to the same length
+    """
+    def __init__(self,num_samples,shuffle=True,num_replicas=1,rank=0,seed=None):
+        self.num_samples=num_samples
+        self.shuffle=shuffle
+        self.num_replicas=num_replicas
+        self.rank=rank
+        assert seed is not None or num_replicas==1,'distributed sampler need the same seed for all ranks'
+        self.init_state(get_random_seed() if seed is None else seed)
+        self.num_local=int(math.ceil(self.num_samples/self.num_replicas))
+
+    def get_indices(self):
+        if self.shuffle:
+            g=torch.Generator()
+            g.manual_seed(self.seed+self.epoch)
+            indices=torch.randperm(self.num_samples,generator=g).tolist()
+        else:
+            indices=list(range(self.num_samples))
+
+        total=self.num_local*self.num_replicas
+        indices+=indices[0:(total-len(indices))]
+        return indices[self.rank:total:self.num_replicas]
+
+    def __iter__(self):
+        return iter(self.get_indices()[self.start:])
+
+    def __len__(self):
+        # the length of the whole epoch, the resumed epoch yield len-start indices
+        return self.num_local
+
+class eval_sampler(td.Sampler):
+    """
+    shard the dataset for distributed evaluation, rank use indices[rank::num_replicas]
+    not padded like resumable_sampler, each sample is evaluated exactly once over
+    all ranks, see utils/metric/dist_metric.py
+    """
+    def __init__(self,num_samples,num_replicas=1,rank=0):
+        self.num_samples=num_samples
+        self.num_replicas=num_replicas
+        self.rank=rank
+
+    def __iter__(self):
+        return iter(range(self.rank,self.num_samples,self.num_replicas))
+
+    def __len__(self):
+        return len(range(self.rank,self.num_samples,self.num_replicas))
+
+def get_loader_sampler(loader):
+    """
+    return the resumable (batch) sampler of loader, None for others
+    """
+    for sampler in [loader.batch_sampler,loader.sampler]:
+        if isinstance(sampler,resumable_state):
+            return sampler
+    return None
+
+def get_start_step(loader):
+    """
+    return the number of consumed batches in the resumed epoch
+    """
+    sampler=get_loader_sampler(loader)
+    if sampler is None:
+        return 0
+    if sampler is loader.batch_sampler:
+        return sampler.start
+    return sampler.start//loader.batch_size
+
+def set_loader_epoch(loader,epoch):
+    """
+    call it before iterating the loader, the workers copy the dataset when the iterator created
+    """
+    sampler=get_loader_sampler(loader)
+    if sampler is not None:
+        sampler.set_epoch(epoch)
+        set_sample_seed(loader.dataset,sampler.seed,epoch)
+    elif hasattr(loader.sampler,'set_epoch'):
+        loader.sampler.set_epoch(epoch)
+
+def step_loader(loader,batch_size):
+    sampler=get_loader_sampler(loader)
+    if sampler is not None:
+        sampler.step(1 if sampler is loader.batch_sampler else batch_size)
@@ -6,6 +6,16 @@ import torch.utils.data as td
 import numpy as np
 import random
 import cv2
+import warnings
+from .packed_dataset import get_file_store
+from .reduced_decode import imread_reduced
+from .frame_index import get_frame_index
+from .path_table import path_table
+from .dataset_manifest import get_dataset_manifest
+from .flow_store import flow_store, normalize_flow
+from .clip_sampler import frame_cache
+from .resumable_sampler import seed_sample
+from .loader_profiler import disabled_profiler
 
 def main2flow(main_path,
               dataset_root_dir=os.path.expanduser('~/cvdataset'),
@@ -38,6 +48,75 @@ class motionseg_dataset(td.Dataset):
         self.input_shape=tuple(config.input_shape)
         self.root_path=config.root_path
         self.frame_gap=config.frame_gap
+        # disc_store or packed_store, see packed_dataset.py
+        self.store=get_file_store(config,split)
+        # decode frame with reduced factor 2/4/8, see reduced_decode.py
+        self.reduced_decode=config.reduced_decode if hasattr(config,'reduced_decode') else False
+        self.pyramid_root=config.pyramid_root if hasattr(config,'pyramid_root') else None
+        # per-video frame index, build it in the subclass, see frame_index.py
+        self.frame_index=get_frame_index(config,self.store,split)
+        # cached file lists, close it in the subclass, see dataset_manifest.py
+        self.manifest=get_dataset_manifest(config,self.store,split)
+        # only input_format with 'o' use data['optical_flow']
+        self.use_optical_flow=hasattr(config,'input_format') and config.input_format.lower().find('o')>=0
+        if hasattr(config,'flow_store_root') and config.flow_store_root:
+            self.flow_store=flow_store(config.flow_store_root)
+        else:
+            self.flow_store=None
+        # error or zeros for missing optical flow
+        self.missing_flow=config.missing_flow if hasattr(config,'missing_flow') else 'error'
+        # decoded frames shared by the samples of a clip, see clip_sampler.py
+        if hasattr(config,'clip_length') and config.clip_length>0:
+            self.frame_cache=frame_cache(config.frame_cache_size if hasattr(config,'frame_cache_size') else 32)
+        else:
+            self.frame_cache=None
+        # the number of frame decodes in this process
+        self.decodes=0
+        # time the stages of __getitem__, see loader_profiler.py
+        self.profiler=disabled_profiler
+
+    def get_optical_flow(self,main_path):
+        """
+        return normalized optical flow with shape [2,height,width] for input_shape
+        read from flow store first, then the .flo file, see flow_store.py
+        """
+        if self.flow_store is not None:
+            optical_flow=self.flow_store.read(main_path,self.input_shape)
+            if optical_flow is not None:
+                return optical_flow
+
+        flow_path=main2flow(main_path)
+        flow=self.store.read_flow(flow_path)
+        if flow is not None:
+            resize_shape=tuple([self.input_shape[1],self.input_shape[0]])
+            return cv2.resize(normalize_flow(flow),resize_shape,interpolation=cv2.INTER_LINEAR).transpose((2,0,1))
+
+        if self.missing_flow=='zeros':
+            warnings.warn('use zeros for missing optical flow {}'.format(flow_path))
+            h,w=self.input_shape
+            return np.zeros((2,h,w),np.float32)
+        else:
+            assert False,'missing optical flow {} for {}, generate it with generate_opticalflow.py or set missing_flow=zeros'.format(flow_path,main_path)
+
+    def imread_frame(self,path):
+        """
+        return bgr frame image, from frame cache in clip mode
+        """
+        if self.frame_cache is not None:
+            return self.frame_cache.get(path,self.decode_frame)
+        return self.decode_frame(path)
+
+    def decode_frame(self,path):
+        """
+        return bgr frame image, reduced image when self.reduced_decode
+        """
+        self.decodes+=1
+        if self.reduced_decode:
+            img,_=imread_reduced(self.store,path,self.input_shape,cv2.IMREAD_COLOR,
+                                 pyramid_root=self.pyramid_root,root_path=self.root_path)
+        else:
+            img=self.store.imread(path,cv2.IMREAD_COLOR)
+        return img
 
     def __get_image__(self,index):
         """
@@ -45,6 +124,12 @@ class motionseg_dataset(td.Dataset):
         """
         assert False
 
+    def get_main_path(self,index):
+        """
+        return the main frame path for index, without choose the aux frame
+        """
+        assert False
+
     def get_result_path(self,save_dir,main_path):
         """
         return save path for benchmark
@@ -52,6 +137,12 @@ class motionseg_dataset(td.Dataset):
         assert False
 
     def __getitem__(self,index):
+        # the random aux frame and augmentation only depend on (seed,epoch,index)
+        with seed_sample(self,index):
+            return self.load_sample(index)
+
+    def load_sample(self,index):
+        decodes=self.decodes
         frame_images,gt_images,main_path,aux_path,gt_path=self.__get_image__(index)
 
         # autgmentation dataset when train and val
@@ -60,21 +151,24 @@ class motionseg_dataset(td.Dataset):
 
         # augmentation dataset when train
         if self.split=='train' and self.augmentations is not None:
-            frame_images=[self.augmentations.transform(img) for img in frame_images]
+            with self.profiler.stage('augmentation'):
+                frame_images=[self.augmentations.transform(img) for img in frame_images]
 
 
         # resize image, opencv resize image with (width,height), but input_shape is [height,width]
         resize_shape=tuple([self.input_shape[1],self.input_shape[0]])
-        resize_frame_images=[cv2.resize(img,resize_shape,interpolation=cv2.INTER_LINEAR) for img in frame_images]
+        with self.profiler.stage('resize'):
+            resize_frame_images=[cv2.resize(img,resize_shape,interpolation=cv2.INTER_LINEAR) for img in frame_images]
 
-        if self.split in ['train','val']:
-            resize_gt_images=[cv2.resize(img,resize_shape,interpolation=cv2.INTER_NEAREST) for img in gt_images]
-        else:
-            resize_gt_images=gt_images
+            if self.split in ['train','val']:
+                resize_gt_images=[cv2.resize(img,resize_shape,interpolation=cv2.INTER_NEAREST) for img in gt_images]
+            else:
+                resize_gt_images=gt_images
 
         # normalize image
         if self.normalizations is not None:
-            resize_frame_images = [self.normalizations.forward(img) for img in resize_frame_images]
+            with self.profiler.stage('normalization'):
+                resize_frame_images = [self.normalizations.forward(img) for img in resize_frame_images]
 
         # bchw
         resize_frame_images=[img.transpose((2,0,1)) for img in resize_frame_images]
@@ -83,17 +177,12 @@ class motionseg_dataset(td.Dataset):
 #        resize_gt_image[ignore_area==255]=255
         resize_gt_images=[np.expand_dims(img,0) for img in resize_gt_images]
 
-        flow_path=main2flow(main_path)
-        if os.path.exists(flow_path):
-            flow_file=open(flow_path,'r')
-            a=np.fromfile(flow_file,np.uint8,count=4)
-            b=np.fromfile(flow_file,np.int32,count=2)
-            flow=np.fromfile(flow_file,np.float32).reshape((b[1],b[0],2))
-            flow=np.clip(flow,a_min=-50,a_max=50)/50.0
-            optical_flow=cv2.resize(flow,resize_shape,interpolation=cv2.INTER_LINEAR).transpose((2,0,1))
-        else:
-            h,w=resize_shape
-            optical_flow=np.zeros((2,h,w),np.float32)
+        shape=frame_images[0].shape
+        if self.reduced_decode:
+            # the shape of original image, not the reduced image
+            origin_shape=self.store.shape(main_path)
+            if origin_shape is not None:
+                shape=tuple(origin_shape)+shape[2:]
 
         resize_gt_images=[img.astype(np.float32) for img in resize_gt_images]
         data={'images':resize_frame_images,
@@ -101,9 +190,13 @@ class motionseg_dataset(td.Dataset):
               'gt_path':gt_path,
               'main_path':main_path,
               'aux_path':aux_path,
-              'shape':frame_images[0].shape,
-              'optical_flow':optical_flow
+              'shape':shape,
+              'decodes':self.decodes-decodes,
               }
+
+        if self.use_optical_flow:
+            with self.profiler.stage('flow'):
+                data['optical_flow']=self.get_optical_flow(main_path)
         return data
 
 class segtrackv2_dataset(motionseg_dataset):
@@ -113,7 +206,7 @@ class segtrackv2_dataset(motionseg_dataset):
     def __init__(self,config,split='train',normalizations=None,augmentations=None):
         super().__init__(config,split,normalizations,augmentations)
 
-        self.main_files=self.get_main_files()
+        self.main_files=self.manifest.get_list('main_files',self.get_main_files)
 
         print('dataset size = {}',len(self.main_files))
         n=len(self.main_files)
@@ -122,9 +215,21 @@ class segtrackv2_dataset(motionseg_dataset):
             self.main_files=self.main_files[::gap]
             print('total dataset image %d, use %d'%(n,len(self.main_files)))
 
+        # list the video frames and ground truth once
+        video_dirs=set([os.path.dirname(f) for f in self.main_files])
+        self.frame_index.build(video_dirs)
+        self.frame_index.build([os.path.join(self.root_path,'GroundTruth',os.path.basename(d)) for d in video_dirs],
+                               recursive=True)
+        # compact path list for forked dataloader workers, see path_table.py
+        self.main_files=path_table(self.main_files)
+        self.manifest.close()
+
     def __len__(self):
         return len(self.main_files)
 
+    def get_main_path(self,index):
+        return self.main_files[index]
+
     def get_gt_files(self,main_file):
         """
         GroundTruth
@@ -141,10 +246,10 @@ class segtrackv2_dataset(motionseg_dataset):
         video_name=path_strings[-2]
 
         gt_files=[]
+        gt_root=os.path.join(self.root_path,'GroundTruth',video_name)
         for suffix in ['bmp','png']:
-            gt_path=os.path.join(self.root_path,'GroundTruth',video_name,'**',basename+'.'+suffix)
-            gt_files+=glob.glob(gt_path,recursive=True)
-        assert len(gt_files)>0,'gt_path={}'.format(gt_path)
+            gt_files+=self.frame_index.find(gt_root,basename+'.'+suffix)
+        assert len(gt_files)>0,'gt_root={},basename={}'.format(gt_root,basename)
         return gt_files
 
     def get_aux_file(self,main_file):
@@ -154,13 +259,10 @@ class segtrackv2_dataset(motionseg_dataset):
         suffix=basename.split('.')[1]
 
         frame_path=os.path.join(self.root_path,'JPEGImages')
-        video_path=os.path.join(frame_path,video_name,'*.'+suffix)
-        video_files=glob.glob(video_path)
-        video_files.sort()
-
-        main_index=video_files.index(main_file)
-        video_files.remove(main_file)
-        n=len(video_files)
+        video_files=self.frame_index.files(os.path.join(frame_path,video_name),'.'+suffix)
+        main_index=self.frame_index.position(main_file,'.'+suffix)
+        # the number of frames except main_file
+        n=len(video_files)-1
         assert n>0,'main_file={}'.format(main_file)
         assert main_index>=0,'main_file={}'.format(main_file)
 
@@ -177,6 +279,9 @@ class segtrackv2_dataset(motionseg_dataset):
             aux_index=main_index-frame_gap
             aux_index=aux_index if aux_index>=0 else 0
 
+        # skip main_file in video_files
+        if aux_index>=main_index:
+            aux_index+=1
         return video_files[aux_index]
 
     def get_main_files(self):
@@ -214,11 +319,11 @@ class segtrackv2_dataset(motionseg_dataset):
 
     def __get_image__(self,index):
         main_file,aux_file,gt_files=self.__get_path__(index)
-        frame_images=[cv2.imread(f,cv2.IMREAD_COLOR) for f in [main_file,aux_file]]
+        frame_images=[self.imread_frame(f) for f in [main_file,aux_file]]
 
         labels=[]
         for files in gt_files:
-            images=[cv2.imread(f,cv2.IMREAD_GRAYSCALE) for f in files]
+            images=[self.store.imread(f,cv2.IMREAD_GRAYSCALE) for f in files]
             image=np.zeros_like(images[0])
             for img in images:
                 image+=img
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+tiled storage for high resolution images, random crop read only the needed tiles
+
+with config.use_crop and keep_crop_ratio, the crop may be 40% of the image, but
+the whole image is decoded before crop. the tile file of an image is:
+    b'TILE' + uint32 header length + json header + tile bytes
+    header={'levels':{factor:{'shape':[h,w(,c)],'tile_size':256,'tiles':[[offset,length],...]}}}
+the tiles of each pyramid level are independently png compressed in row-major
+order, level 1 is the original image, level 2/4/... are downscaled.
+
+the png tiles are lossless, so the region read from level 1 tiles is identical
+to the crop of the decoded image.
+
+tile_root/{relative path to root_path}.tile, build the tiles with:
+python tools/build_tiles.py --dataset_name Cityscapes --split train --tile_root ~/cvdataset/tiles
+"""
+import os
+import json
+import struct
+import cv2
+import numpy as np
+
+magic=b'TILE'
+
+def get_tile_path(path,tile_root,root_path):
+    return os.path.join(tile_root,os.path.relpath(path,root_path)+'.tile')
+
+def encode_tiles(image,tile_size=256,levels=(1,),interpolation=cv2.INTER_AREA):
+    """
+    return the bytes of tile file for image
+    interpolation: downscale for level>1, INTER_NEAREST for label
+    """
+    header={'levels':{}}
+    chunks=[]
+    offset=0
+    for factor in levels:
+        if factor==1:
+            img=image
+        else:
+            h,w=image.shape[0:2]
+            img=cv2.resize(image,(max(1,w//factor),max(1,h//factor)),interpolation=interpolation)
+
+        tiles=[]
+        h,w=img.shape[0:2]
+        for y in range(0,h,tile_size):
+            for x in range(0,w,tile_size):
+                flag,buf=cv2.imencode('.png',img[y:y+tile_size,x:x+tile_size])
+                assert flag,'failed to encode tile'
+                buf=buf.tobytes()
+                tiles.append([offset,len(buf)])
+                chunks.append(buf)
+                offset+=len(buf)
+        header['levels'][str(factor)]={'shape':list(img.shape),'tile_size':tile_size,'tiles':tiles}
+
+    header=json.dumps(header).encode('utf-8')
+    return magic+struct.pack('<I',len(header))+header+b''.join(chunks)
+
+def write_tiles(image,tile_path,tile_size=256,levels=(1,),interpolation=cv2.INTER_AREA):
+    os.makedirs(os.path.dirname(tile_path),exist_ok=True)
+    tmp_path='{}.{}.tmp'.format(tile_path,os.getpid())
+    with open(tmp_path,'wb') as f:
+        f.write(encode_tiles(image,tile_size,levels,interpolation))
+    os.replace(tmp_path,tile_path)
+
+class tile_store():
+    def __init__(self,tile_root,root_path):
+        self.tile_root=tile_root
+        self.root_path=root_path
+        # tile path: (header,data offset), None for missing tile file
+        self.headers={}
+
+    def get_header(self,path):
+        tile_path=get_tile_path(path,self.tile_root,self.root_path)
+        if tile_path not in self.headers.keys():
+            if not os.path.exists(tile_path):
+                self.headers[tile_path]=None
+            else:
+                with open(tile_path,'rb') as f:
+                    assert f.read(4)==magic,'bad tile file {}'.format(tile_path)
+                    n=struct.unpack('<I',f.read(4))[0]
+                    header=json.loads(f.read(n).decode('utf-8'))
+                self.headers[tile_path]=(header,8+n)
+        return tile_path,self.headers[tile_path]
+
+    def exists(self,path):
+        return self.get_header(path)[1] is not None
+
+    def shape(self,path):
+        """
+        return the shape of the original image, None for missing tile file
+        """
+        tile_path,item=self.get_header(path)
+        if item is None:
+            return None
+        return tuple(item[0]['levels']['1']['shape'])
+
+    def read_region(self,path,rect,level=1):
+        """
+        rect: (x1,y1,th,tw) in the original image
+        return image[y1:y1+th,x1:x1+tw] of the pyramid level, decode the overlapped tiles only
+        """
+        tile_path,item=self.get_header(path)
+        assert item is not None,'missing tile file {}'.format(tile_path)
+        header,data_offset=item
+        info=header['levels'][str(level)]
+        shape=info['shape']
+        ts=info['tile_size']
+        x1,y1,th,tw=[v//level for v in rect]
+        assert x1>=0 and y1>=0 and y1+th<=shape[0] and x1+tw<=shape[1],'region {} out of image {}'.format(rect,shape)
+
+        out=np.zeros([th,tw]+shape[2:],dtype=np.uint8)
+        cols=(shape[1]+ts-1)//ts
+        with open(tile_path,'rb') as f:
+            for ty in range(y1//ts,(y1+th-1)//ts+1):
+                for tx in range(x1//ts,(x1+tw-1)//ts+1):
+                    offset,length=info['tiles'][ty*cols+tx]
+                    f.seek(data_offset+offset)
+                    buf=np.frombuffer(f.read(length),dtype=np.uint8)
+                    tile=cv2.imdecode(buf,cv2.IMREAD_UNCHANGED)
+
+                    # the overlap in image coordinate
+                    oy1,ox1=max(y1,ty*ts),max(x1,tx*ts)
+                    oy2,ox2=min(y1+th,(ty+1)*ts),min(x1+tw,(tx+1)*ts)
+                    out[oy1-y1:oy2-y1,ox1-x1:ox2-x1]=tile[oy1-ty*ts:oy2-ty*ts,ox1-tx*ts:ox2-tx*ts]
+        return out
+
+def get_tile_store(config):
+    """
+    return tile_store for config.tile_root, None for no tiles
+    """
+    if hasattr(config,'tile_root') and config.tile_root:
+        return tile_store(os.path.expanduser(config.tile_root),config.root_path)
+    return None
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+streaming input source for motion segmentation inference on video files and cameras
+
+a background thread decode the frames with cv2.VideoCapture, resize them to
+input_shape and put them into a bounded ring buffer, the consumer iterate
+(main,aux) pairs, aux is the frame frame_gap before main.
+
+backpressure:
+    - video file: the decode thread wait when the buffer is full, no frame dropped
+    - camera: the oldest frame in the buffer is dropped when the consumer is
+      slower than the camera, the number of dropped frames is counted
+
+usage:
+    stream=video_stream('test.mp4',frame_gap=5,input_shape=(224,224))
+    for indexes,mains,auxs in stream.batches(batch_size=4):
+        # mains,auxs: uint8 bgr frames with shape [b,h,w,3]
+        ...
+    stream.close()
+    print(stream.summary())
+
+see motion_benchmark.stream() for the inference loop.
+"""
+import threading
+import queue
+import time
+from collections import deque
+import cv2
+import numpy as np
+
+class video_stream():
+    def __init__(self,source,frame_gap=5,input_shape=None,buffer_size=32,drop_frames=None):
+        """
+        source: video file path or camera id (int or digit string)
+        frame_gap: the aux frame is frame_gap frames before the main frame
+        input_shape: [height,width] to resize the frames, None for original size
+        buffer_size: the max number of decoded frames wait for the consumer
+        drop_frames: drop the oldest frame when buffer is full, default True for camera
+        """
+        if isinstance(source,str) and source.isdigit():
+            source=int(source)
+        self.source=source
+        self.is_camera=isinstance(source,int)
+        self.frame_gap=frame_gap
+        self.input_shape=input_shape
+        self.drop_frames=self.is_camera if drop_frames is None else drop_frames
+
+        self.capture=cv2.VideoCapture(source)
+        assert self.capture.isOpened(),'cannot open video source {}'.format(source)
+        self.fps=self.capture.get(cv2.CAP_PROP_FPS)
+        # (height,width) of the original frames
+        self.shape=(int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                    int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)))
+
+        self.buffer=queue.Queue(maxsize=buffer_size)
+        self.stop_event=threading.Event()
+        self.finished=False
+        self.decoded=0
+        self.dropped=0
+        self.consumed=0
+        self.start_time=time.time()
+        self.thread=threading.Thread(target=self.decode_loop,daemon=True)
+        self.thread.start()
+
+    def decode_loop(self):
+        try:
+            while not self.stop_event.is_set():
+                flag,frame=self.capture.read()
+                if not flag:
+                    break
+                if self.input_shape is not None:
+                    # opencv resize image with (width,height)
+                    dsize=(self.input_shape[1],self.input_shape[0])
+                    frame=cv2.resize(frame,dsize,interpolation=cv2.INTER_LINEAR)
+                item=(self.decoded,frame)
+                self.decoded+=1
+                self.put(item)
+        finally:
+            self.capture.release()
+            self.finished=True
+
+    def put(self,item):
+        while not self.stop_event.is_set():
+            if self.drop_frames and self.buffer.full():
+                try:
+                    self.buffer.get_nowait()
+                    self.dropped+=1
+                except queue.Empty:
+                    pass
+            try:
+                self.buffer.put(item,timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def frames(self):
+        """
+        yield (frame index,frame) until the end of video or close()
+        """
+        while True:
+            try:
+                item=self.buffer.get(timeout=0.1)
+            except queue.Empty:
+                if self.finished or self.stop_event.is_set():
+                    if self.buffer.empty():
+                        return
+                continue
+            self.consumed+=1
+            yield item
+
+    def __iter__(self):
+        """
+        yield (frame index,main frame,aux frame), aux frame is the nearest
+        frame not later than index-frame_gap, the first frame at the beginning
+        """
+        history=deque()
+        for idx,frame in self.frames():
+            history.append((idx,frame))
+            while len(history)>1 and history[1][0]<=idx-self.frame_gap:
+                history.popleft()
+            yield idx,frame,history[0][1]
+
+    def batches(self,batch_size=1):
+        """
+        yield (frame indexes,main frames,aux frames), frames with shape [b,h,w,3]
+        """
+        batch=[]
+        for item in self:
+            batch.append(item)
+            if len(batch)==batch_size:
+                yield self.stack(batch)
+                batch=[]
+        if len(batch)>0:
+            yield self.stack(batch)
+
+    @staticmethod
+    def stack(batch):
+        indexes=[idx for idx,_,_ in batch]
+        mains=np.stack([main for _,main,_ in batch])
+        auxs=np.stack([aux for _,_,aux in batch])
+        return indexes,mains,auxs
+
+    def close(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def summary(self):
+        elapsed=max(time.time()-self.start_time,1e-6)
+        return {'decoded':self.decoded,
+                'dropped':self.dropped,
+                'consumed':self.consumed,
+                'fps':self.consumed/elapsed}
@@ -12,6 +12,11 @@ from ...utils.configs.motionseg_config import load_config,get_default_config
 from ...utils.notebook import get_model_and_dataset
 from .motion_utils import get_dataset
 from .motion_utils import fine_tune_config
+from .motion_utils import get_model
+from ...dataset.motionseg_dataset_factory import normalize_frames, batch_normer
+from ...dataset.video_stream import video_stream
+from ...utils.torch_tools import get_ckpt_path,load_ckpt
+from ...utils.metric.offline_evaluator import get_path_pairs, evaluate_pairs, aggregate, merge_frames, print_result
 import torch.nn.functional as F
 import numpy as np
 from tqdm import tqdm,trange
@@ -47,7 +52,7 @@ def benchmark(config_file,output_root_path='output'):
     tqdm_step = tqdm(dataset_loaders[split], desc='steps', leave=False)
     for data_dict in tqdm_step:
         assert isinstance(data_dict,dict),'type is {}'.format(data_dict)
-        images = [torch.autograd.Variable(img.to(device).float()) for img in data_dict['images']]
+        images = [torch.autograd.Variable(img) for img in normalize_frames(config,[img.to(device) for img in data_dict['images']])]
         gt_paths=data_dict['gt_path']
         assert len(gt_paths)==1
         save_path=get_save_path(gt_paths[0],config.root_path,os.path.join(output_root_path,config.dataset,config.note))
@@ -110,24 +115,6 @@ def showcase(config_file,output_root_path='output',generate_results=False,mode='
 
     if generate_results:
         benchmark(config_file,output_root_path)
-    def get_fmeasure(gt_path,save_path):
-        gt_img=cv2.imread(gt_path,cv2.IMREAD_GRAYSCALE)
-        if gt_img is None:
-            assert False,'invalid gt_path: {}'.format(gt_path)
-        pred_img=cv2.imread(save_path,cv2.IMREAD_GRAYSCALE)
-        if pred_img is None:
-            assert False,'invalid save_path: {}'.format(save_path)
-
-        tp=np.sum(np.logical_and(gt_img>0,pred_img>0))
-#        tn=np.sum(np.logical_and(gt_img==0,pred_img==0))
-        fp=np.sum(np.logical_and(gt_img==0,pred_img>0))
-        fn=np.sum(np.logical_and(gt_img>0,pred_img==0))
-
-        precision=tp/(tp+fp+1e-5)
-        recall=tp/(tp+fn+1e-5)
-        fmeasure=2*precision*recall/(precision+recall+1e-5)
-
-        return fmeasure
     config=load_config(config_file)
     default_config=get_default_config()
     for key in default_config.keys():
@@ -136,35 +123,23 @@ def showcase(config_file,output_root_path='output',generate_results=False,mode='
     config=fine_tune_config(config)
     split='val'
     dataset=get_dataset(config,split)
-    N=len(dataset)
+    assert config.dataset.upper() in ['FBMS','FBMS-3D','DAVIS2017','DAVIS2016','CDNET2014'] or \
+        config.dataset.lower() in ['segtrackv2'],'unsupported dataset {}'.format(config.dataset)
+    result_root_path=os.path.join(output_root_path,config.dataset,config.note)
+
+    def get_pred_path(img1_path,gt_path):
+        return get_save_path(gt_path,config.root_path,result_root_path)
+
+    frames=evaluate_pairs(get_path_pairs(dataset,config.dataset,get_pred_path),
+                          cache_path=os.path.join(result_root_path,'frame_results-{}.csv'.format(split)))
+
+    # the best/worst frame for each video
     category_dict={}
     fmeasure_dict={}
-    for idx in trange(N):
-        if config.dataset.upper()=='CDNET2014':
-            img1_path,img2_path,gt_path,_=dataset.__get_path__(idx)
-        else:
-            img1_path,img2_path,gt_path=dataset.__get_path__(idx)
-
-        if config.dataset.upper() in ['FBMS','FBMS-3D']:
-            save_path=get_save_path(gt_path,config.root_path,os.path.join(output_root_path,config.dataset,config.note))
-        elif config.dataset.upper() in ['DAVIS2017','DAVIS2016','CDNET2014']:
-            save_path=get_save_path(gt_path,
-                                    config.root_path,
-                                    os.path.join(output_root_path,config.dataset,config.note))
-        elif config.dataset.lower() in ['segtrackv2']:
-            gt_path=gt_path[0][0]
-            save_path=get_save_path(gt_path,
-                                    #os.path.join(config.root_path,'Annotations/480p'),
-                                    config.root_path,
-                                    os.path.join(output_root_path,config.dataset,config.note))
-        else:
-            assert False
-
-        if config.dataset.upper()=='CDNET2014':
-            category=img1_path.split('/')[-3]
-        else:
-            category=img1_path.split('/')[-2]
-        fmeasure=get_fmeasure(gt_path,save_path)
+    for frame in frames:
+        img1_path,save_path,gt_path=frame['img1_path'],frame['pred_path'],frame['gt_path']
+        category=frame['video']
+        fmeasure=merge_frames([frame])['fmeasure']
         if category not in category_dict.keys():
             category_dict[category]=(img1_path,save_path,gt_path)
             fmeasure_dict[category]=fmeasure
@@ -198,9 +173,11 @@ def showcase(config_file,output_root_path='output',generate_results=False,mode='
     plt.imshow(cv2.cvtColor(merge_img,cv2.COLOR_BGR2RGB))
     plt.show()
 
-def evaluation(config_file,output_root_path='output',generate_results=False,dataset_name=''):
+def evaluation(config_file,output_root_path='output',generate_results=False,dataset_name='',group=None,num_workers=None):
     """
     run benchmark() first
+    group: None, video or category, print the result for each group
+    the per-frame result table is cached in the output dir, see offline_evaluator.py
     """
     if not os.path.exists(config_file):
         pattern=os.path.expanduser('~/tmp/logs/motion/**/config.txt')
@@ -223,55 +200,87 @@ def evaluation(config_file,output_root_path='output',generate_results=False,data
         config.dataset=dataset_name
 
     dataset=get_dataset(config,split)
-    N=len(dataset)
-
-    sum_f=sum_p=sum_r=0
-    sum_tp=sum_fp=sum_tn=sum_fn=0
-    for idx in trange(N):
-        img1_path,img2_path,gt_path=dataset.__get_path__(idx)
-        save_path=get_save_path(gt_path,config.root_path,os.path.join(output_root_path,config.dataset,config.note))
-
-        gt_img=cv2.imread(gt_path,cv2.IMREAD_GRAYSCALE)
-        pred_img=cv2.imread(save_path,cv2.IMREAD_GRAYSCALE)
-
-        tp=np.sum(np.logical_and(gt_img>0,pred_img>0))
-        tn=np.sum(np.logical_and(gt_img==0,pred_img==0))
-        fp=np.sum(np.logical_and(gt_img==0,pred_img>0))
-        fn=np.sum(np.logical_and(gt_img>0,pred_img==0))
-
-        if tp+fn==0:
-            r=1
-        else:
-            r=tp/(tp+fn)
-
-        if tp+fp==0:
-            p=1
-        else:
-            p=tp/(tp+fp)
-
-        if p+r==0:
-            f=1
-        else:
-            f=2*p*r/(p+r)
-
-
-        sum_f+=f
-        sum_p+=p
-        sum_r+=r
-
-        sum_tp+=tp
-        sum_fp+=fp
-        sum_tn+=tn
-        sum_fn+=fn
-    overall_precision=sum_tp/(sum_tp+sum_fp+1e-5)
-    overall_recall=sum_tp/(sum_tp+sum_fn+1e-5)
-    overall_fmeasure=2*overall_precision*overall_recall/(overall_precision+overall_recall+1e-5)
-
-    print('tp={},tn={},fp={},fn={}'.format(sum_tp,sum_tn,sum_fp,sum_fn))
-    print('precision={},recall={}'.format(overall_precision,overall_recall))
-    print('overall fmeasure is {}'.format(overall_fmeasure))
-
-    print('mean precision={}, recall={}, fmeasure={}'.format(sum_p/N,sum_r/N,sum_f/N))
+    result_root_path=os.path.join(output_root_path,config.dataset,config.note)
+
+    def get_pred_path(img1_path,gt_path):
+        return get_save_path(gt_path,config.root_path,result_root_path)
+
+    frames=evaluate_pairs(get_path_pairs(dataset,config.dataset,get_pred_path),
+                          cache_path=os.path.join(result_root_path,'frame_results-{}.csv'.format(split)),
+                          num_workers=num_workers)
+    if group is not None:
+        for key,result in aggregate(frames,group).items():
+            print_result(result,key)
+    print_result(aggregate(frames))
+
+
+def load_model(config_file):
+    """
+    return model and config from config.txt, the checkpoint is in the same log dir
+    """
+    config=load_config(config_file)
+    default_config=get_default_config()
+    for key in default_config.keys():
+        if not hasattr(config,key):
+            config[key]=default_config[key]
+    config=fine_tune_config(config)
+    config.backbone_pretrained=False
+
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    model=get_model(config)
+    model.to(device)
+    model=load_ckpt(model,get_ckpt_path(os.path.dirname(config_file)))
+    model.eval()
+    return model,config
+
+def stream_inference(model,config,source,output_path=None,batch_size=1,buffer_size=32,drop_frames=None):
+    """
+    run model on video file or camera, see video_stream.py
+    the uint8 frames are normalized in batch on device
+    output_path: save the mask video, None for not save
+    return the stream summary with decoded, dropped, consumed frames and fps
+    """
+    assert config.input_format.lower() in ['-','n'],'stream not support input_format {}, no optical flow or ground truth'.format(config.input_format)
+    # random frame gap for train, use the mean gap for inference
+    frame_gap=config.frame_gap if config.frame_gap>0 else 5
+    stream=video_stream(source,frame_gap,config.input_shape,buffer_size,drop_frames)
+    height,width=stream.shape if min(stream.shape)>0 else config.input_shape
+
+    writer=None
+    if output_path is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)),exist_ok=True)
+        fps=stream.fps if stream.fps>0 else 25
+        writer=cv2.VideoWriter(output_path,cv2.VideoWriter_fourcc(*'mp4v'),fps,(width,height),False)
+
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    try:
+        with torch.no_grad():
+            for indexes,mains,auxs in tqdm(stream.batches(batch_size),desc='stream'):
+                images=[torch.from_numpy(x).to(device).permute(0,3,1,2) for x in [mains,auxs]]
+                images=[batch_normer.forward_batch(img) for img in images]
+                outputs=model.forward(images)
+                origin_mask=F.interpolate(outputs['masks'][0],size=(height,width),mode='nearest')
+                masks=(torch.argmax(origin_mask,dim=1)*255).to(torch.uint8).cpu().numpy()
+                if writer is not None:
+                    for mask in masks:
+                        writer.write(mask)
+    finally:
+        stream.close()
+        if writer is not None:
+            writer.release()
+
+    summary=stream.summary()
+    print('{}: decoded {decoded} frames, dropped {dropped}, processed {consumed}, {fps:.1f} fps'.format(source,**summary))
+    return summary
+
+def stream(config_file,source,output_path=None,batch_size=1,buffer_size=32):
+    """
+    python models/motionseg/motion_benchmark.py stream xxx/config.txt test.mp4 --output_path mask.mp4
+    python models/motionseg/motion_benchmark.py stream xxx/config.txt 0
+    """
+    model,config=load_model(config_file)
+    stream_inference(model,config,str(source),output_path,batch_size,buffer_size)
+
 if __name__ == '__main__':
     """
     # for FBMS
@@ -106,6 +106,21 @@ def get_parser():
                         type=int,
                         default=5)
 
+    parser.add_argument('--clip_length',
+                        help='train batch made of clips with clip_length neighbor frames, decode each frame once for the clip, 0 for shuffle (0)',
+                        type=int,
+                        default=0)
+
+    parser.add_argument('--clip_shuffle_buffer',
+                        help='the number of clips to draw the batch from in clip mode (8)',
+                        type=int,
+                        default=8)
+
+    parser.add_argument('--frame_cache_size',
+                        help='the number of decoded frames cached in each dataloader worker in clip mode (32)',
+                        type=int,
+                        default=32)
+
     parser.add_argument('--use_none_layer',
                         help='use nono layer to replace maxpool2d or not',
                         type=str2bool,
@@ -259,6 +274,57 @@ def get_parser():
                         type=int,
                         default=None)
 
+    parser.add_argument('--dataset_backend',
+                        help='read dataset from disc or packed shards (disc), see tools/pack_dataset.py',
+                        choices=['disc','packed'],
+                        default='disc')
+
+    parser.add_argument('--packed_root',
+                        help='root directory for packed dataset shards',
+                        default=os.path.expanduser('~/cvdataset/packed'))
+
+    parser.add_argument('--flow_store_root',
+                        help='root directory for float16 optical flow store, see tools/convert_flow_store.py',
+                        default=None)
+
+    parser.add_argument('--missing_flow',
+                        help='raise error or use zeros for missing optical flow (error)',
+                        choices=['error','zeros'],
+                        default='error')
+
+    parser.add_argument('--norm_on_batch',
+                        help='dataset return uint8 frames and normalize the batch in torch (False)',
+                        type=str2bool,
+                        default=False)
+
+    parser.add_argument('--frame_index_dir',
+                        help='cache directory for per-video frame index, empty string for no cache',
+                        type=str,
+                        default=os.path.expanduser('~/.cache/torchseg/frame_index'))
+
+    parser.add_argument('--manifest_dir',
+                        help='cache directory for dataset file lists, empty string for no cache',
+                        type=str,
+                        default=os.path.expanduser('~/.cache/torchseg/manifest'))
+
+    parser.add_argument('--reduced_decode',
+                        help='decode image with reduced factor 2/4/8 when image is much larger than input_shape (False)',
+                        type=str2bool,
+                        default=False)
+
+    parser.add_argument('--resume_path',
+                        help='resume training from log_dir/resume.pkl, continue at the next batch (None)',
+                        default=None)
+
+    parser.add_argument('--resume_save_steps',
+                        help='save resume.pkl every n steps and after each epoch, 0 for after each epoch (0)',
+                        type=int,
+                        default=0)
+
+    parser.add_argument('--pyramid_root',
+                        help='root directory for pre-downscaled images, see tools/decode_benchmark.py',
+                        default=None)
+
     # 2020/01/08
     parser.add_argument('--checkpoint_path',
                         help='the checkpoint path to load for test and validation',
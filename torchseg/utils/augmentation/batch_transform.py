@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+batch photometric augmentation with torch, apply to the whole image batch
+on the consumer side (train_val), instead of ImageAugmenter.augument_image
+for each sample in the dataset.
+
+the random parameters are sampled for each sample in the batch, the same
+distribution as ImageAugmenter:
+imgaug: sometimes(blur), sometimes(noise), sometimes(dropout), sometimes(bright)
+    blur: gaussian blur with sigma in [0,3] (average/median blur are replaced by gaussian blur)
+    noise: additive gaussian noise with scale in [0,0.05*255], per_channel=0.5
+    dropout: drop pixels with p in [0.01,0.1], per_channel=0.5
+    bright: add value in [-10,10], per_channel=0.5
+pillow: ColorJitter(brightness=10, contrast=0.05, saturation=0.05) with propability
+    (the hue jitter 0.01 is ignored)
+
+the augmentations are applied in fixed order, not random order.
+
+input: uint8 or float image tensor with shape [b,3,h,w] and value in [0,255]
+output: float image tensor with value in [0,255]
+"""
+import math
+import torch
+import torch.nn.functional as F
+
+class BatchAugmenter(object):
+    def __init__(self, config):
+        self.propability = config.propability
+        self.aug_library = config.aug_library
+        assert self.aug_library in ['imgaug','warp','pillow'], \
+            'unsupported batch augmentation library {}'.format(self.aug_library)
+
+        self.max_sigma = 3.0
+        self.max_noise_scale = 0.05*255
+        self.dropout = [0.01, 0.1]
+        self.bright = [-10, 10]
+        self.brightness = [0, 11]
+        self.contrast = [0.95, 1.05]
+        self.saturation = [0.95, 1.05]
+
+    def sometimes(self, images):
+        """
+        return the index of the samples to apply the augmentation
+        """
+        b = images.shape[0]
+        return torch.nonzero(torch.rand(b, device=images.device) < self.propability).view(-1)
+
+    @staticmethod
+    def uniform(shape, low, high, device):
+        return torch.rand(shape, device=device)*(high-low)+low
+
+    @staticmethod
+    def per_channel(values, per_channel=0.5):
+        """
+        values: [b,c,...], use the values of channel 0 for all channels
+        for the samples with random number >= per_channel
+        """
+        b = values.shape[0]
+        mask = torch.rand(b, device=values.device) < per_channel
+        mask = mask.view([b]+[1]*(values.dim()-1))
+        return torch.where(mask, values, values[:, 0:1].expand_as(values))
+
+    def gaussian_blur(self, x):
+        b, c, h, w = x.shape
+        sigma = self.uniform(b, 0, self.max_sigma, x.device).clamp(min=1e-3)
+        radius = int(math.ceil(3*self.max_sigma))
+        radius = min(radius, (min(h, w)-1)//2)
+        if radius < 1:
+            return x
+
+        offset = torch.arange(-radius, radius+1, device=x.device, dtype=x.dtype)
+        # [b,k] normalized kernel for each sample
+        kernel = torch.exp(-0.5*(offset.view(1, -1)/sigma.view(-1, 1))**2)
+        kernel = kernel/kernel.sum(dim=1, keepdim=True)
+        kernel = kernel.repeat_interleave(c, dim=0)
+        k = 2*radius+1
+
+        # separable depthwise convolution, one group for each channel of each sample
+        y = x.reshape(1, b*c, h, w)
+        y = F.pad(y, [radius, radius, 0, 0], mode='reflect')
+        y = F.conv2d(y, kernel.view(b*c, 1, 1, k), groups=b*c)
+        y = F.pad(y, [0, 0, radius, radius], mode='reflect')
+        y = F.conv2d(y, kernel.view(b*c, 1, k, 1), groups=b*c)
+        return y.view(b, c, h, w)
+
+    def gaussian_noise(self, x):
+        b = x.shape[0]
+        scale = self.uniform((b, 1, 1, 1), 0, self.max_noise_scale, x.device)
+        noise = self.per_channel(torch.randn_like(x))
+        return x+noise*scale
+
+    def pixel_dropout(self, x):
+        b = x.shape[0]
+        p = self.uniform((b, 1, 1, 1), self.dropout[0], self.dropout[1], x.device)
+        keep = self.per_channel(torch.rand_like(x)) >= p
+        return x*keep.to(x.dtype)
+
+    def add_bright(self, x):
+        b, c = x.shape[0:2]
+        value = torch.randint(self.bright[0], self.bright[1]+1, (b, c, 1, 1), device=x.device).to(x.dtype)
+        return x+self.per_channel(value)
+
+    def color_jitter(self, x):
+        b = x.shape[0]
+        brightness = self.uniform((b, 1, 1, 1), self.brightness[0], self.brightness[1], x.device)
+        x = (x*brightness).clamp(0, 255)
+
+        contrast = self.uniform((b, 1, 1, 1), self.contrast[0], self.contrast[1], x.device)
+        gray = x.mean(dim=1, keepdim=True)
+        mean = gray.mean(dim=(2, 3), keepdim=True)
+        x = (contrast*x+(1-contrast)*mean).clamp(0, 255)
+
+        saturation = self.uniform((b, 1, 1, 1), self.saturation[0], self.saturation[1], x.device)
+        gray = x.mean(dim=1, keepdim=True)
+        return (saturation*x+(1-saturation)*gray).clamp(0, 255)
+
+    def apply(self, images, fn):
+        idx = self.sometimes(images)
+        if idx.numel() > 0:
+            images[idx] = fn(images[idx])
+        return images
+
+    def forward(self, images):
+        # copy, the augmentation is applied in place for the selected samples
+        images = images.to(dtype=torch.float32, copy=True)
+        if self.aug_library in ['imgaug','warp']:
+            for fn in [self.gaussian_blur, self.gaussian_noise, self.pixel_dropout, self.add_bright]:
+                images = self.apply(images, fn)
+        else:
+            images = self.apply(images, self.color_jitter)
+        return images.clamp(0, 255)
+
+    def __call__(self, images):
+        return self.forward(images)
@@ -87,22 +87,11 @@ def get_crop_size(config,image_size):
     return crop_size
 
 
-def rotate_while_keep_size(image, rotation, interpolation):
-    def rotateImage(image, angle):
-        image_center = tuple(np.array(image.shape[1::-1]) / 2)
-        rot_mat = cv2.getRotationMatrix2D(image_center, angle, 1.0)
-        result = cv2.warpAffine(image, rot_mat, image.shape[1::-1], flags=interpolation)
-        return result
-
-    # Get size before we rotate
-    y, x = image.shape[0:2]
-    #        rotation=rotation*2
-    #        image_2a=rotateImage(image,rotation)
-    image_a = rotateImage(image, rotation / 2)
-    #        Y_2a,X_2a=image_2a.shape[0:2]
-    Y_a, X_a = image_a.shape[0:2]
-    assert y == Y_a and x == X_a, 'rotate image has different size'
-
+def get_rotate_window(x, y, rotation):
+    """
+    the max axis-aligned window (x_new,y_new,x_new_end,y_new_end) inside the
+    image with size (x,y) rotated by rotation/2, see rotate_while_keep_size
+    """
     #        tan_angle=math.tan(math.radians(rotation))
     tan_angle_half = math.tan(math.radians(rotation / 2))
     cos_angle = math.cos(math.radians(rotation))
@@ -124,8 +113,56 @@ def rotate_while_keep_size(image, rotation, interpolation):
     y_new = int(math.ceil((y - height_new_float) / 2))
     x_new_end = int(math.floor(width_new_float + (x - width_new_float) / 2))
     y_new_end = int(math.floor(height_new_float + (y - height_new_float) / 2))
+    return x_new, y_new, x_new_end, y_new_end
 
+def rotate_while_keep_size(image, rotation, interpolation):
+    def rotateImage(image, angle):
+        image_center = tuple(np.array(image.shape[1::-1]) / 2)
+        rot_mat = cv2.getRotationMatrix2D(image_center, angle, 1.0)
+        result = cv2.warpAffine(image, rot_mat, image.shape[1::-1], flags=interpolation)
+        return result
+
+    # Get size before we rotate
+    y, x = image.shape[0:2]
+    #        rotation=rotation*2
+    #        image_2a=rotateImage(image,rotation)
+    image_a = rotateImage(image, rotation / 2)
+    #        Y_2a,X_2a=image_2a.shape[0:2]
+    Y_a, X_a = image_a.shape[0:2]
+    assert y == Y_a and x == X_a, 'rotate image has different size'
+
+    x_new, y_new, x_new_end, y_new_end = get_rotate_window(x, y, rotation)
     new_image = image_a[y_new:y_new_end, x_new:x_new_end]
     #        print(y,x)
     # Return the image, re-sized to the size of the image passed originally
-    return cv2.resize(src=new_image, dsize=(x, y), interpolation=interpolation)
\ No newline at end of file
+    return cv2.resize(src=new_image, dsize=(x, y), interpolation=interpolation)
+
+def get_warp_matrix(crop_offset, crop_size, angle=None, hflip=False, vflip=False):
+    """
+    the affine matrix (2x3) for crop_transform + rotate_transform + horizontal/vertical flip
+    in ImageTransformer, so the image and mask can be transformed by one warpAffine
+    crop_offset: (x1,y1), the top left corner of the crop
+    crop_size: (th,tw), the output size
+    """
+    th, tw = crop_size
+    x1, y1 = crop_offset
+    # crop
+    matrix = np.array([[1, 0, -x1], [0, 1, -y1], [0, 0, 1]], dtype=np.float64)
+    if angle is not None:
+        # rotate with angle/2 around the crop center
+        rot_mat = np.eye(3)
+        rot_mat[0:2] = cv2.getRotationMatrix2D((tw / 2, th / 2), angle / 2, 1.0)
+        # the valid window in rotated crop, resize it to crop size
+        x_new, y_new, x_new_end, y_new_end = get_rotate_window(tw, th, angle)
+        sx = tw / (x_new_end - x_new)
+        sy = th / (y_new_end - y_new)
+        # cv2.resize align the pixel center: dst=(src+0.5)*scale-0.5
+        resize_mat = np.array([[sx, 0, sx * (0.5 - x_new) - 0.5],
+                               [0, sy, sy * (0.5 - y_new) - 0.5],
+                               [0, 0, 1]], dtype=np.float64)
+        matrix = resize_mat @ rot_mat @ matrix
+    if hflip:
+        matrix = np.array([[-1, 0, tw - 1], [0, 1, 0], [0, 0, 1]], dtype=np.float64) @ matrix
+    if vflip:
+        matrix = np.array([[1, 0, 0], [0, -1, th - 1], [0, 0, 1]], dtype=np.float64) @ matrix
+    return matrix[0:2]
@@ -4,6 +4,7 @@ ImageAugmenter: apply to input image
 ImageTransformer: apply to input image and annotations
 
 imgaug: use library img_aug to augment image and mask
+warp: the same transform as imgaug, but crop+rotate+flip image and mask with one warpAffine
 pillow: use the library in pillow_transform
 semseg: use the library in semseg_transform to augment iamge and mask
 
@@ -24,8 +25,9 @@ from easydict import EasyDict as edict
 from torchvision import transforms as TT
 from .augmentation import pillow_transform as pillow
 from .augmentation import semseg_transform as semseg
+from .augmentation.batch_transform import BatchAugmenter
 from .disc_tools import show_images
-from .augmentation.custom import get_crop_size,rotate_while_keep_size
+from .augmentation.custom import get_crop_size,rotate_while_keep_size,get_warp_matrix
 from functools import partial
 
 
@@ -35,7 +37,7 @@ class ImageAugmenter:
         self.aug_library = config.aug_library
 #        self.print=True        
         # use imgaug to do data augmentation
-        if self.aug_library =='imgaug':
+        if self.aug_library in ['imgaug','warp']:
             sometimes = lambda aug: iaa.Sometimes(propability, aug)
             blur = iaa.OneOf([
                 iaa.GaussianBlur((0, 3.0)),
@@ -83,7 +85,7 @@ class ImageAugmenter:
 #            noise_img,mask=AddImpulseNoise(image,noise_density=0.2,noise_type="salt_pepper",rho=0.5)
 #            return noise_img
         
-        if self.aug_library=='imgaug':
+        if self.aug_library in ['imgaug','warp']:
             return self.iaa_seq.augment_image(image)
         elif self.aug_library=='pillow':
             return self.tt_seq(image)
@@ -141,7 +143,55 @@ class ImageTransformer(object):
                 assert mask is not None
             return image, mask
 
-    def transform_image_and_mask(self, image, mask):
+    def transform_image_and_mask_warp(self, image, mask, angle=None, crop_size=None, hflip=False, vflip=False):
+        """
+        the same transform as transform_image_and_mask_imgaug, but one warpAffine for image and mask
+        image: bilinear interpolation, mask: nearest interpolation, pad with ignore_index
+        """
+        assert self.aug_library == 'warp'
+        h, w = mask.shape[0:2]
+        if crop_size is None:
+            th, tw = h, w
+            x1, y1 = 0, 0
+        else:
+            th, tw = crop_size
+            assert h >= th, 'crop size (%d,%d) should small than image size (%d,%d)' % (th, tw, h, w)
+            assert w >= tw, 'crop size (%d,%d) should small than image size (%d,%d)' % (th, tw, h, w)
+            x1 = random.randint(0, w - tw)
+            y1 = random.randint(0, h - th)
+
+        if angle is None and not hflip and not vflip:
+            return image[y1:y1 + th, x1:x1 + tw], mask[y1:y1 + th, x1:x1 + tw]
+
+        matrix = get_warp_matrix((x1, y1), (th, tw), angle=angle, hflip=hflip, vflip=vflip)
+        ignore_index = self.config.ignore_index if hasattr(self.config, 'ignore_index') else 255
+        new_image = cv2.warpAffine(image, matrix, (tw, th), flags=cv2.INTER_LINEAR,
+                                   borderMode=cv2.BORDER_CONSTANT, borderValue=[123, 116, 103])
+        new_mask = cv2.warpAffine(mask, matrix, (tw, th), flags=cv2.INTER_NEAREST,
+                                  borderMode=cv2.BORDER_CONSTANT, borderValue=ignore_index)
+        return new_image, new_mask
+
+    def get_crop_rect(self, image_size):
+        """
+        sample the random crop (x1,y1,th,tw) before decode, so the dataset can read
+        the crop region only, see tile_store.py. None for no crop.
+        the same crop as crop_transform and transform_image_and_mask_warp
+        """
+        if not self.config.use_crop or self.aug_library not in ['imgaug','warp']:
+            return None
+
+        h, w = image_size[0:2]
+        th, tw = get_crop_size(self.config, image_size)
+        if h < th or w < tw:
+            return None
+        x1 = random.randint(0, w - tw)
+        y1 = random.randint(0, h - th)
+        return x1, y1, th, tw
+
+    def transform_image_and_mask(self, image, mask, precropped=False):
+        """
+        precropped: the image and mask are cropped by get_crop_rect(), skip the crop
+        """
         config=self.config
 
         if self.config.use_rotate:
@@ -153,7 +203,7 @@ class ImageTransformer(object):
         # image_size = height, width , channel
         image_size=image.shape
         # crop_size <= image_size
-        if self.config.use_crop:
+        if self.config.use_crop and not precropped:
             crop_size = get_crop_size(config, image_size)
         else:
             crop_size=None
@@ -179,6 +229,13 @@ class ImageTransformer(object):
                                                      crop_size=crop_size,
                                                      hflip=hflip,
                                                      vflip=vflip)
+        elif self.aug_library=='warp':
+            return self.transform_image_and_mask_warp(image,
+                                                   mask,
+                                                   angle=angle,
+                                                   crop_size=crop_size,
+                                                   hflip=hflip,
+                                                   vflip=vflip)
         elif self.aug_library=='pillow':
             return self.transform_image_and_mask_pillow(image,
                                                     mask,
@@ -294,10 +351,30 @@ def get_default_augmentor_config(config=None):
     return config
 
 
+def use_batch_augmentation(config):
+    if not hasattr(config,'batch_augmentation') or not config.batch_augmentation:
+        return False
+    if hasattr(config,'augmentations_blur') and not config.augmentations_blur:
+        return False
+    return True
+
+def get_batch_augmenter(config):
+    """
+    return BatchAugmenter for the image batch in train_val if config.batch_augmentation, else None
+    the batch is uint8 image before normalization, so it need config.norm_on_batch
+    """
+    if not config.augmentation or not use_batch_augmentation(config):
+        return None
+
+    assert hasattr(config,'norm_on_batch') and config.norm_on_batch,'batch_augmentation need norm_on_batch=True'
+    return BatchAugmenter(get_default_augmentor_config(config))
+
 class Augmentations(object):
     def __init__(self, config=None):
         config = get_default_augmentor_config(config)
         self.aug_library=config.aug_library
+        # the image only augmentation is applied on the batch, see get_batch_augmenter
+        self.batch_augmentation=use_batch_augmentation(config)
 
         if self.aug_library=='semseg':
             value_scale = 255
@@ -318,7 +395,7 @@ class Augmentations(object):
                 
             self.tran = semseg.Compose(transforms)
             
-        elif self.aug_library in ['imgaug','pillow']:
+        elif self.aug_library in ['imgaug','pillow','warp']:
             # augmentation for image
             self.aug = ImageAugmenter(config=config)
             # augmentation for image and mask
@@ -326,17 +403,31 @@ class Augmentations(object):
         else:
             assert False,'unsupported augmentation library {}'.format(self.aug_library)
 
-    def transform(self, image, mask=None):
+    def get_crop_rect(self, image_size):
+        """
+        the random crop (x1,y1,th,tw) sampled before decode, None if not supported
+        """
+        if self.aug_library in ['imgaug','warp']:
+            return self.tran.get_crop_rect(image_size)
+        return None
+
+    def transform(self, image, mask=None, precropped=False):
+        """
+        precropped: image and mask are cropped by get_crop_rect()
+        """
+        if mask is None and self.batch_augmentation:
+            return image
+
         if self.aug_library=='semseg':
             if mask is None:
                 return image
             else:
                 return self.tran(image,mask)
-        elif self.aug_library in ['imgaug','pillow']:
+        elif self.aug_library in ['imgaug','pillow','warp']:
             if mask is None:
                 return self.aug.augument_image(image)
             else:
-                return self.tran.transform_image_and_mask(image, mask)
+                return self.tran.transform_image_and_mask(image, mask, precropped=precropped)
         else:
             assert False,'unsupported augmentation library {}'.format(self.aug_library)
 
@@ -8,7 +8,9 @@ import torch
 import torch.utils.data as TD
 import glob
 
-from torchseg.dataset.dataset_generalize import dataset_generalize, image_normalizations
+from torchseg.dataset.dataset_generalize import dataset_generalize, get_sample_normalizations, get_batch_normalizations
+from torchseg.dataset.dataset_manifest import get_dataset_manifest
+from torchseg.dataset.packed_dataset import get_file_store
 from torchseg.utils.disc_tools import get_newest_file
 from torchseg.utils.augmentor import Augmentations
 import numpy as np
@@ -17,10 +19,7 @@ import cv2
 import warnings
 
 def get_loader(config,split):
-    if config.norm_ways is None:
-        normalizations = None
-    else:
-        normalizations = image_normalizations(config.norm_ways)
+    normalizations = get_sample_normalizations(config)
 
     if split=='test':
         test_dataset=dataset_generalize(config,split=split,
@@ -127,6 +126,9 @@ def keras_benchmark(model,test_loader=None,config=None,checkpoint_path=None,pred
 
     if test_loader is None:
         test_loader=get_loader(config,'test')
+    # original image shape without decode, see dataset_manifest.py
+    manifest=get_dataset_manifest(config,get_file_store(config,'test'),'test')
+    batch_normalizations=get_batch_normalizations(config)
     for step, data in enumerate(test_loader):
         # tensor with shape [b,c,h,w]
         if isinstance(data['image'],(tuple,list)):
@@ -136,6 +138,9 @@ def keras_benchmark(model,test_loader=None,config=None,checkpoint_path=None,pred
             images=data['image'].to(device).float()
             image_names=data['filename']
 
+        if batch_normalizations is not None:
+            images=batch_normalizations.forward_batch(images)
+
         # tensor with shape [b,c,h,w]
         tensor_outputs=model.forward(images)
         # numpy array with shape [b,h,w]
@@ -153,11 +158,12 @@ def keras_benchmark(model,test_loader=None,config=None,checkpoint_path=None,pred
         main_output=main_output.data.cpu().numpy()
         for idx,f in enumerate(image_names):
             save_filename=os.path.join(predict_save_path,os.path.basename(f)).replace('.jpg','.png')
-            origin_img=cv2.imread(f)
-            origin_shape=origin_img.shape
+            origin_shape=manifest.shape(f)
+            assert origin_shape is not None,'cannot read image shape for {}'.format(f)
             resize_img=cv2.resize(main_output[idx],
                                   dsize=(origin_shape[1],origin_shape[0]),
                                   interpolation=cv2.INTER_NEAREST)
-            assert resize_img.shape[0:2]==origin_img.shape[0:2],'{} vs {}'.format(resize_img.shape,origin_img.shape)
+            assert resize_img.shape[0:2]==origin_shape[0:2],'{} vs {}'.format(resize_img.shape,origin_shape)
             save_pil_image(resize_img,save_filename,palette)
             print('save image to',save_filename)
+    manifest.save()
@@ -26,7 +26,10 @@ def get_default_config():
     config.backbone_pretrained=True
     config.batch_size=4
     config.checkpoint_path=None
+    config.clip_length=0
+    config.clip_shuffle_buffer=8
     config.dataset='cdnet2014'
+    config.dataset_backend='disc'
     config.decode_main_layer=1
     config.deconv_layer=5
     config.epoch=30
@@ -34,7 +37,10 @@ def get_default_config():
     config.filter_feature=None
     config.filter_relu=True
     config.filter_type='main'
+    config.flow_store_root=None
+    config.frame_cache_size=32
     config.frame_gap=5
+    config.frame_index_dir=os.path.expanduser('~/.cache/torchseg/frame_index')
     config.freeze_layer=1
     config.freeze_ratio=0.0
     config.fusion_type='all'
@@ -46,17 +52,25 @@ def get_default_config():
     config.log_dir=os.path.expanduser('~/tmp/logs/motion')
     config.loss_name='ce'
     config.main_panet=False
+    config.manifest_dir=os.path.expanduser('~/.cache/torchseg/manifest')
     config.max_channel_number=1024
     config.merge_type='concat'
     config.min_channel_number=0
+    config.missing_flow='error'
     config.modify_resnet_head=False
     config.motion_loss_weight=1.0
     config.net_name='motion_unet'
+    config.norm_on_batch=False
     config.norm_stn_pose=False
     config.note='test'
     config.optimizer='adam'
+    config.packed_root=os.path.expanduser('~/cvdataset/packed')
     config.pose_mask_reg=1.0
     config.psp_scale=5
+    config.pyramid_root=None
+    config.reduced_decode=False
+    config.resume_path=None
+    config.resume_save_steps=0
     config.save_model=True
     config.seed=None
     config.share_backbone=None
@@ -65,22 +65,26 @@ def get_default_config():
     config.attention_type='n'
     config.augmentations_blur=True
     config.augmentation=True
+    config.auto_class_counts=False
     config.aux_base_weight=1.0
     config.auxnet_layer=4
     config.auxnet_type='bilinear'
     config.backbone_freeze=False
     config.backbone_name='vgg16'
     config.backbone_pretrained=True
+    config.batch_augmentation=False
     config.batch_size=4
     config.center_loss=None
     config.center_loss_weight=1.0
     config.changed_lr_mult=1.0
     config.checkpoint_path=None
     config.cityscapes_split=random.choice(['test','val','train'])
+    config.class_count_file=None
     config.class_number=20
     config.class_weight_alpha=0.0
     config.crop_size_step=0
     config.cross_merge_times=1
+    config.dataset_backend='disc'
     config.dataset_name='Cityscapes'
     config.dataset_use_part=0
     config.deconv_layer=5
@@ -88,6 +92,7 @@ def get_default_config():
     config.dist_url='tcp://127.0.0.1:9876'
     config.edge_base_weight=1.0
     config.edge_bg_weight=0.01
+    config.edge_cache_dir=None
     config.edge_class_num=2
     config.edge_power=0.9
     config.edge_seg_order='same'
@@ -107,10 +112,12 @@ def get_default_config():
     config.keep_crop_ratio=True
     config.l1_reg=1e-7
     config.l2_reg=1e-5
+    config.label_cache_dir=None
     config.layer_preference='last'
     config.learning_rate=1e-4
     config.log_dir=os.path.expanduser('~/tmp/logs/pytorch')
     config.loss_type='cross_entropy'
+    config.manifest_dir=os.path.expanduser('~/.cache/torchseg/manifest')
     config.max_channel_number=256
     config.max_crop_size=None
     config.main_base_weight=1.0
@@ -126,23 +133,32 @@ def get_default_config():
     config.net_name='pspnet'
     config.new_lr_mult=1.0
     config.n_node=1
+    config.norm_on_batch=False
     config.norm_ways='pytorch'
     config.note='default'
     config.note=None
     config.num_workers=8
     config.optimizer='adam'
     config.output_shape=(224,224)
+    config.packed_root=os.path.expanduser('~/cvdataset/packed')
     config.pad_for_crop=False
     config.predict_save_path=None
     config.pre_lr_mult=1.0
+    config.pyramid_root=None
     config.rank=0
+    config.reduced_decode=False
     config.res_attention=False
+    config.resume_path=None
+    config.resume_save_steps=0
     config.root_path=''
     config.save_model=False
     config.scheduler=None
+    config.sampler='uniform'
+    config.sampler_threshold=0.1
     config.seed=42
     config.subclass_sigmoid=True
     config.summary_image=False
+    config.tile_root=None
     config.test='naive'
     config.upsample_layer=3
     config.upsample_type='bilinear'
@@ -346,6 +362,25 @@ def get_parser():
                         default=0.0,
                         type=float)
 
+    parser.add_argument('--class_count_file',
+                        help='statistics json file from tools/research/dataset_mean_std.py for class weight (None)',
+                        default=None)
+
+    parser.add_argument('--auto_class_counts',
+                        help='compute the class counts for class weight from the train dataset instead of config.counts (False)',
+                        default=False,
+                        type=str2bool)
+
+    parser.add_argument('--sampler',
+                        help='sampler for train dataset, rare_class oversample the images with rare classes (uniform)',
+                        choices=['uniform','rare_class'],
+                        default='uniform')
+
+    parser.add_argument('--sampler_threshold',
+                        help='class image frequency threshold for rare_class sampler (0.1)',
+                        default=0.1,
+                        type=float)
+
     parser.add_argument('--focal_loss_gamma',
                         help='gamma for focal loss, <0 then not use focal loss',
                         default=-1.0,
@@ -544,6 +579,10 @@ def get_parser():
                         choices=['first','later','same'],
                         default='same')
 
+    parser.add_argument('--edge_cache_dir',
+                        help='cache directory for edge labels without random augmentation, see dataset/edge_label.py (None)',
+                        default=None)
+
     parser.add_argument('--edge_with_gray',
                         help='add semantic edge with gray edge',
                         type=str2bool,
@@ -586,6 +625,11 @@ def get_parser():
                         type=str2bool,
                         default=True)
 
+    parser.add_argument('--batch_augmentation',
+                        help='apply the image augmentation (blur, noise, ...) on the batch in torch, need norm_on_batch (False)',
+                        type=str2bool,
+                        default=False)
+
     parser.add_argument('--use_rotate',
                         help='augmentations rotate',
                         type=str2bool,
@@ -627,10 +671,14 @@ def get_parser():
                         default=False)
 
     parser.add_argument('--norm_ways',
-                        help='normalize image value ways',
-                        choices=['caffe','pytorch','cityscapes','-1,1','0,1','common','huawei'],
+                        help='normalize image value ways, caffe,pytorch,cityscapes,-1,1,0,1,common,huawei or statistics json file from tools/research/dataset_mean_std.py',
                         default='pytorch')
 
+    parser.add_argument('--norm_on_batch',
+                        help='dataset return uint8 image and normalize the batch in torch (False)',
+                        type=str2bool,
+                        default=False)
+
     parser.add_argument('--hyperopt',
                         help='tree search or bayes search for hyper parameters',
                         choices=['bayes','skopt','loop'],
@@ -719,11 +767,11 @@ def get_parser():
 
     # use_imgaug 2019/10/14
     parser.add_argument('--aug_library',
-                        help='use imgaug/pillow/semseg for data augmentation,\
+                        help='use imgaug/pillow/semseg/warp for data augmentation,\
                             currently not support album',
                         type=str,
                         default='imgaug',
-                        choices=['imgaug','semseg','pillow','album'])
+                        choices=['imgaug','semseg','pillow','album','warp'])
 
     # use_sync_bn 2019/10/22
     parser.add_argument('--use_sync_bn',
@@ -733,10 +781,51 @@ def get_parser():
 
     # 2019/10/22
     parser.add_argument('--num_workers',
-                        help='the number of data loader workers (8)',
+                        help='the number of data loader workers, see tools/loader_benchmark.py (8)',
                         type=int,
                         default=8)
 
+    parser.add_argument('--dataset_backend',
+                        help='read dataset from disc or packed shards (disc), see tools/pack_dataset.py',
+                        choices=['disc','packed'],
+                        default='disc')
+
+    parser.add_argument('--packed_root',
+                        help='root directory for packed dataset shards',
+                        default=os.path.expanduser('~/cvdataset/packed'))
+
+    parser.add_argument('--label_cache_dir',
+                        help='cache directory for rasterized json annotation, such as ~/.cache/torchseg/label_cache, default None for no cache',
+                        type=str,
+                        default=None)
+
+    parser.add_argument('--manifest_dir',
+                        help='cache directory for dataset file lists, image shapes and label histograms, empty string for no cache',
+                        type=str,
+                        default=os.path.expanduser('~/.cache/torchseg/manifest'))
+
+    parser.add_argument('--reduced_decode',
+                        help='decode image with reduced factor 2/4/8 when image is much larger than input_shape (False)',
+                        type=str2bool,
+                        default=False)
+
+    parser.add_argument('--resume_path',
+                        help='resume training from log_dir/resume.pkl, continue at the next batch (None)',
+                        default=None)
+
+    parser.add_argument('--resume_save_steps',
+                        help='save resume.pkl every n steps and after each epoch, 0 for after each epoch (0)',
+                        type=int,
+                        default=0)
+
+    parser.add_argument('--pyramid_root',
+                        help='root directory for pre-downscaled images, see tools/decode_benchmark.py',
+                        default=None)
+
+    parser.add_argument('--tile_root',
+                        help='root directory for tiled images and labels, random crop read only the needed tiles, see tools/build_tiles.py',
+                        default=None)
+
     # 2019/10/24
     parser.add_argument('--mp_dist',
                         help='use multiprocess distribute trainning or not (False)',
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+single pass dataset statistics with mergeable partial results
+
+for each image and label:
+    - rgb mean and std, merged with the parallel welford formula
+      n=na+nb, delta=mean_b-mean_a
+      mean=mean_a+delta*nb/n, m2=m2_a+m2_b+delta^2*na*nb/n
+    - class pixel counts with one bincount of the raw label, then remap the
+      256 bins to train ids, no full image remap
+    - the number of images contain each class
+    - image size histogram
+
+each worker of the process pool compute the statistics for a chunk of
+samples, the main process merge the partial results.
+
+the summary is saved as json file, which can be used as:
+    --norm_ways stats.json         image_normalizations with the dataset mean/std
+    --class_count_file stats.json  config.counts for class weight
+
+python tools/research/dataset_mean_std.py --dataset_name Cityscapes --split train --output cityscapes_train.json
+"""
+import json
+import cv2
+import numpy as np
+from multiprocessing import Pool
+from tqdm import tqdm
+
+class dataset_statistics():
+    def __init__(self,class_number,table=None):
+        """
+        class_number: the number of train ids
+        table: remap table from raw label id to train id, see label_remap.py
+        """
+        self.class_number=class_number
+        self.table=None if table is None else np.array(table,dtype=np.int64)
+        self.image_number=0
+        self.pixel_number=0
+        self.mean=np.zeros(3,np.float64)
+        self.m2=np.zeros(3,np.float64)
+        self.class_counts=np.zeros(class_number,np.int64)
+        self.class_images=np.zeros(class_number,np.int64)
+        self.sizes={}
+
+    def merge_moments(self,n,mean,m2):
+        total=self.pixel_number+n
+        if total==0:
+            return
+        delta=mean-self.mean
+        self.mean=self.mean+delta*n/total
+        self.m2=self.m2+m2+delta*delta*self.pixel_number*n/total
+        self.pixel_number=total
+
+    def update_image(self,image):
+        """
+        image: rgb image with shape [h,w,3]
+        """
+        assert len(image.shape)==3 and image.shape[2]==3,"require rgb image with shape [h,w,3]"
+        h,w=image.shape[0:2]
+        mean,std=cv2.meanStdDev(image)
+        mean=mean.reshape(3)
+        self.merge_moments(h*w,mean,np.square(std.reshape(3))*h*w)
+
+        key='{}x{}'.format(h,w)
+        self.sizes[key]=self.sizes.get(key,0)+1
+        self.image_number+=1
+
+    def update_label(self,label):
+        """
+        label: raw label image when table is not None, otherwise train id label image
+        """
+        if self.table is not None:
+            assert label.dtype==np.uint8,'require uint8 raw label image, but %s'%label.dtype
+            hist=np.bincount(label.ravel(),minlength=256)
+            hist=np.bincount(self.table,weights=hist,minlength=256).astype(np.int64)
+        else:
+            hist=np.bincount(label.ravel(),minlength=self.class_number)
+        hist=hist[0:self.class_number]
+        self.class_counts+=hist
+        self.class_images+=(hist>0)
+
+    def merge(self,other):
+        assert self.class_number==other.class_number
+        self.merge_moments(other.pixel_number,other.mean,other.m2)
+        self.image_number+=other.image_number
+        self.class_counts+=other.class_counts
+        self.class_images+=other.class_images
+        for key,n in other.sizes.items():
+            self.sizes[key]=self.sizes.get(key,0)+n
+
+    def summary(self):
+        """
+        json serializable statistics, std with mode n-1
+        """
+        std=np.sqrt(self.m2/max(self.pixel_number-1,1))
+        return {'image_number':self.image_number,
+                'pixel_number':self.pixel_number,
+                'mean_rgb':self.mean.tolist(),
+                'std_rgb':std.tolist(),
+                'class_counts':self.class_counts.tolist(),
+                'class_images':self.class_images.tolist(),
+                'sizes':self.sizes}
+
+# the file store, remap table and class number for each worker process
+worker_args=None
+
+def init_worker(store,table,class_number):
+    global worker_args
+    worker_args=(store,table,class_number)
+
+def statistics_worker(samples):
+    store,table,class_number=worker_args
+    stats=dataset_statistics(class_number,table)
+    for img_path,lbl_path in samples:
+        img=store.imread(img_path,cv2.IMREAD_COLOR)
+        assert img is not None,'empty image for path %s'%img_path
+        stats.update_image(cv2.cvtColor(img,cv2.COLOR_BGR2RGB))
+        if lbl_path is not None:
+            stats.update_label(store.read_label(lbl_path))
+    return stats
+
+def get_dataset_statistics(dataset,class_number,num_workers=8,chunk_size=16):
+    """
+    dataset: dataset_generalize, read the original image and label without augmentation
+    class_number: config.class_number
+    return dataset_statistics
+    """
+    if hasattr(dataset,'annotation_files'):
+        samples=list(zip(dataset.image_files,dataset.annotation_files))
+    else:
+        samples=[(f,None) for f in dataset.image_files]
+    chunks=[samples[i:i+chunk_size] for i in range(0,len(samples),chunk_size)]
+
+    stats=dataset_statistics(class_number)
+    table=dataset.remap.table.tolist()
+    with Pool(num_workers,initializer=init_worker,initargs=(dataset.store,table,class_number)) as p:
+        for part in tqdm(p.imap_unordered(statistics_worker,chunks),total=len(chunks),desc='statistics'):
+            stats.merge(part)
+    return stats
+
+def save_statistics(summary,json_file):
+    with open(json_file,'w') as f:
+        json.dump(summary,f,indent=2)
+
+def load_statistics(json_file):
+    with open(json_file,'r') as f:
+        return json.load(f)
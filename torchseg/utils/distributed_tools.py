@@ -14,11 +14,15 @@ from tqdm import trange,tqdm
 
 from .configs.semanticseg_config import get_net
 from .augmentor import Augmentations
-from ..dataset.dataset_generalize import dataset_generalize, image_normalizations
-from .metrics import runningScore
+from ..dataset.dataset_generalize import dataset_generalize, get_sample_normalizations
+from ..dataset.class_index import get_train_sampler
+from ..dataset.resumable_sampler import set_loader_epoch, eval_sampler
+from .metrics import runningScoreTensor
+from .metric.dist_metric import reduce_metric, all_reduce_sum
 from .torch_tools import (get_optimizer,get_scheduler,get_loss_fn_dict,
                          train_val,get_metric,get_image_dict,
-                         get_lr_dict,init_writer,write_summary,is_main_process)
+                         get_lr_dict,init_writer,write_summary,is_main_process,
+                         save_resume_state,load_resume_state)
 from .poly_plateau import poly_rop
 from .disc_tools import save_model_if_necessary
 
@@ -73,10 +77,7 @@ def main_worker(gpu,ngpus_per_node,config):
 
     cudnn.benchmark=True
 
-    if config.norm_ways is None:
-        normalizations = None
-    else:
-        normalizations = image_normalizations(config.norm_ways)
+    normalizations = get_sample_normalizations(config)
 
     if config.augmentation:
         augmentations = Augmentations(config)
@@ -94,10 +95,12 @@ def main_worker(gpu,ngpus_per_node,config):
                                      augmentations=None,
                                      normalizations=normalizations)
 
+    train_sampler=get_train_sampler(config,train_dataset,distributed=config.dist)
+    # each rank evaluate one shard, the metrics are summed by reduce_metric()
     if config.dist:
-        train_sampler=torch.utils.data.DistributedSampler(train_dataset)
+        val_sampler=eval_sampler(len(val_dataset),num_replicas=dist.get_world_size(),rank=dist.get_rank())
     else:
-        train_sampler=None
+        val_sampler=None
 
     if config.dist and config.gpu is not None:
         batch_size=int(config.batch_size/ngpus_per_node)
@@ -108,7 +111,7 @@ def main_worker(gpu,ngpus_per_node,config):
 
     train_loader=torch.utils.data.DataLoader(train_dataset,
                                              batch_size=batch_size,
-                                             shuffle=(train_sampler is None),
+                                             shuffle=False,
                                              num_workers=num_workers,
                                              pin_memory=True,
                                              sampler=train_sampler)
@@ -117,14 +120,15 @@ def main_worker(gpu,ngpus_per_node,config):
                                            batch_size=batch_size,
                                            shuffle=False,
                                            num_workers=num_workers,
-                                           pin_memory=True)
+                                           pin_memory=True,
+                                           sampler=val_sampler)
 
     scheduler = get_scheduler(optimizer, config)
 
     # for different output, generate the metric_fn_dict automaticly.
     metric_fn_dict = {}
     # output for main output
-    running_metrics = runningScore(config.class_number)
+    running_metrics = runningScoreTensor(config.class_number)
 
     time_str = time.strftime("%Y-%m-%d___%H-%M-%S", time.localtime())
     log_dir = os.path.join(config.log_dir, config.net_name,
@@ -137,6 +141,20 @@ def main_worker(gpu,ngpus_per_node,config):
     loaders = [train_loader, val_loader]
     loader_names = ['train', 'val']
 
+    # resume at the next batch of the resume state, the same state for all ranks
+    start_epoch = 0
+    if config.resume_path is not None:
+        print('resume training from', config.resume_path)
+        state = load_resume_state(config.resume_path, model, optimizer, scheduler, train_sampler)
+        start_epoch, best_iou, log_dir = state['epoch'], state['best_iou'], state['log_dir']
+    resume_path = os.path.join(log_dir, 'resume.pkl')
+
+    def step_fn(epoch, step):
+        # the state after the last step is saved at the end of epoch
+        if is_main_process(config) and config.resume_save_steps > 0 and \
+            step % config.resume_save_steps == 0 and step < len(train_loader):
+            save_resume_state(resume_path, model, optimizer, scheduler, train_sampler, epoch, best_iou, log_dir)
+
     # eval module
     if train_loader is None:
         config.n_epoch = 1
@@ -147,12 +165,11 @@ def main_worker(gpu,ngpus_per_node,config):
 
     config.ngpus_per_node=ngpus_per_node
     if is_main_process(config):
-        tqdm_epoch = trange(config.n_epoch, desc='{} epoches'.format(config.note), leave=True)
+        tqdm_epoch = trange(start_epoch, config.n_epoch, desc='{} epoches'.format(config.note), leave=True)
     else:
-        tqdm_epoch = range(config.n_epoch)
+        tqdm_epoch = range(start_epoch, config.n_epoch)
     for epoch in tqdm_epoch:
-        if train_sampler is not None:
-            train_sampler.set_epoch(epoch)
+        set_loader_epoch(train_loader, epoch)
         if is_main_process(config):
             tqdm_epoch.set_postfix(best_iou=best_iou)
         for loader, loader_name in zip(loaders, loader_names):
@@ -196,6 +213,9 @@ def main_worker(gpu,ngpus_per_node,config):
                 # use rop/poly_rop to schedule learning rate
                 if isinstance(scheduler,(poly_rop,rop)):
                     total_loss=sum(losses_dict['%s/total_loss' % loader_name])
+                    # the same loss of the whole val dataset for all ranks
+                    if config.dist:
+                        total_loss=all_reduce_sum([total_loss]).item()
                     scheduler.step(total_loss)
             else:
                 outputs_dict, targets_dict, \
@@ -212,12 +232,20 @@ def main_worker(gpu,ngpus_per_node,config):
                     epoch=epoch,
                     summary_all=summary_all,
                     summary_metric=summary_metric,
-                    loader_name=loader_name)
+                    loader_name=loader_name,
+                    step_fn=step_fn)
 
                 # use cos_lr to shceduler the learning rate
                 if isinstance(scheduler,cos_lr):
                     scheduler.step()
 
+            # sum the partial metrics of all ranks
+            if config.dist and summary_metric:
+                reduce_metric(running_metrics)
+                if summary_all:
+                    for key in sorted(metric_fn_dict.keys()):
+                        reduce_metric(metric_fn_dict[key])
+
             if is_main_process(config):
                 metric_dict, class_iou_dict = get_metric(
                     running_metrics, metric_fn_dict,
@@ -273,6 +301,11 @@ def main_worker(gpu,ngpus_per_node,config):
                               weight_dict=weight_dict,
                               epoch=epoch)
 
+        # the next epoch start from the first batch
+        train_sampler.set_epoch(epoch+1)
+        if is_main_process(config):
+            save_resume_state(resume_path, model, optimizer, scheduler, train_sampler, epoch+1, best_iou, log_dir)
+
     if is_main_process(config):
         writer.close()
         print('total epoch is %d, best iou is' % config.n_epoch, best_iou)
@@ -6,127 +6,101 @@ Martin Kersner, m.kersner@gmail.com
 
 Evaluation metrics for image segmentation inspired by
 paper Fully Convolutional Networks for Semantic Segmentation.
+
+all the metrics are computed from one confusion matrix of the union classes,
+O(HW + C^2) instead of the O(C*HW) boolean mask for each class.
 '''
 
 import numpy as np
 
-def confusion_matric(eval_segm,gt_segm):
-    check_size(eval_segm, gt_segm)
-
-    cl, n_cl = extract_classes(gt_segm)
-    eval_mask, gt_mask = extract_both_masks(eval_segm, gt_segm, cl, n_cl)
-
-    
-def pixel_accuracy(eval_segm, gt_segm):
+def get_confusion_matrix(eval_segm, gt_segm):
     '''
-    sum_i(n_ii) / sum_i(t_i)
+    return cl, hist
+    cl: the union classes of eval_segm and gt_segm
+    hist[i, j]: the number of pixels with gt_segm == cl[i] and eval_segm == cl[j]
     '''
 
     check_size(eval_segm, gt_segm)
 
-    cl, n_cl = extract_classes(gt_segm)
-    eval_mask, gt_mask = extract_both_masks(eval_segm, gt_segm, cl, n_cl)
-
-    sum_n_ii = 0
-    sum_t_i  = 0
-
-    for i, c in enumerate(cl):
-        curr_eval_mask = eval_mask[i, :, :]
-        curr_gt_mask = gt_mask[i, :, :]
-
-        sum_n_ii += np.sum(np.logical_and(curr_eval_mask, curr_gt_mask))
-        sum_t_i  += np.sum(curr_gt_mask)
- 
-    if (sum_t_i == 0):
-        pixel_accuracy_ = 0
+    eval_flat = eval_segm.ravel()
+    gt_flat   = gt_segm.ravel()
+    if eval_flat.size == 0:
+        return np.zeros(0, dtype=gt_flat.dtype), np.zeros((0, 0), dtype=np.int64)
+
+    is_int = np.issubdtype(eval_flat.dtype, np.integer) and np.issubdtype(gt_flat.dtype, np.integer)
+    if is_int and min(eval_flat.min(), gt_flat.min()) >= 0 and max(eval_flat.max(), gt_flat.max()) < 1024:
+        # small non-negative labels, bincount on the label values directly
+        n = int(max(eval_flat.max(), gt_flat.max())) + 1
+        hist = np.bincount(n * gt_flat.astype(np.int64) + eval_flat, minlength=n * n).reshape(n, n)
+        cl = np.flatnonzero(hist.sum(axis=0) + hist.sum(axis=1))
+        hist = hist[np.ix_(cl, cl)]
+        cl = cl.astype(gt_flat.dtype)
     else:
-        pixel_accuracy_ = sum_n_ii / sum_t_i
+        cl, inverse = np.unique(np.concatenate([eval_flat, gt_flat]), return_inverse=True)
+        inverse = inverse.ravel()
+        n = len(cl)
+        hist = np.bincount(n * inverse[eval_flat.size:] + inverse[0:eval_flat.size],
+                           minlength=n * n).reshape(n, n)
 
-    return pixel_accuracy_
+    return cl, hist
 
-def mean_accuracy(eval_segm, gt_segm):
+def get_scores(eval_segm, gt_segm):
     '''
-    (1/n_cl) sum_i(n_ii/t_i)
+    pixel accuracy, mean accuracy, mean IU, frequency weighted IU and the
+    number of union classes from one confusion matrix, same as the functions below
     '''
 
-    check_size(eval_segm, gt_segm)
-
-    cl, n_cl = extract_classes(gt_segm)
-    eval_mask, gt_mask = extract_both_masks(eval_segm, gt_segm, cl, n_cl)
+    cl, hist = get_confusion_matrix(eval_segm, gt_segm)
+    n_ii = np.diag(hist)
+    # pixels of each class in gt_segm and eval_segm
+    t_i  = hist.sum(axis=1)
+    n_ij = hist.sum(axis=0)
 
-    accuracy = list([0]) * n_cl
+    gt_cls = t_i > 0
+    sum_t_i = t_i.sum()
+    pixel_accuracy_ = n_ii.sum() / sum_t_i if sum_t_i != 0 else 0
 
-    for i, c in enumerate(cl):
-        curr_eval_mask = eval_mask[i, :, :]
-        curr_gt_mask = gt_mask[i, :, :]
+    mean_accuracy_ = np.mean(n_ii[gt_cls] / t_i[gt_cls])
 
-        n_ii = np.sum(np.logical_and(curr_eval_mask, curr_gt_mask))
-        t_i  = np.sum(curr_gt_mask)
- 
-        if (t_i != 0):
-            accuracy[i] = n_ii / t_i
+    # the classes in both eval_segm and gt_segm
+    both_cls = gt_cls & (n_ij > 0)
+    union = t_i[both_cls] + n_ij[both_cls] - n_ii[both_cls]
+    mean_IU_ = np.sum(n_ii[both_cls] / union) / np.count_nonzero(gt_cls)
+    frequency_weighted_IU_ = np.sum((t_i[both_cls] * n_ii[both_cls]) / union) / get_pixel_area(eval_segm)
 
-    mean_accuracy_ = np.mean(accuracy)
-    return mean_accuracy_
+    return {'pixel_accuracy': pixel_accuracy_,
+            'mean_accuracy': mean_accuracy_,
+            'mean_IU': mean_IU_,
+            'frequency_weighted_IU': frequency_weighted_IU_,
+            'n_cl': len(cl)}
 
-def mean_IU(eval_segm, gt_segm):
+def pixel_accuracy(eval_segm, gt_segm):
     '''
-    (1/n_cl) * sum_i(n_ii / (t_i + sum_j(n_ji) - n_ii))
+    sum_i(n_ii) / sum_i(t_i)
     '''
 
-    check_size(eval_segm, gt_segm)
-
-    cl, n_cl   = union_classes(eval_segm, gt_segm)
-    _, n_cl_gt = extract_classes(gt_segm)
-    eval_mask, gt_mask = extract_both_masks(eval_segm, gt_segm, cl, n_cl)
+    return get_scores(eval_segm, gt_segm)['pixel_accuracy']
 
-    IU = list([0]) * n_cl
+def mean_accuracy(eval_segm, gt_segm):
+    '''
+    (1/n_cl) sum_i(n_ii/t_i)
+    '''
 
-    for i, c in enumerate(cl):
-        curr_eval_mask = eval_mask[i, :, :]
-        curr_gt_mask = gt_mask[i, :, :]
- 
-        if (np.sum(curr_eval_mask) == 0) or (np.sum(curr_gt_mask) == 0):
-            continue
+    return get_scores(eval_segm, gt_segm)['mean_accuracy']
 
-        n_ii = np.sum(np.logical_and(curr_eval_mask, curr_gt_mask))
-        t_i  = np.sum(curr_gt_mask)
-        n_ij = np.sum(curr_eval_mask)
+def mean_IU(eval_segm, gt_segm):
+    '''
+    (1/n_cl) * sum_i(n_ii / (t_i + sum_j(n_ji) - n_ii))
+    '''
 
-        IU[i] = n_ii / (t_i + n_ij - n_ii)
- 
-    mean_IU_ = np.sum(IU) / n_cl_gt
-    return mean_IU_
+    return get_scores(eval_segm, gt_segm)['mean_IU']
 
 def frequency_weighted_IU(eval_segm, gt_segm):
     '''
     sum_k(t_k)^(-1) * sum_i((t_i*n_ii)/(t_i + sum_j(n_ji) - n_ii))
     '''
 
-    check_size(eval_segm, gt_segm)
-
-    cl, n_cl = union_classes(eval_segm, gt_segm)
-    eval_mask, gt_mask = extract_both_masks(eval_segm, gt_segm, cl, n_cl)
-
-    frequency_weighted_IU_ = list([0]) * n_cl
-
-    for i, c in enumerate(cl):
-        curr_eval_mask = eval_mask[i, :, :]
-        curr_gt_mask = gt_mask[i, :, :]
- 
-        if (np.sum(curr_eval_mask) == 0) or (np.sum(curr_gt_mask) == 0):
-            continue
-
-        n_ii = np.sum(np.logical_and(curr_eval_mask, curr_gt_mask))
-        t_i  = np.sum(curr_gt_mask)
-        n_ij = np.sum(curr_eval_mask)
-
-        frequency_weighted_IU_[i] = (t_i * n_ii) / (t_i + n_ij - n_ii)
- 
-    sum_k_t_k = get_pixel_area(eval_segm)
-    
-    frequency_weighted_IU_ = np.sum(frequency_weighted_IU_) / sum_k_t_k
-    return frequency_weighted_IU_
+    return get_scores(eval_segm, gt_segm)['frequency_weighted_IU']
 
 '''
 Auxiliary functions used during evaluation.
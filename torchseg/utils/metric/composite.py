@@ -20,28 +20,19 @@ class Metric(ABC):
         raise NotImplementedError("you should implement this!")
         
 class MetricAcc(Metric):
-    def __init__(self,exception_value=1):
+    """
+    global acc/precision/recall/fmeasure and the average per-image p/r/f
+    the counts are accumulated on the device of the inputs, no host sync in update()
+    check_count: assert tp+fp+tn+fn==count for each update, sync with host
+    """
+    def __init__(self,exception_value=1,check_count=False):
 #        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         self.dtype=torch.int64
-#        self.tp=torch.tensor(0,dtype=self.dtype,device=device)
-#        self.fp=torch.tensor(0,dtype=self.dtype,device=device)
-#        self.tn=torch.tensor(0,dtype=self.dtype,device=device)
-#        self.fn=torch.tensor(0,dtype=self.dtype,device=device)
-#        self.count=torch.tensor(0,dtype=self.dtype,device=device)
-        self.tp=0
-        self.fp=0
-        self.tn=0
-        self.fn=0
-        self.count=0
-
-        ## compute avg_p,avg_r,avg_f
-        self.sum_p=0
-        self.sum_r=0
-        self.sum_f=0
-        self.img_count=0
+        self.check_count=check_count
 
         ## when no gt, f=0/1???
         self.exception_value=exception_value
+        self.reset()
 
     def update(self,value):
         assert isinstance(value,tuple)
@@ -53,48 +44,50 @@ class MetricAcc(Metric):
             #device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
             pred=(predicts>0.5).type_as(labels)
 
-        self.tp+=torch.sum(((pred==1) & (labels==1)).to(self.dtype))
-        self.fp+=torch.sum(((pred==1) & (labels==0)).to(self.dtype))
-        self.tn+=torch.sum(((pred==0) & (labels==0)).to(self.dtype))
-        self.fn+=torch.sum(((pred==0) & (labels==1)).to(self.dtype))
-
-        self.count+=torch.sum(((labels<=1)).to(self.dtype))
-
-        assert self.tp+self.fp+self.tn+self.fn==self.count, \
-        'tp={}; fp={}; tn={}; fn={}; count={} \n pred {}, labels {}'.format(self.tp,
-            self.fp,self.tn,self.fn,self.count,torch.unique(pred),torch.unique(labels))
-
+        # per-image tp,fp,tn,fn,count with one reduction over the spatial dims
         b=pred.size(0)
-        for i in range(b):
-            tp=torch.sum(((pred[i]==1) & (labels[i]==1)).to(torch.float32))
-            fp=torch.sum(((pred[i]==1) & (labels[i]==0)).to(torch.float32))
-#            tn=torch.sum(((pred[i]==0) & (labels[i]==0)).to(torch.float32))
-            fn=torch.sum(((pred[i]==0) & (labels[i]==1)).to(torch.float32))
-
-            if tp+fn==0:
-                warnings.warn('tp+fn==0')
-                r=self.exception_value
-            else:
-                r=tp/(tp+fn)
-
-            if tp+fp==0:
-                warnings.warn('tp+fp==0')
-                p=self.exception_value
-            else:
-                p=tp/(tp+fp)
-
-            if p+r==0:
-                warnings.warn('p+r==0')
-                f=self.exception_value
-            else:
-                f=2*p*r/(p+r)
-
-            self.sum_p+=p
-            self.sum_r+=r
-            self.sum_f+=f
+        masks=torch.stack([(pred==1) & (labels==1),
+                           (pred==1) & (labels==0),
+                           (pred==0) & (labels==0),
+                           (pred==0) & (labels==1),
+                           labels<=1],dim=1)
+        counts=masks.reshape(b,5,-1).sum(dim=2,dtype=self.dtype)
+        tp,fp,tn,fn,count=counts.unbind(dim=1)
+
+        total=counts.sum(dim=0)
+        self.tp+=total[0]
+        self.fp+=total[1]
+        self.tn+=total[2]
+        self.fn+=total[3]
+        self.count+=total[4]
+
+        if self.check_count:
+            assert self.tp+self.fp+self.tn+self.fn==self.count, \
+            'tp={}; fp={}; tn={}; fn={}; count={} \n pred {}, labels {}'.format(self.tp,
+                self.fp,self.tn,self.fn,self.count,torch.unique(pred),torch.unique(labels))
+
+        tp,fp,fn=tp.to(torch.float32),fp.to(torch.float32),fn.to(torch.float32)
+        exception=torch.full_like(tp,self.exception_value)
+        no_gt=(tp+fn==0)
+        no_pred=(tp+fp==0)
+        # the division by zero is masked by torch.where
+        r=torch.where(no_gt,exception,tp/(tp+fn))
+        p=torch.where(no_pred,exception,tp/(tp+fp))
+        no_pr=(p+r==0)
+        f=torch.where(no_pr,exception,2*p*r/(p+r))
+
+        self.sum_p+=p.sum()
+        self.sum_r+=r.sum()
+        self.sum_f+=f.sum()
+        # warn in get_avg_metric()
+        self.exception_count+=torch.stack([no_gt.sum(),no_pred.sum(),no_pr.sum()])
         self.img_count+=b
 
     def get_avg_metric(self):
+        if self.img_count>0:
+            for name,n in zip(['tp+fn==0','tp+fp==0','p+r==0'],self.exception_count.tolist()):
+                if n>0:
+                    warnings.warn('{} for {} images, use exception value {}'.format(name,n,self.exception_value))
         return self.sum_p/self.img_count,self.sum_r/self.img_count,self.sum_f/self.img_count
 
     def get_acc(self):
@@ -121,10 +114,12 @@ class MetricAcc(Metric):
         self.fn=0
         self.count=0
 
+        ## compute avg_p,avg_r,avg_f
         self.sum_p=0
         self.sum_r=0
         self.sum_f=0
         self.img_count=0
+        self.exception_count=0
 
 
 class MetricMean(Metric):
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+exact global metrics for distributed evaluation
+
+each rank evaluate one shard of the val dataset (see eval_sampler in
+resumable_sampler.py), then sum the partial confusion matrix, tp/fp/tn/fn and
+the loss sums of all ranks with all_reduce. after reduce_metric() all ranks hold
+the metrics of the whole dataset.
+
+    for data in val_loader:
+        ...
+        running_metrics.update(labels,predicts)
+    reduce_metric(running_metrics)
+
+note: reduce_metric() is a collective operation, call it on all ranks.
+"""
+import torch
+import torch.distributed as dist
+from .composite import MetricAcc, MetricMean, CompositeMetric
+from .motionseg_metric import MotionSegMetric
+from ..metrics import runningScoreTensor
+
+def is_dist_initialized():
+    return dist.is_available() and dist.is_initialized()
+
+def get_reduce_device():
+    """
+    nccl only support cuda tensors
+    """
+    if dist.get_backend()=='nccl':
+        return torch.device('cuda',torch.cuda.current_device())
+    return torch.device('cpu')
+
+def all_reduce_tensor(x):
+    """
+    return the sum of x over all ranks, on the device of x
+    """
+    device=x.device
+    y=x.to(get_reduce_device()).clone()
+    dist.all_reduce(y,op=dist.ReduceOp.SUM)
+    return y.to(device)
+
+def all_reduce_sum(values,dtype=torch.float64):
+    """
+    values: list of number or 0-dim tensor
+    return the sum over all ranks as tensor with len(values)
+    """
+    x=torch.stack([torch.as_tensor(v).detach().to('cpu',dtype) for v in values])
+    return all_reduce_tensor(x)
+
+def reduce_running_score(metric):
+    n=metric.n_classes
+    if metric.matrix is None:
+        # no batch in this shard
+        matrix=torch.zeros((n,n),dtype=torch.int64,device=get_reduce_device())
+    else:
+        matrix=metric.matrix.to(torch.int64)
+    metric.matrix=all_reduce_tensor(matrix)
+
+def reduce_metric_acc(metric):
+    exception_count=torch.as_tensor(metric.exception_count).reshape(-1).expand(3)
+    counts=all_reduce_sum([metric.tp,metric.fp,metric.tn,metric.fn,metric.count,
+                           metric.img_count]+list(exception_count.unbind()),dtype=torch.int64)
+    metric.tp,metric.fp,metric.tn,metric.fn,metric.count=counts[0:5].unbind()
+    metric.img_count=int(counts[5])
+    metric.exception_count=counts[6:9]
+
+    sums=all_reduce_sum([metric.sum_p,metric.sum_r,metric.sum_f])
+    metric.sum_p,metric.sum_r,metric.sum_f=sums.to(torch.float32).unbind()
+
+def reduce_metric_mean(metric):
+    metric.total,metric.count=all_reduce_sum([metric.total,metric.count]).tolist()
+
+def reduce_metric(metric):
+    """
+    sum the partial metric of all ranks, do nothing without distributed
+    support runningScoreTensor, MetricAcc, MetricMean, CompositeMetric and MotionSegMetric
+    """
+    if not is_dist_initialized():
+        return metric
+
+    if isinstance(metric,runningScoreTensor):
+        reduce_running_score(metric)
+    elif isinstance(metric,MetricAcc):
+        reduce_metric_acc(metric)
+    elif isinstance(metric,MetricMean):
+        reduce_metric_mean(metric)
+    elif isinstance(metric,CompositeMetric):
+        # the same order for all ranks
+        for key in sorted(metric.metrics.keys()):
+            reduce_metric(metric.metrics[key])
+    elif isinstance(metric,MotionSegMetric):
+        reduce_metric(metric.metrics)
+    else:
+        assert False,'unsupported metric {}'.format(type(metric))
+    return metric
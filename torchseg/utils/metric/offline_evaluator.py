@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+parallel offline evaluation for the prediction directory of foreground segmentation
+
+1. the (gt,prediction) path pairs are streamed from the dataset index into a
+   process pool, each pair is decoded once and tp/fp/tn/fn are computed with
+   one bincount.
+2. the per-frame counts are saved to a csv table (cache_path), the cached rows
+   are reused when the gt and prediction files are not modified, so a new
+   aggregation does not decode the images again.
+3. aggregate() merge the frames per video, per category or for all frames.
+
+    frames=evaluate_pairs(get_path_pairs(dataset,config.dataset,get_pred_path),cache_path)
+    print(aggregate(frames,'category'))
+
+used by tools/cdnet_benchmark.py and motionseg/motion_benchmark.py
+"""
+import os
+import csv
+import multiprocessing
+import numpy as np
+import cv2
+from collections import OrderedDict
+from tqdm import tqdm
+
+count_keys=['tp','fp','tn','fn']
+path_keys=['img1_path','gt_path','pred_path','video','category']
+table_keys=path_keys+['gt_mtime','pred_mtime']+count_keys
+
+def get_frame_counts(gt_path,pred_path):
+    """
+    return tp,fp,tn,fn of prediction>0 for foreground gt>0
+    """
+    gt_img=cv2.imread(gt_path,cv2.IMREAD_GRAYSCALE)
+    if gt_img is None:
+        assert False,'invalid gt_path: {}'.format(gt_path)
+    pred_img=cv2.imread(pred_path,cv2.IMREAD_GRAYSCALE)
+    if pred_img is None:
+        assert False,'invalid pred_path: {}'.format(pred_path)
+    assert gt_img.shape==pred_img.shape,'unmatched shape {} and {} for {}'.format(gt_img.shape,pred_img.shape,pred_path)
+
+    # 0: tn, 1: fp, 2: fn, 3: tp
+    index=2*(gt_img>0).astype(np.uint8)+(pred_img>0)
+    tn,fp,fn,tp=np.bincount(index.ravel(),minlength=4).tolist()
+    return tp,fp,tn,fn
+
+def get_prf(tp,fp,fn,exception_value=1):
+    """
+    precision, recall and fmeasure, exception_value for no gt or no prediction
+    """
+    r=exception_value if tp+fn==0 else tp/(tp+fn)
+    p=exception_value if tp+fp==0 else tp/(tp+fp)
+    f=exception_value if p+r==0 else 2*p*r/(p+r)
+    return p,r,f
+
+def get_mtime(path):
+    return '%.6f'%os.path.getmtime(path)
+
+def evaluate_frame(frame):
+    frame=frame.copy()
+    frame['tp'],frame['fp'],frame['tn'],frame['fn']=get_frame_counts(frame['gt_path'],frame['pred_path'])
+    return frame
+
+def get_path_pairs(dataset,dataset_name,get_pred_path):
+    """
+    yield {img1_path,gt_path,pred_path,video,category} for the dataset index
+    get_pred_path(img1_path,gt_path): the prediction path of the frame
+    for cdnet2014, root/category/video/input/xxx.jpg
+    for the others, video=category=the directory name of main frame
+    """
+    for idx in range(len(dataset)):
+        paths=dataset.__get_path__(idx)
+        img1_path,gt_path=paths[0],paths[2]
+        if dataset_name.lower()=='segtrackv2':
+            # the gt of the first object in main frame
+            gt_path=gt_path[0][0]
+
+        dirs=img1_path.split(os.sep)
+        if dataset_name.upper()=='CDNET2014':
+            video,category=dirs[-3],dirs[-4]
+        else:
+            video=category=dirs[-2]
+        yield {'img1_path':img1_path,
+               'gt_path':gt_path,
+               'pred_path':get_pred_path(img1_path,gt_path),
+               'video':video,
+               'category':category}
+
+def load_table(cache_path):
+    """
+    return {(gt_path,pred_path): frame} for the cached csv table
+    """
+    if cache_path is None or not os.path.exists(cache_path):
+        return {}
+    table={}
+    with open(cache_path,'r',newline='') as f:
+        for row in csv.DictReader(f):
+            for key in count_keys:
+                row[key]=int(row[key])
+            table[(row['gt_path'],row['pred_path'])]=row
+    return table
+
+def save_table(cache_path,frames):
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)),exist_ok=True)
+    with open(cache_path,'w',newline='') as f:
+        writer=csv.DictWriter(f,fieldnames=table_keys)
+        writer.writeheader()
+        writer.writerows(frames)
+
+def evaluate_pairs(pairs,cache_path=None,num_workers=None,chunksize=16):
+    """
+    pairs: iterable of {img1_path,gt_path,pred_path,video,category}, see get_path_pairs()
+    cache_path: csv table of per-frame counts, None for no cache
+    num_workers: process number, None for cpu count, 0 for this process
+    return the list of frames with tp,fp,tn,fn, in the order of pairs
+    """
+    table=load_table(cache_path)
+    frames=[]
+    todo=[]
+    for pair in pairs:
+        assert os.path.exists(pair['gt_path']),pair['gt_path']
+        assert os.path.exists(pair['pred_path']),pair['pred_path']
+        frame={key:pair[key] for key in path_keys}
+        frame['gt_mtime']=get_mtime(frame['gt_path'])
+        frame['pred_mtime']=get_mtime(frame['pred_path'])
+
+        cached=table.get((frame['gt_path'],frame['pred_path']),None)
+        if cached is not None and cached['gt_mtime']==frame['gt_mtime'] and cached['pred_mtime']==frame['pred_mtime']:
+            for key in count_keys:
+                frame[key]=cached[key]
+        else:
+            todo.append(len(frames))
+        frames.append(frame)
+
+    if len(todo)>0:
+        jobs=[frames[i] for i in todo]
+        if num_workers==0:
+            results=map(evaluate_frame,jobs)
+            results=list(tqdm(results,total=len(jobs),desc='evaluate'))
+        else:
+            with multiprocessing.Pool(num_workers) as pool:
+                results=pool.imap(evaluate_frame,jobs,chunksize=chunksize)
+                results=list(tqdm(results,total=len(jobs),desc='evaluate'))
+        for i,frame in zip(todo,results):
+            frames[i]=frame
+    print('decode {} frames, {} frames from cache'.format(len(todo),len(frames)-len(todo)))
+
+    if cache_path is not None and len(todo)>0:
+        save_table(cache_path,frames)
+    return frames
+
+def get_frame_metric(frame,exception_value=1):
+    p,r,f=get_prf(frame['tp'],frame['fp'],frame['fn'],exception_value)
+    return {'precision':p,'recall':r,'fmeasure':f}
+
+def merge_frames(frames,exception_value=1):
+    """
+    overall precision/recall/fmeasure of the summed counts and the mean of per-frame metrics
+    """
+    result=OrderedDict((key,sum(frame[key] for frame in frames)) for key in count_keys)
+    result['frames']=n=len(frames)
+
+    overall_precision=result['tp']/(result['tp']+result['fp']+1e-5)
+    overall_recall=result['tp']/(result['tp']+result['fn']+1e-5)
+    result['precision']=overall_precision
+    result['recall']=overall_recall
+    result['fmeasure']=2*overall_precision*overall_recall/(overall_precision+overall_recall+1e-5)
+
+    metrics=[get_frame_metric(frame,exception_value) for frame in frames]
+    for key in ['precision','recall','fmeasure']:
+        result['mean_'+key]=sum(m[key] for m in metrics)/max(n,1)
+    return result
+
+def aggregate(frames,group=None,exception_value=1):
+    """
+    group: None for all frames, 'video' or 'category'
+    return merge_frames() result, or {group name: merge_frames() result}
+    """
+    if group is None:
+        return merge_frames(frames,exception_value)
+
+    groups=OrderedDict()
+    for frame in frames:
+        groups.setdefault(frame[group],[]).append(frame)
+    return OrderedDict((key,merge_frames(value,exception_value)) for key,value in groups.items())
+
+def print_result(result,note='overall'):
+    print('{}: tp={},tn={},fp={},fn={}'.format(note,result['tp'],result['tn'],result['fp'],result['fn']))
+    print('precision={},recall={}'.format(result['precision'],result['recall']))
+    print('overall fmeasure is {}'.format(result['fmeasure']))
+    print('mean precision={}, recall={}, fmeasure={}'.format(result['mean_precision'],
+          result['mean_recall'],result['mean_fmeasure']))
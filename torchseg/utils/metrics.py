@@ -2,6 +2,7 @@
 # https://github.com/wkentaro/pytorch-fcn/blob/master/torchfcn/utils.py
 
 import numpy as np
+import torch
 from . import eval_segm
 import cv2
 
@@ -50,6 +51,49 @@ class runningScore(object):
     def reset(self):
         self.confusion_matrix = np.zeros((self.n_classes, self.n_classes))
 
+class runningScoreTensor(runningScore):
+    """
+    runningScore for tensors, accumulate the int64 confusion matrix on the
+    device of the inputs with one bincount per batch, only the CxC matrix is
+    copied to host in get_scores()
+    """
+    def __init__(self, n_classes):
+        self.n_classes = n_classes
+        self.reset()
+
+    def update(self, label_trues, label_preds):
+        """
+        label_trues: [b,h,w] labels, ignore the label out of [0,n_classes)
+        label_preds: [b,h,w] predictions, such as torch.argmax(outputs, dim=1)
+        numpy arrays are converted to tensors
+        """
+        if isinstance(label_trues, np.ndarray):
+            label_trues = torch.from_numpy(label_trues)
+        if isinstance(label_preds, np.ndarray):
+            label_preds = torch.from_numpy(label_preds)
+
+        n = self.n_classes
+        label_trues = label_trues.reshape(-1).long()
+        label_preds = label_preds.reshape(-1).to(label_trues.device).long()
+        mask = (label_trues >= 0) & (label_trues < n)
+        # the ignored pixels go to the extra bin n*n, no boolean indexing
+        index = torch.where(mask, n*label_trues+label_preds, torch.full_like(label_trues, n*n))
+        hist = torch.bincount(index, minlength=n*n+1)[0:n*n].reshape(n, n)
+
+        if self.matrix is None:
+            self.matrix = hist
+        else:
+            self.matrix += hist.to(self.matrix.device)
+
+    @property
+    def confusion_matrix(self):
+        if self.matrix is None:
+            return np.zeros((self.n_classes, self.n_classes))
+        return self.matrix.cpu().numpy().astype(np.float64)
+
+    def reset(self):
+        self.matrix = None
+
 # may get different result due the use of exact class number
 # swap trues and preds should get the same miou
 def get_scores(label_trues,label_preds):
@@ -67,13 +111,13 @@ def get_scores(label_trues,label_preds):
     label_trues_2d=label_trues.reshape((height,width))
     label_preds_2d=label_preds.reshape((height,width))
 
-    cl, n_cl = eval_segm.union_classes(label_preds_2d, label_trues_2d)
+    scores = eval_segm.get_scores(label_preds_2d,label_trues_2d)
 
-    return {'Overall Acc': eval_segm.pixel_accuracy(label_preds_2d,label_trues_2d),
-            'Mean Acc': eval_segm.mean_accuracy(label_preds_2d,label_trues_2d),
-            'FreqW IoU': eval_segm.frequency_weighted_IU(label_preds_2d,label_trues_2d),
-            'Mean IoU': eval_segm.mean_IU(label_preds_2d,label_trues_2d),
-            'Appeared cls':n_cl}
+    return {'Overall Acc': scores['pixel_accuracy'],
+            'Mean Acc': scores['mean_accuracy'],
+            'FreqW IoU': scores['frequency_weighted_IU'],
+            'Mean IoU': scores['mean_IU'],
+            'Appeared cls':scores['n_cl']}
 
 def get_fmeasure(gt,pred,fmeasure_only=True):
     if isinstance(gt,str):
@@ -5,19 +5,35 @@ dataset_survey:
     class numbers
 dataset_mean, dataset_std:
     compute mean and std for dataset
+
+remap: optional label_remap transform, convert raw label id to train id
+
+for the whole dataset, use dataset_statistics.py, which compute all the
+statistics in one pass with a process pool.
 """
 import numpy as np
 from PIL import Image
 
+def add_class_count(class_survey,label_img):
+    """
+    add the pixel number of each class in label_img to class_survey with one bincount
+    """
+    class_number=len(class_survey)
+    hist=np.bincount(np.asarray(label_img).ravel(),minlength=class_number)[0:class_number]
+    return [a+int(b) for a,b in zip(class_survey,hist)]
+
 class dataset_survey():
-    def __init__(self,class_number):
+    def __init__(self,class_number,remap=None):
         self.class_number=class_number
+        self.remap=remap
         self.size_survey={}
         self.class_survey=[0 for i in range(class_number)]
     
     def update_survey(self,label_file):
         label_img_pil=Image.open(label_file)
         label_img = np.array(label_img_pil, dtype=np.uint8)
+        if self.remap is not None:
+            label_img = self.remap(label_img)
         size=label_img.shape
         
         if size not in self.size_survey.keys():
@@ -25,27 +41,24 @@ class dataset_survey():
         else:
             self.size_survey[size]+=1
             
-        for i in np.unique(label_img):
-            if i<self.class_number:
-                self.class_survey[i]+=np.count_nonzero(label_img==i)
+        self.update_survey_image(label_img)
                 
     def update_survey_image(self,label_img):
-        for i in np.unique(label_img):
-            if i<self.class_number:
-                self.class_survey[i]+=np.count_nonzero(label_img==i)
+        self.class_survey=add_class_count(self.class_survey,label_img)
         
     def summary(self):
         print(self.size_survey)
         print(self.class_survey)
         
 class dataset_class_count():
-    def __init__(self,class_number):
+    def __init__(self,class_number,remap=None):
+        self.remap=remap
         self.reset(class_number)
         
     def update(self,image):
-        for i in np.unique(image):
-            if i<self.class_number:
-                self.class_survey[i]+=np.count_nonzero(image==i)
+        if self.remap is not None:
+            image=self.remap(image)
+        self.class_survey=add_class_count(self.class_survey,image)
     
     def summary(self):
         return self.class_survey
@@ -11,11 +11,16 @@ import os
 #     from torch.utils.tensorboard import SummaryWriter
 from tensorboardX import SummaryWriter
     
-from .metrics import runningScore
+from .metrics import runningScoreTensor
 from .disc_tools import save_model_if_necessary, get_newest_file
 from .center_loss2d import CenterLoss
-from ..dataset.dataset_generalize import image_normalizations, dataset_generalize
-from .augmentor import Augmentations
+from ..dataset.dataset_generalize import image_normalizations, dataset_generalize, \
+    get_sample_normalizations, get_batch_normalizations
+from .augmentor import Augmentations, get_batch_augmenter
+from ..dataset.class_index import get_class_histograms, get_train_sampler
+from ..dataset.resumable_sampler import (get_loader_sampler, get_start_step, set_loader_epoch,
+                                         step_loader, get_rng_state, set_rng_state)
+from .dataset_statistics import load_statistics
 from .losses import get_loss_fn
 from .poly_plateau import poly_rop,poly_lr_scheduler
 import torch.utils.data as TD
@@ -50,12 +55,25 @@ def get_merged_dataset(config,split,normalizations=None,augmentations=None):
     else:
         merged_dataset=TD.ConcatDataset(datasets)
         return merged_dataset
+
+def get_class_counts(config):
+    """
+    pixel number of each class in the train dataset(s), see class_index.py
+    """
+    dataset=get_merged_dataset(config,split='train')
+    counts=get_class_histograms(dataset,config.class_number).sum(axis=0)
+    # avoid divide by zero for class weight
+    return [max(1,int(c)) for c in counts]
         
-def get_loaders(config):
-    if config.norm_ways is None:
-        normalizations = None
-    else:
-        normalizations = image_normalizations(config.norm_ways)
+def get_loaders(config, resumable=False):
+    """
+    resumable: use the resumable train sampler from get_train_sampler(), the
+    caller should call set_loader_epoch() for each epoch, see keras_fit().
+    otherwise the uniform train loader use shuffle=True and the rare class
+    sampler draw new indices for each epoch, for the trainers which never
+    call set_loader_epoch(), such as catalyst.
+    """
+    normalizations = get_sample_normalizations(config)
 
     if config.augmentation:
         augmentations = Augmentations(config)
@@ -68,12 +86,18 @@ def get_loaders(config):
                                     augmentations=augmentations if split=='train' else None,
                                     normalizations=normalizations)
         
+        sampler_name=config.sampler if hasattr(config,'sampler') else 'uniform'
+        if split=='train' and (resumable or sampler_name not in [None,'uniform']):
+            sampler=get_train_sampler(config,dataset,resumable=resumable)
+        else:
+            sampler=None
         loaders[split]=TD.DataLoader(
                         dataset=dataset,
                         batch_size=config.batch_size,
-                        shuffle=True if split=='train' else False,
+                        shuffle=True if split=='train' and sampler is None else False,
+                        sampler=sampler,
                         drop_last=True if split=='train' else False,
-                        num_workers=2*config.batch_size)
+                        num_workers=config.num_workers if hasattr(config,'num_workers') else 2*config.batch_size)
         
     return loaders['train'], loaders['val']
 
@@ -155,13 +179,21 @@ def train_val(model, optimizer, scheduler, loss_fn_dict,
               loader, config, epoch, summary_all, loader_name,
               summary_metric=True,
               center_loss_model=None,
-              center_optimizer=None):
+              center_optimizer=None,
+              step_fn=None):
+    """
+    step_fn: step_fn(epoch,step) after each optimizer step of train, save the resume state
+    """
     if loader_name == 'train':
         model.train()
     else:
         model.eval()
 
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    # normalize the uint8 image batch here if config.norm_on_batch
+    batch_normalizations = get_batch_normalizations(config)
+    # photometric augmentation for the uint8 image batch if config.batch_augmentation
+    batch_augmenter = get_batch_augmenter(config) if loader_name == 'train' else None
 
     losses_dict = {}
     running_metrics.reset()
@@ -170,12 +202,14 @@ def train_val(model, optimizer, scheduler, loss_fn_dict,
 
     assert config.accumulate>=1
     total_loss=0
+    # the resumed epoch start from the next batch of the checkpoint
+    start_step = get_start_step(loader) if loader_name == 'train' else 0
     if is_main_process(config):
-        tqdm_step = tqdm(loader, desc='steps', leave=False)
+        tqdm_step = tqdm(loader, desc='steps', leave=False, initial=start_step)
     else:
         tqdm_step = loader
 
-    for i, (datas) in enumerate(tqdm_step):
+    for i, (datas) in enumerate(tqdm_step, start_step):
         if loader_name == 'train' and hasattr(config,'scheduler') and config.scheduler in ['poly']:
             # init max_iter
             scheduler.max_iter=config.n_epoch*len(loader)
@@ -198,6 +232,13 @@ def train_val(model, optimizer, scheduler, loss_fn_dict,
         else:
             assert False, 'unexcepted loader output size %d' % len(datas)
 
+        if batch_augmenter is not None:
+            images = batch_augmenter.forward(images)
+
+        if batch_normalizations is not None:
+            images = batch_normalizations.forward_batch(images)
+            targets_dict['img'] = images
+
         if config.test=='dist':
             images=images.cuda(config.gpu,non_blocking=True)
             for key,value in targets_dict.items():
@@ -262,6 +303,10 @@ def train_val(model, optimizer, scheduler, loss_fn_dict,
                     center_optimizer.step()
                     center_optimizer.zero_grad()
 
+            step_loader(loader, len(datas[0]))
+            if step_fn is not None and (i+1) % config.accumulate == 0:
+                step_fn(epoch, i+1)
+
         if summary_metric:
             # summary_all other metric for edge and aux, not run for each epoch to save time
             running_metrics, metric_fn_dict = update_metric(outputs_dict,
@@ -413,6 +458,47 @@ def load_ckpt(model,ckpt_path):
         model.load_state_dict(state_dict)
     return model
 
+def get_module(model):
+    """
+    return the model wrapped by DataParallel or DistributedDataParallel
+    """
+    if isinstance(model, (torch.nn.DataParallel, torch.nn.parallel.DistributedDataParallel)):
+        return model.module
+    return model
+
+def save_resume_state(resume_path, model, optimizer, scheduler, sampler, epoch, best_iou=0.0, log_dir=None):
+    """
+    save the training state to resume at the next batch, see resumable_sampler.py
+    epoch: the epoch to resume, the sampler record the consumed items of it
+    """
+    state = {'epoch': epoch,
+             'model_state': get_module(model).state_dict(),
+             'optimizer_state': optimizer.state_dict(),
+             'scheduler_state': scheduler.state_dict() if scheduler is not None else None,
+             'sampler_state': sampler.state_dict() if sampler is not None else None,
+             'rng_state': get_rng_state(),
+             'best_iou': best_iou,
+             'log_dir': log_dir}
+    os.makedirs(os.path.dirname(resume_path), exist_ok=True)
+    # write to a temp file and rename, keep the old state if preempted while saving
+    tmp_path = resume_path+'.tmp'
+    torch.save(state, tmp_path)
+    os.replace(tmp_path, resume_path)
+
+def load_resume_state(resume_path, model, optimizer, scheduler, sampler):
+    """
+    load the state saved by save_resume_state(), return the state dict
+    """
+    state = torch.load(resume_path, map_location='cpu')
+    get_module(model).load_state_dict(state['model_state'])
+    optimizer.load_state_dict(state['optimizer_state'])
+    if scheduler is not None and state['scheduler_state'] is not None:
+        scheduler.load_state_dict(state['scheduler_state'])
+    if sampler is not None and state['sampler_state'] is not None:
+        sampler.load_state_dict(state['sampler_state'])
+    set_rng_state(state['rng_state'])
+    return state
+
 def keras_fit(model, train_loader=None, val_loader=None, config=None):
     """
     target to multiple output model
@@ -451,7 +537,7 @@ def keras_fit(model, train_loader=None, val_loader=None, config=None):
     # for different output, generate the metric_fn_dict automaticly.
     metric_fn_dict = {}
     # output for main output
-    running_metrics = runningScore(config.class_number)
+    running_metrics = runningScoreTensor(config.class_number)
 
     time_str = time.strftime("%Y-%m-%d___%H-%M-%S", time.localtime())
     log_dir = os.path.join(config.log_dir, config.net_name,
@@ -462,11 +548,26 @@ def keras_fit(model, train_loader=None, val_loader=None, config=None):
     best_iou = 0.0
     # create loader from config
     if train_loader is None and val_loader is None:
-        train_loader, val_loader = get_loaders(config)
+        train_loader, val_loader = get_loaders(config, resumable=True)
 
     loaders = [train_loader, val_loader]
     loader_names = ['train', 'val']
 
+    # resume at the next batch of the resume state
+    start_epoch = 0
+    train_sampler = get_loader_sampler(train_loader) if train_loader is not None else None
+    if hasattr(config, 'resume_path') and config.resume_path is not None:
+        print('resume training from', config.resume_path)
+        state = load_resume_state(config.resume_path, model, optimizer, scheduler, train_sampler)
+        start_epoch, best_iou, log_dir = state['epoch'], state['best_iou'], state['log_dir']
+    resume_path = os.path.join(log_dir, 'resume.pkl')
+    resume_save_steps = config.resume_save_steps if hasattr(config, 'resume_save_steps') else 0
+
+    def step_fn(epoch, step):
+        # the state after the last step is saved at the end of epoch
+        if resume_save_steps > 0 and step % resume_save_steps == 0 and step < len(train_loader):
+            save_resume_state(resume_path, model, optimizer, scheduler, train_sampler, epoch, best_iou, log_dir)
+
     # support for multiple gpu, model will be changed, model.name will not exist
     if device.type == 'cuda':
         gpu_num = torch.cuda.device_count()
@@ -482,9 +583,11 @@ def keras_fit(model, train_loader=None, val_loader=None, config=None):
     # 1<= summary_metric_step <=10
     summary_metric_step=max(min(10*config.accumulate,config.n_epoch//10),1)
 
-    tqdm_epoch = trange(config.n_epoch, desc='{} epoches'.format(config.note), leave=True)
+    tqdm_epoch = trange(start_epoch, config.n_epoch, desc='{} epoches'.format(config.note), leave=True)
     for epoch in tqdm_epoch:
         tqdm_epoch.set_postfix(best_iou=best_iou)
+        if train_loader is not None:
+            set_loader_epoch(train_loader, epoch)
         for loader, loader_name in zip(loaders, loader_names):
             if loader is None:
                 continue
@@ -546,7 +649,8 @@ def keras_fit(model, train_loader=None, val_loader=None, config=None):
                     summary_metric=summary_metric,
                     loader_name=loader_name,
                     center_loss_model=center_loss_model,
-                    center_optimizer=center_optimizer)
+                    center_optimizer=center_optimizer,
+                    step_fn=step_fn)
 
                 # use cos_lr to shceduler the learning rate
                 if isinstance(scheduler,cos_lr):
@@ -604,6 +708,12 @@ def keras_fit(model, train_loader=None, val_loader=None, config=None):
                           image_dict=image_dict,
                           weight_dict=weight_dict,
                           epoch=epoch)
+
+        # the next epoch start from the first batch
+        if train_loader is not None:
+            if train_sampler is not None:
+                train_sampler.set_epoch(epoch+1)
+            save_resume_state(resume_path, model, optimizer, scheduler, train_sampler, epoch+1, best_iou, log_dir)
     writer.close()
 
     print('total epoch is %d, best iou is' % config.n_epoch, best_iou)
@@ -621,6 +731,12 @@ def get_loss_fn_dict(config):
 
     ignore_index = config.ignore_index
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    if config.use_class_weight and hasattr(config, 'class_count_file') and config.class_count_file:
+        config.counts = load_statistics(config.class_count_file)['class_counts']
+        assert len(config.counts) == config.class_number, 'class number mismatch for %s' % config.class_count_file
+        config.counts = [max(1, c) for c in config.counts]
+    elif config.use_class_weight and hasattr(config, 'auto_class_counts') and config.auto_class_counts:
+        config.counts = get_class_counts(config)
     if hasattr(config, 'counts') and config.use_class_weight:
         count_sum = 1.0*np.sum(config.counts)
         weight_raw = [count_sum/count for count in config.counts]
@@ -797,38 +913,32 @@ def update_metric(outputs_dict,
     update running_metrics and metric_fn_dict summary
     running_metrics: update seg miou and acc for summary
     metric_fn_dict: update aux,edge miou and acc for summary
+    the confusion matrix is accumulated on the device, see runningScoreTensor
     """
     if summary_all:
-        # convert tensor to numpy,
-        np_outputs_dict = {}
+        pred_dict = {}
         for key, value in outputs_dict.items():
-            np_outputs_dict[key] = torch.argmax(
-                value, dim=1).data.cpu().numpy()
+            pred_dict[key] = torch.argmax(value.detach(), dim=1)
             if key not in metric_fn_dict.keys():
                 if key.startswith(('seg','aux')):
-                    metric_fn_dict[key] = runningScore(config.class_number)
+                    metric_fn_dict[key] = runningScoreTensor(config.class_number)
                 elif key.startswith('edge'):
-                    metric_fn_dict[key] = runningScore(config.edge_class_num)
+                    metric_fn_dict[key] = runningScoreTensor(config.edge_class_num)
                 else:
                     assert False, 'unexcepted key %s in outputs_dict' % key
 
-        np_targets_dict = {}
-        for key, value in targets_dict.items():
-            np_targets_dict[key] = value.data.cpu().numpy()
-
         # main metric, run for each epoch
-        running_metrics.update(np_targets_dict['seg'], np_outputs_dict['seg'])
-        for key, value in np_outputs_dict.items():
+        running_metrics.update(targets_dict['seg'], pred_dict['seg'])
+        for key, value in pred_dict.items():
             if key.startswith(('seg', 'aux')):
-                metric_fn_dict[key].update(np_targets_dict['seg'], value)
+                metric_fn_dict[key].update(targets_dict['seg'], value)
             elif key.startswith('edge'):
-                metric_fn_dict[key].update(np_targets_dict['edge'], value)
+                metric_fn_dict[key].update(targets_dict['edge'], value)
             else:
                 assert False, 'unexcepted key %s in outputs_dict' % key
     else:
         # main metric, run for each epoch
-        running_metrics.update(targets_dict['seg'].data.cpu().numpy(
-        ), torch.argmax(outputs_dict['seg'], dim=1).data.cpu().numpy())
+        running_metrics.update(targets_dict['seg'], torch.argmax(outputs_dict['seg'].detach(), dim=1))
     return running_metrics, metric_fn_dict
 
 
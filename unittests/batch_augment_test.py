@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import torch
+from easydict import EasyDict as edict
+from torchseg.utils.augmentation.batch_transform import BatchAugmenter
+
+class Test(unittest.TestCase):
+    def test_batch(self):
+        images=torch.randint(0,256,(8,3,32,48),dtype=torch.uint8)
+        for aug_library in ['imgaug','pillow']:
+            config=edict({'aug_library':aug_library,'propability':1.0})
+            result=BatchAugmenter(config).forward(images)
+            self.assertEqual(result.shape,images.shape)
+            self.assertEqual(result.dtype,torch.float32)
+            self.assertGreaterEqual(result.min().item(),0)
+            self.assertLessEqual(result.max().item(),255)
+            # input not changed, random parameters for each sample
+            self.assertEqual(images.dtype,torch.uint8)
+            diff=(result-images.float()).abs().mean(dim=(1,2,3))
+            self.assertGreater(diff.std().item(),0)
+
+            config.propability=0.0
+            result=BatchAugmenter(config).forward(images)
+            self.assertTrue(torch.equal(result,images.float()))
+
+    def test_blur(self):
+        config=edict({'aug_library':'imgaug','propability':1.0})
+        images=torch.full((4,3,16,16),100.0)
+        result=BatchAugmenter(config).gaussian_blur(images)
+        self.assertLess((result-images).abs().max().item(),1e-3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import numpy as np
+from torchseg.dataset.class_index import remap_histogram, get_repeat_factors, class_balanced_sampler
+
+class Test(unittest.TestCase):
+    def test_histogram(self):
+        table=np.zeros(256,dtype=np.uint8)+255
+        table[7]=0
+        table[26]=1
+        hist=remap_histogram({7:10,26:5,0:100,255:3},table,class_number=2)
+        self.assertEqual(hist.tolist(),[10,5])
+
+    def test_repeat_factor(self):
+        # class 0 in all images, class 1 in 1 of 100 images
+        histograms=np.zeros((100,2),dtype=np.int64)
+        histograms[:,0]=100
+        histograms[0,1]=10
+        factors=get_repeat_factors(histograms,threshold=0.1)
+        self.assertAlmostEqual(factors[0],np.sqrt(0.1/0.01))
+        self.assertTrue(np.all(factors[1:]==1.0))
+
+    def test_sampler(self):
+        weights=[1.0]*99+[10.0]
+        sampler=class_balanced_sampler(weights,seed=None)
+        self.assertEqual(len(list(sampler)),100)
+        indices=[]
+        for epoch in range(100):
+            sampler.set_epoch(epoch)
+            indices+=list(sampler)
+        counts=np.bincount(indices,minlength=100)
+        self.assertGreater(counts[99],5*np.mean(counts[0:99]))
+
+        # distributed: the ranks split the same draws for each epoch
+        samplers=[class_balanced_sampler(weights,num_replicas=3,rank=r,seed=25) for r in range(3)]
+        for epoch in range(2):
+            for s in samplers:
+                s.set_epoch(epoch)
+            indices=[list(s) for s in samplers]
+            self.assertTrue(all([len(x)==34 for x in indices]))
+            self.assertEqual(indices,[list(s) for s in samplers])
+        samplers[0].set_epoch(0)
+        self.assertNotEqual(list(samplers[0]),indices[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+from torchseg.dataset.clip_sampler import frame_cache, get_clips, clip_batch_sampler
+
+class Test(unittest.TestCase):
+    def test_clips(self):
+        keys=['a']*5+['b']*2+['c']
+        self.assertEqual(get_clips(keys,2),[[0,1],[2,3],[4],[5,6],[7]])
+
+    def test_sampler(self):
+        keys=['video%d'%(i//8) for i in range(96)]
+        sampler=clip_batch_sampler(keys,batch_size=8,clip_length=4,shuffle_buffer=4,drop_last=False)
+        batches=list(sampler)
+        self.assertEqual(len(batches),len(sampler))
+        self.assertEqual(sorted(sum(batches,[])),list(range(96)))
+        # batch made of 2 clips
+        for batch in batches:
+            self.assertEqual(len(batch),8)
+            self.assertLessEqual(len(set([keys[i] for i in batch])),2)
+        # the same batches for the same epoch, new batches for each epoch
+        self.assertEqual(batches,list(sampler))
+        sampler.set_epoch(1)
+        self.assertNotEqual(batches,list(sampler))
+
+        samplers=[clip_batch_sampler(keys,8,4,num_replicas=2,rank=r,seed=0) for r in range(2)]
+        batches=[list(s) for s in samplers]
+        self.assertEqual(len(batches[0]),len(batches[1]))
+        self.assertEqual(len(batches[0]),len(samplers[0]))
+        self.assertEqual(len(set(sum(batches[0],[]))&set(sum(batches[1],[]))),0)
+
+    def test_cache(self):
+        reads=[]
+        def read_fn(path):
+            reads.append(path)
+            return path
+        cache=frame_cache(capacity=2)
+        for path in ['a','b','a','c','a','b']:
+            self.assertEqual(cache.get(path,read_fn),path)
+        self.assertEqual(reads,['a','b','c','b'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import glob
+import time
+import tempfile
+import numpy as np
+from torchseg.dataset.dataset_manifest import dataset_manifest
+
+class shape_store():
+    def __init__(self):
+        self.count=0
+
+    def shape(self,path):
+        self.count+=1
+        return (480,640)
+
+class Test(unittest.TestCase):
+    def touch(self,path,text=''):
+        os.makedirs(os.path.dirname(path),exist_ok=True)
+        with open(path,'w') as f:
+            f.write(text)
+
+    def test_list(self):
+        with tempfile.TemporaryDirectory() as root:
+            for i in range(3):
+                self.touch(os.path.join(root,'video','%05d.jpg'%i))
+            cache_file=os.path.join(root,'cache','manifest.json')
+            calls=[]
+            def build_fn():
+                calls.append(1)
+                return sorted(glob.glob(os.path.join(root,'video','*.jpg')))
+
+            files=dataset_manifest(shape_store(),cache_file).get_list('main_files',build_fn)
+            self.assertEqual(len(files),3)
+            self.assertFalse(os.path.exists(cache_file))
+
+            manifest=dataset_manifest(shape_store(),cache_file)
+            manifest.get_list('main_files',build_fn)
+            manifest.close()
+            self.assertTrue(os.path.exists(cache_file))
+            self.assertEqual(len(calls),2)
+
+            # load from cache
+            manifest=dataset_manifest(shape_store(),cache_file)
+            self.assertEqual(manifest.get_list('main_files',build_fn),files)
+            self.assertEqual(len(calls),2)
+
+            # not rebuild for the changes out of the file directories
+            time.sleep(0.01)
+            self.touch(os.path.join(root,'other.txt'))
+            self.touch(os.path.join(root,'cache','other_manifest.json'))
+            manifest=dataset_manifest(shape_store(),cache_file)
+            self.assertEqual(manifest.get_list('main_files',build_fn),files)
+            self.assertEqual(len(calls),2)
+
+            # rebuild for modified directory
+            time.sleep(0.01)
+            self.touch(os.path.join(root,'video','%05d.jpg'%3))
+            manifest=dataset_manifest(shape_store(),cache_file)
+            self.assertEqual(len(manifest.get_list('main_files',build_fn)),4)
+            self.assertEqual(len(calls),3)
+
+    def test_sample(self):
+        with tempfile.TemporaryDirectory() as root:
+            img_path=os.path.join(root,'a.jpg')
+            lbl_path=os.path.join(root,'a.png')
+            self.touch(img_path)
+            self.touch(lbl_path)
+            cache_file=os.path.join(root,'manifest.json')
+            label=np.array([[0,1,1],[255,1,0]],dtype=np.uint8)
+
+            store=shape_store()
+            manifest=dataset_manifest(store,cache_file)
+            self.assertEqual(manifest.shape(img_path),(480,640))
+            self.assertEqual(manifest.histogram(lbl_path,lambda p:label),{0:2,1:3,255:1})
+            self.assertIsNone(manifest.shape(os.path.join(root,'none.jpg')))
+            manifest.save()
+
+            store=shape_store()
+            manifest=dataset_manifest(store,cache_file)
+            self.assertEqual(manifest.shape(img_path),(480,640))
+            self.assertEqual(manifest.histogram(lbl_path,lambda p:None),{0:2,1:3,255:1})
+            self.assertEqual(store.count,0)
+
+            # recompute for modified file
+            self.touch(img_path,'modified')
+            self.assertEqual(manifest.shape(img_path),(480,640))
+            self.assertEqual(store.count,1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import numpy as np
+from torchseg.utils.dataset_statistics import dataset_statistics
+from torchseg.utils.survey import dataset_class_count
+
+class Test(unittest.TestCase):
+    def test_merge(self):
+        images=[np.random.randint(0,256,size=(h,w,3),dtype=np.uint8) for h,w in [(32,48),(16,16),(32,48)]]
+        labels=[np.random.choice([0,7,8,255],size=img.shape[0:2]).astype(np.uint8) for img in images]
+        table=np.zeros(256,dtype=np.int64)+255
+        table[7]=0
+        table[8]=1
+
+        parts=[]
+        for img,lbl in zip(images,labels):
+            stats=dataset_statistics(2,table)
+            stats.update_image(img)
+            stats.update_label(lbl)
+            parts.append(stats)
+        stats=dataset_statistics(2)
+        for part in parts:
+            stats.merge(part)
+        summary=stats.summary()
+
+        pixels=np.concatenate([img.reshape(-1,3) for img in images],axis=0).astype(np.float64)
+        np.testing.assert_allclose(summary['mean_rgb'],pixels.mean(axis=0))
+        np.testing.assert_allclose(summary['std_rgb'],pixels.std(axis=0,ddof=1))
+
+        train_ids=np.concatenate([table[lbl].ravel() for lbl in labels])
+        self.assertEqual(summary['class_counts'],[int(np.sum(train_ids==0)),int(np.sum(train_ids==1))])
+        self.assertEqual(summary['class_images'],[3,3])
+        self.assertEqual(summary['sizes'],{'32x48':2,'16x16':1})
+        self.assertEqual(summary['image_number'],3)
+
+    def test_class_count(self):
+        label=np.array([[0,1,1],[5,1,0]],dtype=np.uint8)
+        count=dataset_class_count(3)
+        count.update(label)
+        count.update(label)
+        self.assertEqual(count.summary(),[4,6,0])
+
+if __name__ == '__main__':
+    unittest.main()
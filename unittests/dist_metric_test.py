@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import tempfile
+import datetime
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.nn.parallel import DistributedDataParallel as DDP
+from torchseg.dataset.resumable_sampler import eval_sampler
+from torchseg.utils.metrics import runningScoreTensor
+from torchseg.utils.metric.motionseg_metric import MotionSegMetric
+from torchseg.utils.metric.dist_metric import reduce_metric
+
+n_classes=5
+
+def get_samples(n=11):
+    g=torch.Generator()
+    g.manual_seed(25)
+    labels=torch.randint(0,n_classes,(n,16,24),generator=g)
+    labels[:,0:2,:]=255
+    predicts=torch.randint(0,n_classes,(n,16,24),generator=g)
+    return labels,predicts
+
+def evaluate(indexes):
+    """
+    return the metrics for samples[indexes], reduced over all ranks for distributed
+    """
+    labels,predicts=get_samples()
+    running_metrics=runningScoreTensor(n_classes)
+    motionseg_metric=MotionSegMetric(1.0)
+    for i in indexes:
+        running_metrics.update(labels[i:i+1],predicts[i:i+1])
+        binary_labels=torch.where(labels[i:i+1]==255,labels[i:i+1],labels[i:i+1]%2).unsqueeze(1)
+        motionseg_metric.update({"fmeasure":((predicts[i:i+1]%2).unsqueeze(1).float(),binary_labels),
+                                 "stn_loss":float(i),
+                                 "mask_loss":float(i*2),
+                                 "total_loss":float(i*3)})
+    reduce_metric(running_metrics)
+    reduce_metric(motionseg_metric)
+    result=motionseg_metric.fetch()
+    avg_p,avg_r,avg_f=motionseg_metric.metric_acc.get_avg_metric()
+    return {'matrix':running_metrics.confusion_matrix.tolist(),
+            'fmeasure':float(result['fmeasure']),
+            'total_loss':float(result['total_loss']),
+            'avg_f':float(avg_f)}
+
+def worker(rank,world_size,init_file,output_dir):
+    dist.init_process_group(backend='gloo',init_method='file://'+init_file,
+                            world_size=world_size,rank=rank)
+    labels,predicts=get_samples()
+    sampler=eval_sampler(len(labels),num_replicas=world_size,rank=rank)
+    torch.save(evaluate(list(sampler)),os.path.join(output_dir,'%d.pkl'%rank))
+    dist.destroy_process_group()
+
+def get_model():
+    torch.manual_seed(25)
+    return torch.nn.Sequential(torch.nn.Conv2d(3,n_classes,1),torch.nn.BatchNorm2d(n_classes))
+
+def predict(model,indexes):
+    """
+    the val pass of fbms_train, one sample per batch, without gradient
+    """
+    labels,_=get_samples()
+    g=torch.Generator()
+    g.manual_seed(0)
+    images=torch.rand((len(labels),3,16,24),generator=g)
+    running_metrics=runningScoreTensor(n_classes)
+    model.eval()
+    with torch.set_grad_enabled(False):
+        for i in indexes:
+            outputs=model(images[i:i+1])
+            running_metrics.update(labels[i:i+1],torch.argmax(outputs,dim=1))
+    reduce_metric(running_metrics)
+    return running_metrics.confusion_matrix.tolist()
+
+def ddp_worker(rank,world_size,init_file,output_dir):
+    dist.init_process_group(backend='gloo',init_method='file://'+init_file,
+                            world_size=world_size,rank=rank,timeout=datetime.timedelta(seconds=60))
+    # grad mode is on outside the val pass, the model has buffers for DDP to broadcast
+    assert torch.is_grad_enabled()
+    model=DDP(get_model())
+    sampler=eval_sampler(11,num_replicas=world_size,rank=rank)
+    torch.save(predict(model,list(sampler)),os.path.join(output_dir,'%d.pkl'%rank))
+    dist.destroy_process_group()
+
+class Test(unittest.TestCase):
+    def test_sampler(self):
+        samplers=[eval_sampler(11,num_replicas=3,rank=r) for r in range(3)]
+        indexes=[list(s) for s in samplers]
+        self.assertEqual(sorted(sum(indexes,[])),list(range(11)))
+        self.assertEqual([len(s) for s in samplers],[4,4,3])
+
+    def test_reduce(self):
+        expected=evaluate(range(11))
+        world_size=3
+        with tempfile.TemporaryDirectory() as root:
+            mp.spawn(worker,nprocs=world_size,args=(world_size,os.path.join(root,'init'),root))
+            for rank in range(world_size):
+                result=torch.load(os.path.join(root,'%d.pkl'%rank))
+                self.assertEqual(result['matrix'],expected['matrix'])
+                for key in ['fmeasure','total_loss','avg_f']:
+                    self.assertAlmostEqual(result[key],expected[key],places=5)
+
+    def test_ddp_uneven_shards(self):
+        # 11 samples on 3 ranks: 4/4/3 forward passes
+        expected=predict(get_model(),range(11))
+        world_size=3
+        with tempfile.TemporaryDirectory() as root:
+            mp.spawn(ddp_worker,nprocs=world_size,args=(world_size,os.path.join(root,'init'),root))
+            for rank in range(world_size):
+                self.assertEqual(torch.load(os.path.join(root,'%d.pkl'%rank)),expected)
+
+if __name__ == '__main__':
+    unittest.main()
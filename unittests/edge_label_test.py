@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import tempfile
+import cv2
+import numpy as np
+from torchseg.dataset.edge_label import get_edge_label, read_edge_label
+
+def dilate_edge_label(ann_img,edge_width,edge_class_num,ignore_index):
+    """
+    the dilation loop before edge_label.py
+    """
+    kernel=np.ones((edge_width,edge_width),np.uint8)
+    ann_edge=cv2.Canny(ann_img,0,1)
+    ann_edge[ann_img==ignore_index]=0
+    ann_dilation=cv2.dilate(ann_edge,kernel,iterations=1)
+    if edge_class_num==2:
+        edge_label=(ann_dilation==0).astype(np.uint8)
+    else:
+        edge_label=np.zeros_like(ann_img)+edge_class_num-1
+        for class_num in range(edge_class_num-1):
+            edge_label[np.logical_and(ann_dilation>0,edge_label==(edge_class_num-1))]=class_num
+            ann_dilation=cv2.dilate(ann_dilation,kernel,iterations=1)
+    edge_label[ann_img==ignore_index]=ignore_index
+    return edge_label
+
+class Test(unittest.TestCase):
+    def get_label(self):
+        ann=np.zeros((96,128),np.uint8)
+        ann[20:60,30:90]=1
+        cv2.circle(ann,(100,70),15,2,-1)
+        ann[80:,0:20]=255
+        return ann
+
+    def test_edge(self):
+        ann=self.get_label()
+        # the default config.edge_width=10
+        for edge_width in [1,2,3,4,5,7,10]:
+            for edge_class_num in [2,3,5]:
+                np.testing.assert_array_equal(get_edge_label(ann,edge_width,edge_class_num,255),
+                                              dilate_edge_label(ann,edge_width,edge_class_num,255))
+
+        # no edge
+        ann=np.zeros((32,32),np.uint8)
+        self.assertTrue(np.all(get_edge_label(ann,5,3,255)==2))
+
+    def test_cache(self):
+        ann=self.get_label()
+        with tempfile.TemporaryDirectory() as root:
+            lbl_path=os.path.join(root,'a.png')
+            cv2.imwrite(lbl_path,ann)
+            cache_dir=os.path.join(root,'cache')
+            table=list(range(256))
+            edge=read_edge_label(lbl_path,cache_dir,ann,table,5,3,255)
+            np.testing.assert_array_equal(edge,get_edge_label(ann,5,3,255))
+            # read from cache
+            edge=read_edge_label(lbl_path,cache_dir,np.zeros_like(ann),table,5,3,255)
+            np.testing.assert_array_equal(edge,get_edge_label(ann,5,3,255))
+            # other edge_width
+            edge=read_edge_label(lbl_path,cache_dir,ann,table,3,3,255)
+            np.testing.assert_array_equal(edge,get_edge_label(ann,3,3,255))
+
+if __name__ == '__main__':
+    unittest.main()
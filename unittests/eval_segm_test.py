@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import numpy as np
+from torchseg.utils import eval_segm
+from torchseg.utils.metrics import get_scores
+
+def brute_force_scores(eval_img, gt_img):
+    """
+    the per-class boolean mask loops before the confusion matrix
+    """
+    gt_cl = np.unique(gt_img)
+    cl = np.union1d(np.unique(eval_img), gt_cl)
+
+    sum_n_ii = sum_t_i = 0
+    accuracy = []
+    for c in gt_cl:
+        n_ii = np.sum(np.logical_and(eval_img == c, gt_img == c))
+        t_i = np.sum(gt_img == c)
+        sum_n_ii += n_ii
+        sum_t_i += t_i
+        accuracy.append(n_ii / t_i)
+
+    IU = []
+    FW = []
+    for c in cl:
+        eval_mask = eval_img == c
+        gt_mask = gt_img == c
+        if np.sum(eval_mask) == 0 or np.sum(gt_mask) == 0:
+            continue
+        n_ii = np.sum(np.logical_and(eval_mask, gt_mask))
+        t_i = np.sum(gt_mask)
+        n_ij = np.sum(eval_mask)
+        IU.append(n_ii / (t_i + n_ij - n_ii))
+        FW.append((t_i * n_ii) / (t_i + n_ij - n_ii))
+
+    return {'pixel_accuracy': sum_n_ii / sum_t_i,
+            'mean_accuracy': np.mean(accuracy),
+            'mean_IU': np.sum(IU) / len(gt_cl),
+            'frequency_weighted_IU': np.sum(FW) / (eval_img.shape[0] * eval_img.shape[1]),
+            'n_cl': len(cl)}
+
+class Test(unittest.TestCase):
+    def check(self, eval_img, gt_img):
+        scores = eval_segm.get_scores(eval_img, gt_img)
+        expected = brute_force_scores(eval_img, gt_img)
+        for key, value in expected.items():
+            self.assertAlmostEqual(scores[key], value, msg=key)
+
+        self.assertAlmostEqual(eval_segm.pixel_accuracy(eval_img, gt_img), expected['pixel_accuracy'])
+        self.assertAlmostEqual(eval_segm.mean_accuracy(eval_img, gt_img), expected['mean_accuracy'])
+        self.assertAlmostEqual(eval_segm.mean_IU(eval_img, gt_img), expected['mean_IU'])
+        self.assertAlmostEqual(eval_segm.frequency_weighted_IU(eval_img, gt_img), expected['frequency_weighted_IU'])
+
+    def test_scores(self):
+        for n_class in [2, 19, 151]:
+            gt_img = np.random.randint(0, n_class, size=(64, 80)).astype(np.uint8)
+            gt_img[0:8] = 255
+            eval_img = np.random.randint(0, n_class, size=(64, 80))
+            # classes only in prediction or only in ground truth
+            eval_img[eval_img == 1] = 0
+            self.check(eval_img, gt_img)
+
+        # labels out of the bincount range
+        gt_img = np.random.choice([-1, 3, 5000], size=(16, 16))
+        eval_img = np.random.choice([-1, 3, 7], size=(16, 16))
+        self.check(eval_img, gt_img)
+        self.check(eval_img.astype(np.float32), gt_img.astype(np.float32))
+
+        # metrics.get_scores for batch
+        trues = np.random.randint(0, 19, size=(2, 32, 32))
+        preds = np.random.randint(0, 19, size=(2, 32, 32))
+        scores = get_scores(trues, preds)
+        expected = brute_force_scores(preds.reshape(64, 32), trues.reshape(64, 32))
+        self.assertAlmostEqual(scores['Mean IoU'], expected['mean_IU'])
+        self.assertEqual(scores['Appeared cls'], expected['n_cl'])
+
+    def test_confusion_matrix(self):
+        gt_img = np.array([[0, 0, 2], [2, 2, 255]], dtype=np.uint8)
+        eval_img = np.array([[0, 2, 2], [0, 2, 255]], dtype=np.uint8)
+        cl, hist = eval_segm.get_confusion_matrix(eval_img, gt_img)
+        np.testing.assert_array_equal(cl, [0, 2, 255])
+        np.testing.assert_array_equal(hist, [[1, 1, 0], [1, 2, 0], [0, 0, 1]])
+
+        with self.assertRaises(eval_segm.EvalSegErr):
+            eval_segm.get_confusion_matrix(eval_img, gt_img[0:1])
+
+if __name__ == '__main__':
+    unittest.main()
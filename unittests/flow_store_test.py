@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import tempfile
+import cv2
+import numpy as np
+from torchseg.dataset.flow_store import flow_store, convert_flo_files
+
+class Test(unittest.TestCase):
+    def write_flo(self,path,flow):
+        os.makedirs(os.path.dirname(path),exist_ok=True)
+        with open(path,'wb') as f:
+            f.write(b'PIEH')
+            np.array([flow.shape[1],flow.shape[0]],np.int32).tofile(f)
+            flow.astype(np.float32).tofile(f)
+
+    def test_store(self):
+        with tempfile.TemporaryDirectory() as root:
+            dataset_root_dir=os.path.join(root,'cvdataset')
+            flow_root_dir=os.path.join(dataset_root_dir,'optical_flow')
+            store_root=os.path.join(root,'flow_store')
+            flows={}
+            for i in range(3):
+                flow=np.random.uniform(-80,80,size=(48,64,2)).astype(np.float32)
+                main_path=os.path.join(dataset_root_dir,'FBMS','bear01','bear01_%04d.jpg'%i)
+                self.write_flo(os.path.join(flow_root_dir,'FBMS','bear01','bear01_%04d.flo'%i),flow)
+                flows[main_path]=flow
+
+            input_shape=(24,32)
+            convert_flo_files(store_root,[input_shape],flow_root_dir=flow_root_dir)
+            for resize_store in [True,False]:
+                if not resize_store:
+                    os.remove(os.path.join(store_root,'FBMS','bear01','flow_24x32.npy'))
+                store=flow_store(store_root,dataset_root_dir)
+                for main_path,flow in flows.items():
+                    expect=np.clip(flow,a_min=-50,a_max=50)/50.0
+                    expect=cv2.resize(expect,(input_shape[1],input_shape[0]),interpolation=cv2.INTER_LINEAR).transpose((2,0,1))
+                    result=store.read(main_path,input_shape)
+                    self.assertEqual(result.shape,(2,24,32))
+                    self.assertLess(np.max(np.abs(result-expect)),2e-3)
+
+                missing_path=os.path.join(dataset_root_dir,'FBMS','bear01','bear01_0009.jpg')
+                self.assertIsNone(store.read(missing_path,input_shape))
+
+if __name__ == '__main__':
+    unittest.main()
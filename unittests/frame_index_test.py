@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import glob
+import tempfile
+from torchseg.dataset.packed_dataset import disc_store
+from torchseg.dataset.frame_index import frame_index
+
+class Test(unittest.TestCase):
+    def touch(self,path):
+        os.makedirs(os.path.dirname(path),exist_ok=True)
+        with open(path,'w') as f:
+            f.write('')
+
+    def test_index(self):
+        with tempfile.TemporaryDirectory() as root:
+            video_dir=os.path.join(root,'JPEGImages','bear')
+            gt_dir=os.path.join(root,'GroundTruth','bear')
+            for i in [3,1,2,10]:
+                self.touch(os.path.join(video_dir,'%05d.png'%i))
+                self.touch(os.path.join(gt_dir,'1','%05d.png'%i))
+                self.touch(os.path.join(gt_dir,'2','%05d.png'%i))
+            self.touch(os.path.join(video_dir,'readme.txt'))
+
+            cache_file=os.path.join(root,'cache','index.json')
+            index=frame_index(disc_store(),cache_file)
+            index.build([video_dir])
+            index.build([gt_dir],recursive=True)
+            self.assertTrue(os.path.exists(cache_file))
+
+            files=index.files(video_dir,'.png')
+            self.assertEqual(files,sorted(glob.glob(os.path.join(video_dir,'*.png'))))
+            for idx,f in enumerate(files):
+                self.assertEqual(index.position(f,'.png'),idx)
+                self.assertTrue(index.exists(f))
+            self.assertFalse(index.exists(os.path.join(video_dir,'00004.png')))
+            self.assertEqual(index.find(gt_dir,'00002.png'),
+                             sorted(glob.glob(os.path.join(gt_dir,'**','00002.png'),recursive=True)))
+
+            # load from cache file, list again for modified directory
+            cache_index=frame_index(disc_store(),cache_file)
+            self.assertEqual(cache_index.cache[video_dir],index.dirs[video_dir])
+            self.touch(os.path.join(video_dir,'00004.png'))
+            cache_index.build([video_dir])
+            self.assertTrue(cache_index.exists(os.path.join(video_dir,'00004.png')))
+
+if __name__ == '__main__':
+    unittest.main()
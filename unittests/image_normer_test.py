@@ -6,6 +6,7 @@ from torchseg.dataset.dataset_generalize import image_normalizations
 from torchseg.utils.disc_tools import show_images
 import cv2
 import numpy as np
+import torch
 def print_img_info(img):
     print('{} [{},{}]'.format(img.dtype,np.min(img),np.max(img)))
     
@@ -23,6 +24,15 @@ class Test(unittest.TestCase):
         show_images([img,new_img,origin_img],['img','new img','origin img'])
         
         self.assertTrue(True)
+
+    def test_forward_batch(self):
+        img=np.random.randint(0,256,size=(2,32,48,3),dtype=np.uint8)
+        for ways in ['caffe','cityscapes','huawei','pytorch','-1,1','0,1']:
+            normer=image_normalizations(ways)
+            expect=np.stack([normer.forward(x) for x in img]).transpose((0,3,1,2))
+            result=normer.forward_batch(torch.from_numpy(img.transpose((0,3,1,2))))
+            self.assertEqual(result.dtype,torch.float32)
+            self.assertLess(np.max(np.abs(result.numpy()-expect)),1e-3)
         
 if __name__ == '__main__':
     unittest.main()
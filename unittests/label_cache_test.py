@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import json
+import time
+import tempfile
+import numpy as np
+from torchseg.dataset.json2labelImg import createLabelImage
+from torchseg.dataset.label_cache import read_json_label, get_cache_path, build_label_cache
+
+class Test(unittest.TestCase):
+    def write_json(self,json_file,objects):
+        ann={'imgWidth':64,'imgHeight':48,'objects':objects}
+        with open(json_file,'w') as f:
+            json.dump(ann,f)
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as root:
+            json_file=os.path.join(root,'a.json')
+            cache_dir=os.path.join(root,'cache')
+            self.write_json(json_file,[])
+            label=read_json_label(json_file)
+            cache_label=read_json_label(json_file,cache_dir)
+            self.assertTrue(os.path.exists(get_cache_path(json_file,cache_dir)))
+            self.assertTrue(np.array_equal(label,cache_label))
+            self.assertTrue(np.array_equal(label,read_json_label(json_file,cache_dir)))
+            self.assertTrue(np.array_equal(label,np.array(createLabelImage(json_file),dtype=np.uint8)))
+
+            # modified json file use new cache
+            old_path=get_cache_path(json_file,cache_dir)
+            time.sleep(0.01)
+            self.write_json(json_file,[{'label':'human','polygon':[[0,0],[30,0],[30,30]]}])
+            self.assertNotEqual(old_path,get_cache_path(json_file,cache_dir))
+
+            self.assertEqual(build_label_cache([json_file],cache_dir,num_workers=1),1)
+            self.assertEqual(build_label_cache([json_file],cache_dir,num_workers=1),0)
+
+if __name__ == '__main__':
+    unittest.main()
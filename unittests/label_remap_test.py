@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import numpy as np
+from easydict import EasyDict as edict
+from torchseg.dataset.label_remap import label_remap, get_remap_table
+from torchseg.dataset.labels_cityscapes import id2catId
+
+def loop_remap(lbl,config):
+    """
+    the old remap code in dataset_generalize.__getitem__
+    """
+    ann = np.zeros_like(lbl)+config.ignore_index
+    if config.ignore_index == 0:
+        for idx, class_id in enumerate(config.foreground_class_ids):
+            ann[lbl == class_id] = idx+1
+    elif config.dataset_name.lower()=='cityscapes_category':
+        for class_id in config._foreground_class_ids:
+            catId=id2catId[class_id]
+            if catId >0:
+                ann[lbl == class_id] = catId-1
+    else:
+        for idx, class_id in enumerate(config.foreground_class_ids):
+            ann[lbl == class_id] = idx
+    return ann
+
+class Test(unittest.TestCase):
+    cityscapes_ids=[7, 8, 11, 12, 13, 17, 19, 20, 21, 22, 23, 24, 25, 26, 27, 28, 31, 32, 33]
+
+    def get_configs(self):
+        ade20k=edict(dataset_name='adechallengedata2016',
+                     foreground_class_ids=[i for i in range(1, 151)],
+                     ignore_index=0)
+        voc=edict(dataset_name='voc2012',
+                  foreground_class_ids=[i for i in range(21)],
+                  ignore_index=255)
+        cityscapes=edict(dataset_name='cityscapes',
+                         foreground_class_ids=self.cityscapes_ids,
+                         ignore_index=255)
+        category=edict(dataset_name='cityscapes_category',
+                       _foreground_class_ids=self.cityscapes_ids,
+                       foreground_class_ids=[i for i in range(1,8)],
+                       ignore_index=255)
+        return [ade20k,voc,cityscapes,category]
+
+    def test_remap(self):
+        lbl=np.random.randint(0,256,size=(64,128)).astype(np.uint8)
+        for config in self.get_configs():
+            remap=label_remap(config)
+            ann=remap(lbl)
+            self.assertEqual(ann.dtype,np.uint8)
+            self.assertTrue(np.array_equal(ann,loop_remap(lbl,config)),config.dataset_name)
+
+    def test_config_table(self):
+        for config in self.get_configs():
+            config.remap_table=get_remap_table(config)
+            self.assertEqual(len(config.remap_table),256)
+            table=label_remap(table=config.remap_table).table
+            self.assertTrue(np.array_equal(table,label_remap(config).table))
+
+if __name__ == '__main__':
+    unittest.main()
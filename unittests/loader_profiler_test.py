@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import time
+import tempfile
+import cv2
+import numpy as np
+from torchseg.dataset.packed_dataset import disc_store
+from torchseg.dataset.loader_profiler import stage_profiler, profiled_store, disabled_profiler
+
+class Test(unittest.TestCase):
+    def test_profiler(self):
+        profiler=stage_profiler()
+        for i in range(2):
+            with profiler.stage('resize'):
+                time.sleep(0.01)
+        profiler.samples=2
+        profiler.total=0.03
+        summary=profiler.summary()
+        self.assertGreaterEqual(summary['resize'],10)
+        self.assertAlmostEqual(summary['total'],15)
+        self.assertAlmostEqual(summary['other']+summary['resize'],summary['total'])
+
+        # disabled profiler record nothing
+        with disabled_profiler.stage('resize'):
+            pass
+        self.assertEqual(len(disabled_profiler.times),0)
+
+    def test_store(self):
+        with tempfile.TemporaryDirectory() as root:
+            img=np.random.randint(0,256,size=(32,48,3),dtype=np.uint8)
+            lbl=np.random.randint(0,20,size=(32,48),dtype=np.uint8)
+            img_path=os.path.join(root,'a.png')
+            lbl_path=os.path.join(root,'b.png')
+            cv2.imwrite(img_path,img)
+            cv2.imwrite(lbl_path,lbl)
+
+            store=disc_store()
+            profiler=stage_profiler()
+            pstore=profiled_store(store,profiler)
+            np.testing.assert_array_equal(pstore.imread(img_path),store.imread(img_path))
+            np.testing.assert_array_equal(pstore.read_label(lbl_path),store.read_label(lbl_path))
+            self.assertIsNone(pstore.imread(os.path.join(root,'c.png')))
+            self.assertEqual(list(profiler.times.keys()),['read','decode'])
+            # other functions of the store
+            self.assertTrue(pstore.exists(img_path))
+
+if __name__ == '__main__':
+    unittest.main()
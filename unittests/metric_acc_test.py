@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import torch
+from torchseg.utils.metric.composite import MetricAcc
+
+def loop_avg_metric(pred,labels,exception_value):
+    """
+    the per-image loop before the vectorized MetricAcc.update()
+    """
+    sum_p,sum_r,sum_f=0,0,0
+    for i in range(pred.size(0)):
+        tp=torch.sum(((pred[i]==1) & (labels[i]==1)).to(torch.float32))
+        fp=torch.sum(((pred[i]==1) & (labels[i]==0)).to(torch.float32))
+        fn=torch.sum(((pred[i]==0) & (labels[i]==1)).to(torch.float32))
+        r=exception_value if tp+fn==0 else tp/(tp+fn)
+        p=exception_value if tp+fp==0 else tp/(tp+fp)
+        f=exception_value if p+r==0 else 2*p*r/(p+r)
+        sum_p+=p
+        sum_r+=r
+        sum_f+=f
+    return sum_p,sum_r,sum_f
+
+class Test(unittest.TestCase):
+    def test_avg_metric(self):
+        for exception_value in [0,1]:
+            metric=MetricAcc(exception_value,check_count=True)
+            sums=[0,0,0]
+            img_count=0
+            for i in range(3):
+                labels=torch.randint(0,2,(6,1,16,24))
+                labels[:,:,0:2,:]=255
+                predicts=torch.rand(6,2,16,24)
+                # no gt, no prediction and no true positive
+                labels[0]=0
+                predicts[1,1]=-1
+                labels[2,:,2:]=1-torch.argmax(predicts[2],dim=0,keepdim=True)[:,2:]
+
+                metric.update((predicts,labels))
+                pred=torch.argmax(predicts,dim=1,keepdim=True)
+                for j,x in enumerate(loop_avg_metric(pred,labels,exception_value)):
+                    sums[j]+=x
+                img_count+=labels.size(0)
+
+                self.assertEqual(int(metric.tp+metric.fp+metric.tn+metric.fn),int(metric.count))
+                self.assertEqual(int(metric.count),int(torch.sum(labels<=1)))
+
+            for a,b in zip(metric.get_avg_metric(),sums):
+                self.assertAlmostEqual(float(a),float(b)/img_count,places=5)
+
+            metric.reset()
+            self.assertEqual(metric.img_count,0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import numpy as np
+import torch
+from torchseg.utils.metrics import runningScore, runningScoreTensor
+
+class Test(unittest.TestCase):
+    def test_running_score(self):
+        n_classes=19
+        score=runningScore(n_classes)
+        tensor_score=runningScoreTensor(n_classes)
+        for i in range(3):
+            trues=np.random.randint(0,n_classes,size=(4,32,48))
+            trues[:,0:4,:]=255
+            preds=np.random.randint(0,n_classes,size=(4,32,48))
+            score.update(trues,preds)
+            tensor_score.update(torch.from_numpy(trues),torch.from_numpy(preds))
+
+        np.testing.assert_array_equal(tensor_score.confusion_matrix,score.confusion_matrix)
+        self.assertEqual(tensor_score.matrix.dtype,torch.int64)
+        a,class_a=score.get_scores()
+        b,class_b=tensor_score.get_scores()
+        self.assertEqual(a.keys(),b.keys())
+        for key in a.keys():
+            self.assertAlmostEqual(a[key],b[key])
+        for key in class_a.keys():
+            self.assertAlmostEqual(class_a[key],class_b[key])
+
+        tensor_score.reset()
+        self.assertEqual(tensor_score.confusion_matrix.sum(),0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import tempfile
+import cv2
+import numpy as np
+from torchseg.utils.metric.offline_evaluator import evaluate_pairs, aggregate, get_prf
+
+def loop_counts(gt_path,pred_path):
+    """
+    the four logical_and reductions before offline_evaluator.py
+    """
+    gt_img=cv2.imread(gt_path,cv2.IMREAD_GRAYSCALE)
+    pred_img=cv2.imread(pred_path,cv2.IMREAD_GRAYSCALE)
+    tp=np.sum(np.logical_and(gt_img>0,pred_img>0))
+    tn=np.sum(np.logical_and(gt_img==0,pred_img==0))
+    fp=np.sum(np.logical_and(gt_img==0,pred_img>0))
+    fn=np.sum(np.logical_and(gt_img>0,pred_img==0))
+    return tp,fp,tn,fn
+
+class Test(unittest.TestCase):
+    def get_pairs(self,root):
+        np.random.seed(25)
+        pairs=[]
+        for video in ['bear','car']:
+            os.makedirs(os.path.join(root,'gt',video),exist_ok=True)
+            os.makedirs(os.path.join(root,'pred',video),exist_ok=True)
+            for i in range(5):
+                gt_path=os.path.join(root,'gt',video,'%05d.png'%i)
+                pred_path=os.path.join(root,'pred',video,'%05d.png'%i)
+                gt=(np.random.rand(24,32)>0.7).astype(np.uint8)*255
+                pred=(np.random.rand(24,32)>0.6).astype(np.uint8)*255
+                if i==0:
+                    # no gt and no prediction
+                    gt[:]=0
+                    pred[:]=0
+                cv2.imwrite(gt_path,gt)
+                cv2.imwrite(pred_path,pred)
+                pairs.append({'img1_path':gt_path.replace('.png','.jpg'),'gt_path':gt_path,'pred_path':pred_path,
+                              'video':video,'category':'animal' if video=='bear' else 'vehicle'})
+        return pairs
+
+    def test_evaluate(self):
+        with tempfile.TemporaryDirectory() as root:
+            pairs=self.get_pairs(root)
+            cache_path=os.path.join(root,'frame_results.csv')
+            frames=evaluate_pairs(pairs,cache_path=cache_path,num_workers=2)
+            self.assertEqual(len(frames),len(pairs))
+            for pair,frame in zip(pairs,frames):
+                self.assertEqual(frame['gt_path'],pair['gt_path'])
+                self.assertEqual([frame[k] for k in ['tp','fp','tn','fn']],
+                                 [int(x) for x in loop_counts(pair['gt_path'],pair['pred_path'])])
+            self.assertEqual(frames,evaluate_pairs(pairs,num_workers=0))
+
+            result=aggregate(frames)
+            fmeasures=[get_prf(f['tp'],f['fp'],f['fn'])[2] for f in frames]
+            self.assertAlmostEqual(result['mean_fmeasure'],np.mean(fmeasures))
+            self.assertEqual(result['tp'],sum(f['tp'] for f in frames))
+            videos=aggregate(frames,'video')
+            self.assertEqual(list(videos.keys()),['bear','car'])
+            self.assertEqual(videos['bear']['frames'],5)
+            self.assertEqual(sum(v['fn'] for v in videos.values()),result['fn'])
+            self.assertEqual(list(aggregate(frames,'category').keys()),['animal','vehicle'])
+
+            # the cached counts are used when the files are not modified
+            pred_path=pairs[1]['pred_path']
+            stat=os.stat(pred_path)
+            cv2.imwrite(pred_path,np.zeros((24,32),np.uint8))
+            os.utime(pred_path,ns=(stat.st_atime_ns,stat.st_mtime_ns))
+            self.assertEqual(evaluate_pairs(pairs,cache_path=cache_path,num_workers=0),frames)
+
+            # recompute the modified prediction
+            os.utime(pred_path,ns=(stat.st_atime_ns,stat.st_mtime_ns+10**9))
+            frames=evaluate_pairs(pairs,cache_path=cache_path,num_workers=0)
+            self.assertEqual(frames[1]['tp'],0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import tempfile
+import cv2
+import numpy as np
+from PIL import Image
+from torchseg.dataset.packed_dataset import disc_store, packed_store, pack_files
+
+class Test(unittest.TestCase):
+    def write_files(self,root):
+        files=[]
+        for video in ['bear','cat']:
+            os.makedirs(os.path.join(root,'images',video))
+            os.makedirs(os.path.join(root,'labels',video,'1'))
+            for i in range(3):
+                img=np.random.randint(0,256,size=(32,48,3)).astype(np.uint8)
+                img_path=os.path.join(root,'images',video,'%05d.png'%i)
+                cv2.imwrite(img_path,img)
+
+                lbl=np.random.randint(0,20,size=(32,48)).astype(np.uint8)
+                lbl_path=os.path.join(root,'labels',video,'1','%05d.png'%i)
+                Image.fromarray(lbl).save(lbl_path)
+
+                flow=np.random.rand(32,48,2).astype(np.float32)
+                flow_path=os.path.join(root,'images',video,'%05d.flo'%i)
+                with open(flow_path,'wb') as f:
+                    f.write(b'PIEH')
+                    np.array([48,32],np.int32).tofile(f)
+                    flow.tofile(f)
+                files+=[img_path,lbl_path,flow_path]
+        return files
+
+    def test_packed_store(self):
+        with tempfile.TemporaryDirectory() as root:
+            files=self.write_files(os.path.join(root,'dataset'))
+            packed_path=os.path.join(root,'packed')
+            # small shard size to get more than one shard
+            pack_files(files,packed_path,shard_size=0)
+
+            disc=disc_store()
+            packed=packed_store(packed_path)
+            self.assertGreater(len(packed.shards),1)
+            for f in files:
+                self.assertTrue(packed.exists(f))
+                if f.endswith('.flo'):
+                    self.assertTrue(np.array_equal(disc.read_flow(f),packed.read_flow(f)))
+                elif f.find('labels')>=0:
+                    self.assertTrue(np.array_equal(disc.read_label(f),packed.read_label(f)))
+                else:
+                    self.assertTrue(np.array_equal(disc.imread(f),packed.imread(f)))
+                    self.assertEqual(packed.shape(f),(32,48))
+
+            self.assertFalse(packed.exists(os.path.join(root,'dataset','images','bear','00003.png')))
+            for pattern,recursive in [('images/bear/*.png',False),
+                                      ('labels/cat/**/00001.png',True),
+                                      ('images/*/*.flo',False)]:
+                pattern=os.path.join(root,'dataset',pattern)
+                self.assertEqual(sorted(disc.glob(pattern,recursive=recursive)),
+                                 sorted(packed.glob(pattern,recursive=recursive)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import multiprocessing
+import numpy as np
+import torch.utils.data as td
+from torchseg.dataset.path_table import path_table
+
+def get_private_kb():
+    """
+    private memory (copy on write pages) of current process in KB
+    """
+    total=0
+    with open('/proc/self/smaps_rollup','r') as f:
+        for line in f.readlines():
+            if line.startswith('Private_Clean:') or line.startswith('Private_Dirty:'):
+                total+=int(line.split()[1])
+    return total
+
+class path_dataset(td.Dataset):
+    def __init__(self,paths,step):
+        self.paths=paths
+        self.step=step
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self,index):
+        path=self.paths[index]
+        worker_id=td.get_worker_info().id
+        if index%self.step==0 or index==len(self)-1:
+            return get_private_kb(),worker_id,len(path)
+        else:
+            return -1,worker_id,len(path)
+
+class Test(unittest.TestCase):
+    def test_accessor(self):
+        paths=['/data/video%d/%05d.jpg'%(i%7,i) for i in range(1000)]+['/data/中文.png','/data/video0/00000.jpg']
+        table=path_table(paths)
+        self.assertEqual(len(table),len(paths))
+        self.assertEqual(list(table),paths)
+        self.assertEqual(table.tolist(),paths)
+        for idx in [0,5,-1,-3,len(paths)-1]:
+            self.assertEqual(table[idx],paths[idx])
+        self.assertEqual(list(table[::3]),paths[::3])
+        self.assertEqual(list(table[10:20]),paths[10:20])
+        for p in paths:
+            self.assertEqual(table.index(p),paths.index(p))
+            self.assertTrue(p in table)
+        self.assertFalse('/data/none.jpg' in table)
+        with self.assertRaises(ValueError):
+            table.index('/data/none.jpg')
+        with self.assertRaises(IndexError):
+            table[len(paths)]
+        self.assertEqual(len(path_table([])),0)
+
+    def test_storage(self):
+        n=2000
+        paths=['/home/user/cvdataset/FBMS/Trainingset/video%04d/frame_%06d.jpg'%(i//100,i) for i in range(n)]
+        table=path_table(paths)
+        # no python object for each path, only the numpy arrays shared with forked workers
+        arrays=[table.buffer,table.offsets,table.order,table.hashes]
+        self.assertTrue(all([isinstance(x,np.ndarray) for x in vars(table).values()]))
+        self.assertEqual(table.buffer.nbytes,sum([len(p.encode('utf-8')) for p in paths]))
+        self.assertEqual(sum([x.nbytes for x in arrays]),table.buffer.nbytes+(n+1)*8+n*8+n*4)
+        self.assertEqual(table[n//2],paths[n//2])
+
+    @unittest.skipUnless(os.path.exists('/proc/self/smaps_rollup') and
+                         'fork' in multiprocessing.get_all_start_methods(),'need linux smaps_rollup and fork')
+    def test_worker_memory(self):
+        n=20000
+        paths=path_table(['/home/user/cvdataset/FBMS/Trainingset/video%04d/frame_%06d.jpg'%(i//100,i) for i in range(n)])
+        loader=td.DataLoader(path_dataset(paths,step=n//10),batch_size=1000,shuffle=False,num_workers=2,
+                             multiprocessing_context=multiprocessing.get_context('fork'))
+        memory={}
+        for private_kb,worker_id,_ in loader:
+            for kb,wid in zip(private_kb.tolist(),worker_id.tolist()):
+                if kb>=0:
+                    memory.setdefault(wid,[]).append(kb)
+        self.assertEqual(sorted(memory.keys()),[0,1])
+        # the private memory growth of each worker in one epoch, a list of str
+        # is copied on write in the workers (about 100 bytes for each path)
+        growth=max([m[-1]-m[0] for m in memory.values()])
+        self.assertLess(growth,512)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import tempfile
+import cv2
+import numpy as np
+from torchseg.dataset.packed_dataset import disc_store
+from torchseg.dataset.reduced_decode import get_reduce_factor, imread_reduced
+
+class Test(unittest.TestCase):
+    def test_factor(self):
+        self.assertEqual(get_reduce_factor((1024,2048),(224,224)),4)
+        self.assertEqual(get_reduce_factor((1024,2048),(512,512)),2)
+        self.assertEqual(get_reduce_factor((480,854),(224,224)),2)
+        self.assertEqual(get_reduce_factor((300,300),(224,224)),1)
+        self.assertEqual(get_reduce_factor(None,(224,224)),1)
+
+    def test_imread(self):
+        with tempfile.TemporaryDirectory() as root:
+            path=os.path.join(root,'a.jpg')
+            img=np.random.randint(0,256,size=(1000,2000,3)).astype(np.uint8)
+            cv2.imwrite(path,img)
+            reduced_img,shape=imread_reduced(disc_store(),path,(224,224))
+            self.assertEqual(shape,(1000,2000))
+            self.assertEqual(reduced_img.shape,(250,500,3))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import random
+import torch.utils.data as td
+from torchseg.dataset.resumable_sampler import (resumable_sampler, get_sample_seed, seed_sample, set_sample_seed,
+                                                get_loader_sampler, set_loader_epoch, step_loader)
+from torchseg.dataset.clip_sampler import clip_batch_sampler
+
+class random_dataset(td.Dataset):
+    """
+    return (index, random number) like the random aux frame
+    """
+    def __len__(self):
+        return 50
+
+    def __getitem__(self,index):
+        with seed_sample(self,index):
+            return index,random.random()
+
+def load_epochs(num_workers,n_epoch=2,state=None,stop=None):
+    """
+    return the batches of n_epoch, and the sampler state after stop batches
+    """
+    dataset=random_dataset()
+    sampler=resumable_sampler(len(dataset),seed=25)
+    if state is not None:
+        sampler.load_state_dict(state)
+    loader=td.DataLoader(dataset,batch_size=4,sampler=sampler,drop_last=True,num_workers=num_workers)
+    batches=[]
+    for epoch in range(sampler.epoch,n_epoch):
+        set_loader_epoch(loader,epoch)
+        for index,x in loader:
+            step_loader(loader,len(index))
+            batches.append((index.tolist(),x.tolist()))
+            if len(batches)==stop:
+                return batches,get_loader_sampler(loader).state_dict()
+    return batches,get_loader_sampler(loader).state_dict()
+
+class Test(unittest.TestCase):
+    def test_sampler(self):
+        sampler=resumable_sampler(10,seed=0)
+        indices=list(sampler)
+        self.assertEqual(sorted(indices),list(range(10)))
+        self.assertEqual(indices,list(sampler))
+        sampler.set_epoch(1)
+        self.assertNotEqual(indices,list(sampler))
+
+        # skip the consumed indices
+        sampler.set_epoch(0)
+        sampler.step(4)
+        state=sampler.state_dict()
+        resumed=resumable_sampler(10)
+        resumed.load_state_dict(state)
+        resumed.set_epoch(0)
+        self.assertEqual(list(resumed),indices[4:])
+        self.assertEqual(len(resumed),10)
+        resumed.set_epoch(1)
+        self.assertEqual(len(list(resumed)),10)
+
+        # distributed: padded to the same length, cover all indices
+        samplers=[resumable_sampler(10,num_replicas=3,rank=r,seed=0) for r in range(3)]
+        indices=[list(s) for s in samplers]
+        self.assertTrue(all([len(x)==4 for x in indices]))
+        self.assertEqual(set(sum(indices,[])),set(range(10)))
+
+    def test_clip_sampler(self):
+        keys=['video%d'%(i//8) for i in range(96)]
+        sampler=clip_batch_sampler(keys,batch_size=8,clip_length=4,seed=0)
+        batches=list(sampler)
+        sampler.step(1)
+        sampler.step(1)
+        resumed=clip_batch_sampler(keys,batch_size=8,clip_length=4)
+        resumed.load_state_dict(sampler.state_dict())
+        self.assertEqual(list(resumed),batches[2:])
+
+    def test_sample_seed(self):
+        self.assertEqual(get_sample_seed(25,0,3),get_sample_seed(25,0,3))
+        self.assertNotEqual(get_sample_seed(25,0,3),get_sample_seed(25,1,3))
+        self.assertNotEqual(get_sample_seed(25,0,3),get_sample_seed(25,0,4))
+
+        # the global random state of the main process is not reseeded by the samples
+        dataset=random_dataset()
+        set_sample_seed(dataset,25,0)
+        random.seed(0)
+        expected=[random.random() for i in range(3)]
+        random.seed(0)
+        x=[]
+        for i in range(3):
+            self.assertEqual(dataset[i],dataset[i])
+            x.append(random.random())
+        self.assertEqual(x,expected)
+
+    def test_resume(self):
+        batches,state=load_epochs(num_workers=0)
+        # the random numbers do not depend on the workers
+        self.assertEqual(load_epochs(num_workers=2)[0],batches)
+
+        # preempted after 15 batches (3 batches in the second epoch), resume at the next batch
+        head,state=load_epochs(num_workers=2,stop=15)
+        self.assertEqual(state['epoch'],1)
+        self.assertEqual(state['start'],12)
+        tail,state=load_epochs(num_workers=2,state=state)
+        self.assertEqual(head+tail,batches)
+
+if __name__ == '__main__':
+    unittest.main()
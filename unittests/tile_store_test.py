@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import random
+import tempfile
+import cv2
+import numpy as np
+from torchseg.dataset.tile_store import tile_store, write_tiles, get_tile_path
+
+class Test(unittest.TestCase):
+    def test_region(self):
+        with tempfile.TemporaryDirectory() as root:
+            img_path=os.path.join(root,'images','a.jpg')
+            lbl_path=os.path.join(root,'labels','a.png')
+            tile_root=os.path.join(root,'tiles')
+            img=np.random.randint(0,256,size=(300,500,3),dtype=np.uint8)
+            lbl=np.random.randint(0,20,size=(300,500),dtype=np.uint8)
+            write_tiles(img,get_tile_path(img_path,tile_root,root),tile_size=64,levels=(1,2))
+            write_tiles(lbl,get_tile_path(lbl_path,tile_root,root),tile_size=64,interpolation=cv2.INTER_NEAREST)
+
+            store=tile_store(tile_root,root)
+            self.assertEqual(store.shape(img_path),(300,500,3))
+            self.assertEqual(store.shape(lbl_path),(300,500))
+            self.assertIsNone(store.shape(os.path.join(root,'images','b.jpg')))
+
+            rects=[(0,0,300,500),(0,0,1,1),(499,299,1,1),(64,64,64,64)]
+            for i in range(20):
+                th,tw=random.randint(1,300),random.randint(1,500)
+                rects.append((random.randint(0,500-tw),random.randint(0,300-th),th,tw))
+            for x1,y1,th,tw in rects:
+                np.testing.assert_array_equal(store.read_region(img_path,(x1,y1,th,tw)),img[y1:y1+th,x1:x1+tw])
+                np.testing.assert_array_equal(store.read_region(lbl_path,(x1,y1,th,tw)),lbl[y1:y1+th,x1:x1+tw])
+
+            self.assertEqual(store.read_region(img_path,(100,100,200,200),level=2).shape,(100,100,3))
+
+if __name__ == '__main__':
+    unittest.main()
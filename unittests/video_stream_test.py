@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import time
+import tempfile
+import cv2
+import numpy as np
+from torchseg.dataset.video_stream import video_stream
+
+class Test(unittest.TestCase):
+    def write_video(self,path,n=20):
+        writer=cv2.VideoWriter(path,cv2.VideoWriter_fourcc(*'MJPG'),25,(64,48))
+        for i in range(n):
+            writer.write(np.zeros((48,64,3),np.uint8)+i*10)
+        writer.release()
+
+    def test_pairs(self):
+        with tempfile.TemporaryDirectory() as root:
+            path=os.path.join(root,'test.avi')
+            self.write_video(path)
+
+            stream=video_stream(path,frame_gap=2,input_shape=(24,32),buffer_size=4)
+            self.assertEqual(stream.shape,(48,64))
+            items=list(stream)
+            stream.close()
+            self.assertEqual([idx for idx,_,_ in items],list(range(20)))
+            for idx,main,aux in items:
+                self.assertEqual(main.shape,(24,32,3))
+                self.assertAlmostEqual(np.mean(main),idx*10,delta=3)
+                self.assertAlmostEqual(np.mean(aux),max(idx-2,0)*10,delta=3)
+            self.assertEqual(stream.summary()['dropped'],0)
+
+            stream=video_stream(path,frame_gap=2,buffer_size=4)
+            batches=list(stream.batches(batch_size=8))
+            stream.close()
+            self.assertEqual([len(indexes) for indexes,_,_ in batches],[8,8,4])
+            self.assertEqual(batches[0][1].shape,(8,48,64,3))
+
+    def test_drop(self):
+        with tempfile.TemporaryDirectory() as root:
+            path=os.path.join(root,'test.avi')
+            self.write_video(path)
+
+            # slow consumer
+            stream=video_stream(path,frame_gap=1,buffer_size=2,drop_frames=True)
+            indexes=[]
+            for idx,main,aux in stream:
+                indexes.append(idx)
+                time.sleep(0.05)
+            stream.close()
+            summary=stream.summary()
+            self.assertEqual(summary['decoded'],20)
+            self.assertGreater(summary['dropped'],0)
+            self.assertEqual(summary['consumed']+summary['dropped'],20)
+            self.assertEqual(indexes,sorted(indexes))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import random
+import numpy as np
+from easydict import EasyDict as edict
+from torchseg.utils.augmentor import ImageTransformer, get_default_augmentor_config
+
+class Test(unittest.TestCase):
+    def get_image_and_mask(self,h=240,w=320):
+        y,x=np.mgrid[0:h,0:w]
+        image=np.stack([x*255//w,y*255//h,(x+y)*255//(h+w)],axis=-1).astype(np.uint8)
+        mask=((x//40+y//40)%5).astype(np.uint8)
+        return image,mask
+
+    def test_warp(self):
+        config=get_default_augmentor_config(edict({'input_shape':(112,112),'ignore_index':255}))
+        image,mask=self.get_image_and_mask()
+        imgaug_config=edict(config.copy())
+        imgaug_config.aug_library='imgaug'
+        imgaug_config.pad_for_crop=False
+        warp_config=edict(config.copy())
+        warp_config.aug_library='warp'
+        imgaug_tran=ImageTransformer(imgaug_config)
+        warp_tran=ImageTransformer(warp_config)
+
+        for angle in [None,5.0,15.0]:
+            for crop_size in [None,(160,200)]:
+                for hflip,vflip in [(False,False),(True,False),(True,True)]:
+                    kwargs=dict(angle=angle,crop_size=crop_size,hflip=hflip,vflip=vflip)
+                    random.seed(25)
+                    expect_image,expect_mask=imgaug_tran.transform_image_and_mask_imgaug(image,mask,**kwargs)
+                    random.seed(25)
+                    warp_image,warp_mask=warp_tran.transform_image_and_mask_warp(image,mask,**kwargs)
+
+                    self.assertEqual(warp_image.shape,expect_image.shape)
+                    self.assertEqual(warp_mask.shape,expect_mask.shape)
+                    self.assertGreater(np.mean(warp_mask==expect_mask),0.9)
+                    diff=np.abs(warp_image.astype(np.float32)-expect_image.astype(np.float32))
+                    self.assertLess(np.mean(diff),2.0)
+
+if __name__ == '__main__':
+    unittest.main()